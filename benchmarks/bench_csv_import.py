@@ -0,0 +1,65 @@
+"""
+Benchmark: rows per second of TrackListing.import_tracks on a generated
+.csv file, against the previous csv.DictReader-based reader.
+
+Usage:
+    python benchmarks/bench_csv_import.py [row_count]
+"""
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import TrackListing
+
+
+def write_csv(file_path: str, row_count: int) -> None:
+    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(Track.csv_export_header())
+        for i in range(row_count):
+            # Roughly 1 in 10 rows repeats an earlier track.
+            track_id = i - i % 10 if i % 10 == 9 else i
+            writer.writerow(['spotify:track:{0:022d}'.format(track_id),
+                             'Track {0}'.format(track_id),
+                             'Artist {0}'.format(track_id % 5000),
+                             'Album {0}'.format(track_id % 20000)])
+
+
+def dict_reader_import(file_path: str) -> list:
+    tracks = []
+    with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            tracks.append(Track(row['uri'], row['name'],
+                                row['artist'], row['album']))
+    return tracks
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'tracks.csv')
+        write_csv(file_path, row_count)
+        print("{0} rows, {1:.1f} MB".format(
+            row_count, os.path.getsize(file_path) / 10 ** 6))
+        print("{0:>32} | {1:>10} | {2:>12}".format(
+            'reader', 'time (s)', 'rows/s'))
+        for label, read in (
+                ('csv.DictReader (previous)', dict_reader_import),
+                ('import_tracks', lambda path: TrackListing().import_tracks(path)),
+                ("import_tracks(dedup='first')",
+                 lambda path: TrackListing().import_tracks(path, dedup='first'))):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                read(file_path)
+            elapsed = time.perf_counter() - start
+            print("{0:>32} | {1:>10.2f} | {2:>12.0f}".format(
+                label, elapsed, row_count / elapsed))
+
+
+if __name__ == "__main__":
+    main()
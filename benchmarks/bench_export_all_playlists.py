@@ -0,0 +1,60 @@
+"""
+Benchmark: wall-clock time of SpotifyManager.export_all_playlists against
+worker count, using the in-memory fake client with injected latency.
+
+Usage:
+    python benchmarks/bench_export_all_playlists.py [latency_seconds]
+"""
+import configparser
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'tests'))
+
+from fakes import FakeSpotify  # noqa: E402
+from spotify_playlist_utility.Scheduler import (RequestScheduler,  # noqa: E402
+                                                TokenBucket)
+from spotify_playlist_utility.Spotify import SpotifyManager  # noqa: E402
+
+PLAYLIST_COUNT = 60
+TRACKS_PER_PLAYLIST = 250
+RATE_LIMIT = 100  # requests per second
+
+
+def run(workers: int, latency: float, rate: float = None) -> float:
+    sp = FakeSpotify(latency=latency, playlists={
+        'p{0}'.format(i): {'name': 'Playlist {0}'.format(i),
+                           'uris': ['spotify:track:{0}x{1}'.format(i, j)
+                                    for j in range(TRACKS_PER_PLAYLIST)]}
+        for i in range(PLAYLIST_COUNT)})
+    manager = SpotifyManager(configparser.ConfigParser(), concurrency=workers)
+    manager.sp = sp
+    if rate:
+        manager.sp = RequestScheduler(sp, TokenBucket(rate, rate / 10))
+    manager.authorized = True
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.export_all_playlists(directory)
+        return time.perf_counter() - start
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.02
+    print("{0} playlists x {1} tracks, latency per call: {2:.3f}s".format(
+        PLAYLIST_COUNT, TRACKS_PER_PLAYLIST, latency))
+    print("{0:>8} | {1:>13} | {2:>24}".format(
+        'workers', 'playlists/s', 'at {0} req/s (playlists/s)'.format(RATE_LIMIT)))
+    for workers in (1, 2, 4, 8, 16):
+        unlimited = run(workers, latency)
+        limited = run(workers, latency, RATE_LIMIT)
+        print("{0:>8} | {1:>13.1f} | {2:>24.1f}".format(
+            workers, PLAYLIST_COUNT / unlimited, PLAYLIST_COUNT / limited))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: payload size and parse time of a '/v1/playlists/{id}/tracks'
+page requested with and without SpotifyManager.PLAYLIST_ITEMS_FIELDS.
+
+The responses follow the Web API's documented object shapes (a full
+PlaylistTrackObject with full album, artists, available_markets, images,
+external_ids, ...); the projected response holds only the fields selected
+by PLAYLIST_ITEMS_FIELDS.
+
+Usage:
+    python benchmarks/bench_field_projection.py
+"""
+import configparser
+import json
+import time
+
+from spotify_playlist_utility.Spotify import SpotifyManager
+
+MARKETS = ["AD", "AE", "AG", "AL", "AM", "AO", "AR", "AT", "AU", "AZ", "BA",
+           "BB", "BD", "BE", "BF", "BG", "BH", "BI", "BJ", "BN", "BO", "BR",
+           "BS", "BT", "BW", "BY", "BZ", "CA", "CD", "CG", "CH", "CI", "CL",
+           "CM", "CO", "CR", "CV", "CW", "CY", "CZ", "DE", "DJ", "DK", "DM",
+           "DO", "DZ", "EC", "EE", "EG", "ES", "FI", "FJ", "FM", "FR", "GA",
+           "GB", "GD", "GE", "GH", "GM", "GN", "GQ", "GR", "GT", "GW", "GY",
+           "HK", "HN", "HR", "HT", "HU", "ID", "IE", "IL", "IN", "IQ", "IS",
+           "IT", "JM", "JO", "JP", "KE", "KG", "KH", "KI", "KM", "KN", "KR",
+           "KW", "KZ", "LA", "LB", "LC", "LI", "LK", "LR", "LS", "LT", "LU",
+           "LV", "LY", "MA", "MC", "MD", "ME", "MG", "MH", "MK", "ML", "MN",
+           "MO", "MR", "MT", "MU", "MV", "MW", "MX", "MY", "MZ", "NA", "NE",
+           "NG", "NI", "NL", "NO", "NP", "NR", "NZ", "OM", "PA", "PE", "PG",
+           "PH", "PK", "PL", "PS", "PT", "PW", "PY", "QA", "RO", "RS", "RW",
+           "SA", "SB", "SC", "SE", "SG", "SI", "SK", "SL", "SM", "SN", "SR",
+           "ST", "SV", "SZ", "TD", "TG", "TH", "TJ", "TL", "TN", "TO", "TR",
+           "TT", "TV", "TW", "TZ", "UA", "UG", "US", "UY", "UZ", "VC", "VE",
+           "VN", "VU", "WS", "XK", "ZA", "ZM", "ZW"]
+PAGE_SIZE = SpotifyManager.PLAYLIST_ITEMS_PAGE_SIZE
+ROUNDS = 200
+
+
+def simplified_artist(i: int) -> dict:
+    artist_id = '{0:022d}'.format(i)
+    return {'external_urls': {'spotify': 'https://open.spotify.com/artist/' + artist_id},
+            'href': 'https://api.spotify.com/v1/artists/' + artist_id,
+            'id': artist_id, 'name': 'Artist {0}'.format(i), 'type': 'artist',
+            'uri': 'spotify:artist:' + artist_id}
+
+
+def full_item(i: int) -> dict:
+    track_id = '{0:022d}'.format(i)
+    album_id = '{0:022d}'.format(i // 10)
+    return {
+        'added_at': '2021-06-01T12:00:00Z',
+        'added_by': {'external_urls': {'spotify': 'https://open.spotify.com/user/user'},
+                     'href': 'https://api.spotify.com/v1/users/user',
+                     'id': 'user', 'type': 'user', 'uri': 'spotify:user:user'},
+        'is_local': False,
+        'primary_color': None,
+        'video_thumbnail': {'url': None},
+        'track': {
+            'album': {
+                'album_type': 'album', 'artists': [simplified_artist(i // 10)],
+                'available_markets': MARKETS,
+                'external_urls': {'spotify': 'https://open.spotify.com/album/' + album_id},
+                'href': 'https://api.spotify.com/v1/albums/' + album_id,
+                'id': album_id,
+                'images': [{'height': size, 'width': size,
+                            'url': 'https://i.scdn.co/image/ab67616d0000b273' + album_id}
+                           for size in (640, 300, 64)],
+                'name': 'Album {0}'.format(i // 10), 'release_date': '2020-01-01',
+                'release_date_precision': 'day', 'total_tracks': 10,
+                'type': 'album', 'uri': 'spotify:album:' + album_id},
+            'artists': [simplified_artist(i // 10), simplified_artist(i)],
+            'available_markets': MARKETS, 'disc_number': 1,
+            'duration_ms': 215000, 'episode': False, 'explicit': False,
+            'external_ids': {'isrc': 'USRC1{0:07d}'.format(i)},
+            'external_urls': {'spotify': 'https://open.spotify.com/track/' + track_id},
+            'href': 'https://api.spotify.com/v1/tracks/' + track_id,
+            'id': track_id, 'is_local': False, 'name': 'Track {0}'.format(i),
+            'popularity': 50,
+            'preview_url': 'https://p.scdn.co/mp3-preview/' + track_id,
+            'track': True, 'track_number': i % 10 + 1, 'type': 'track',
+            'uri': 'spotify:track:' + track_id}}
+
+
+def projected_item(item: dict) -> dict:
+    track = item['track']
+    return {'track': {'uri': track['uri'], 'name': track['name'],
+                      'artists': [{'name': artist['name']}
+                                  for artist in track['artists']],
+                      'album': {'name': track['album']['name']}}}
+
+
+def page(items: list) -> dict:
+    return {'href': 'https://api.spotify.com/v1/playlists/p/tracks',
+            'items': items, 'limit': PAGE_SIZE, 'next': None, 'offset': 0,
+            'previous': None, 'total': len(items)}
+
+
+def parse_and_build(manager: SpotifyManager, payload: bytes) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        response = json.loads(payload)
+        for item in response['items']:
+            manager.build_track_object_from_data(item['track'])
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    manager = SpotifyManager(configparser.ConfigParser())
+    items = [full_item(i) for i in range(PAGE_SIZE)]
+    full_payload = json.dumps(page(items)).encode()
+    projected_payload = json.dumps(
+        {'items': [projected_item(item) for item in items],
+         'limit': PAGE_SIZE, 'offset': 0, 'total': PAGE_SIZE}).encode()
+
+    print("{0}-item playlist page, fields={1!r}".format(
+        PAGE_SIZE, SpotifyManager.PLAYLIST_ITEMS_FIELDS))
+    print("{0:>10} | {1:>12} | {2:>16}".format(
+        'response', 'bytes', 'parse+build (ms)'))
+    for label, payload in (('full', full_payload),
+                           ('projected', projected_payload)):
+        print("{0:>10} | {1:>12} | {2:>16.3f}".format(
+            label, len(payload), parse_and_build(manager, payload) * 1000))
+    print("projected payload is {0:.1%} of the full payload".format(
+        len(projected_payload) / len(full_payload)))
+
+
+if __name__ == "__main__":
+    main()
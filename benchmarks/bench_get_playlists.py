@@ -0,0 +1,67 @@
+"""
+Benchmark: wall-clock time of SpotifyManager.get_playlists against playlist
+count, using a mocked spotipy.Spotify client with injected per-call latency.
+
+Usage:
+    python benchmarks/bench_get_playlists.py [latency_seconds]
+"""
+import configparser
+import sys
+import time
+from unittest.mock import MagicMock
+
+import spotipy
+
+from spotify_playlist_utility.Spotify import SpotifyManager
+
+PAGE_SIZE = 50
+
+
+def build_mock_client(playlist_count: int, latency: float) -> MagicMock:
+    items = [{'id': 'p{0}'.format(i), 'uri': 'spotify:playlist:p{0}'.format(i),
+              'name': 'Playlist {0}'.format(i), 'description': '',
+              'snapshot_id': 'p{0}-0'.format(i), 'tracks': {'total': 10}}
+             for i in range(playlist_count)]
+
+    def page(limit=PAGE_SIZE, offset=0):
+        # Pages like the Web API: 'limit' items from 'offset'.
+        time.sleep(latency)
+        return {'items': items[offset:offset + limit], 'offset': offset,
+                'limit': limit, 'total': playlist_count,
+                'next': 'next' if offset + limit < playlist_count else None}
+
+    def playlist(playlist_id, fields=None):
+        time.sleep(latency)
+        return {'tracks': {'total': 10}}
+
+    sp = MagicMock(spec=spotipy.Spotify)
+    sp.current_user_playlists.side_effect = page
+    sp.playlist.side_effect = playlist
+    return sp
+
+
+def run(playlist_count: int, latency: float, concurrency: int) -> float:
+    manager = SpotifyManager(configparser.ConfigParser(),
+                             concurrency=concurrency)
+    manager.sp = build_mock_client(playlist_count, latency)
+    manager.authorized = True
+    start = time.perf_counter()
+    manager.get_playlists()
+    return time.perf_counter() - start
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.02
+    print("latency per call: {0:.3f}s".format(latency))
+    print("{0:>10} | {1:>12} | {2:>12}".format(
+        'playlists', 'serial (s)', 'pooled (s)'))
+    for playlist_count in (10, 50, 100, 250):
+        serial = run(playlist_count, latency, concurrency=1)
+        pooled = run(playlist_count, latency,
+                     concurrency=SpotifyManager.DEFAULT_CONCURRENCY)
+        print("{0:>10} | {1:>12.3f} | {2:>12.3f}".format(
+            playlist_count, serial, pooled))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: file size and load time of the .spsnap snapshot format against
+the .csv export format.
+
+Usage:
+    python benchmarks/bench_snapshot_format.py [track_count]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import TrackListing
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    listing = TrackListing([Track('spotify:track:{0:022d}'.format(i),
+                                  'Track {0}'.format(i),
+                                  'Artist {0}'.format(i % 5000),
+                                  'Album {0}'.format(i % 20000))
+                            for i in range(count)])
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'tracks.csv')
+        snapshot_path = os.path.join(directory, 'tracks.spsnap')
+        listing.export_tracks(csv_path)
+        listing.export_tracks(snapshot_path)
+
+        print("{0} tracks".format(count))
+        print("{0:>26} | {1:>10} | {2:>10}".format('', 'csv', 'snapshot'))
+        print("{0:>26} | {1:>10.1f} | {2:>10.1f}".format(
+            'file size (MB)', os.path.getsize(csv_path) / 10 ** 6,
+            os.path.getsize(snapshot_path) / 10 ** 6))
+
+        _, csv_load = timed(lambda: TrackListing().import_tracks(csv_path))
+        snapshot_listing, snapshot_open = timed(
+            lambda: TrackListing.load_snapshot(snapshot_path))
+        print("{0:>26} | {1:>10.3f} | {2:>10.3f}".format(
+            'load (s)', csv_load, snapshot_open))
+
+        _, snapshot_decode = timed(lambda: list(snapshot_listing.tracks))
+        print("{0:>26} | {1:>10.3f} | {2:>10.3f}".format(
+            'load + decode all (s)', csv_load, snapshot_open + snapshot_decode))
+
+        _, snapshot_uris = timed(lambda: snapshot_listing.tracks.column('uri'))
+        print("{0:>26} | {1:>10.3f} | {2:>10.3f}".format(
+            'load + uri column (s)', csv_load, snapshot_open + snapshot_uris))
+        snapshot_listing.tracks.close()
+
+
+if __name__ == "__main__":
+    main()
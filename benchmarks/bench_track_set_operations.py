@@ -0,0 +1,58 @@
+"""
+Benchmark: Liked Memory dedup using the URI-indexed TrackListing.difference
+against the previous per-track linear scan.
+
+Usage:
+    python benchmarks/bench_track_set_operations.py
+"""
+import time
+
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import TrackListing
+
+# Above this many URI comparisons the linear scan is estimated, not run.
+MAX_SCAN_COMPARISONS = 2 * 10 ** 8
+
+
+def build_listing(start: int, count: int) -> TrackListing:
+    return TrackListing([Track('spotify:track:{0:022d}'.format(i), 'name',
+                               'artist', 'album')
+                         for i in range(start, start + count)])
+
+
+def linear_scan(saved_tracks: TrackListing, memory: TrackListing) -> list:
+    return [saved_track for saved_track in saved_tracks.tracks
+            if not any(memory_track.uri == saved_track.uri
+                       for memory_track in memory.tracks)]
+
+
+def main():
+    print("{0:>8} | {1:>16} | {2:>14}".format(
+        'tracks', 'linear scan (s)', 'indexed (s)'))
+    for count in (1000, 10000, 100000):
+        # Half of the saved tracks are already in the memory playlist.
+        saved_tracks = build_listing(0, count)
+        memory = build_listing(count // 2, count)
+
+        start = time.perf_counter()
+        indexed = saved_tracks.difference(memory)
+        indexed_time = time.perf_counter() - start
+
+        comparisons = count * count
+        if comparisons <= MAX_SCAN_COMPARISONS:
+            start = time.perf_counter()
+            scanned = linear_scan(saved_tracks, memory)
+            scan_time = "{0:.3f}".format(time.perf_counter() - start)
+            assert [t.uri for t in scanned] == [t.uri for t in indexed.tracks]
+        else:
+            sample = TrackListing(saved_tracks.tracks[::count // 100])
+            start = time.perf_counter()
+            linear_scan(sample, memory)
+            per_track = (time.perf_counter() - start) / len(sample.tracks)
+            scan_time = "~{0:.1f} (est.)".format(per_track * count)
+        print("{0:>8} | {1:>16} | {2:>14.4f}".format(
+            count, scan_time, indexed_time))
+
+
+if __name__ == "__main__":
+    main()
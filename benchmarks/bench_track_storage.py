@@ -0,0 +1,76 @@
+"""
+Benchmark: bytes per track and construction throughput of track storage,
+comparing the previous '__dict__'-based Track, the '__slots__'/interned
+Track, and the columnar TrackColumns backend.
+
+Usage:
+    python benchmarks/bench_track_storage.py [track_count]
+"""
+import sys
+import time
+import tracemalloc
+
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import TrackColumns
+
+
+class DictTrack():
+    """The Track layout before '__slots__' and interning."""
+
+    def __init__(self, uri, name, artist, album):
+        self.uri = uri
+        self.name = name
+        self.artist = artist
+        self.album = album
+
+
+def api_items(count: int) -> list:
+    # Names are built per item, as when decoding separate JSON responses.
+    return [{'uri': 'spotify:track:{0:022d}'.format(i),
+             'name': 'Track {0}'.format(i),
+             'artists': [{'name': 'Artist {0}'.format(i % 2000)}],
+             'album': {'name': 'Album {0}'.format(i % 8000)}}
+            for i in range(count)]
+
+
+def build_list(track_class, items):
+    return [track_class(item['uri'], item['name'],
+                        item['artists'][0]['name'], item['album']['name'])
+            for item in items]
+
+
+def build_columns(items):
+    return TrackColumns(build_list(Track, items))
+
+
+def measure(build, count):
+    """Returns memory retained by the storage once the API items are freed,
+    and the construction time."""
+    tracemalloc.start()
+    items = api_items(count)
+    start = time.perf_counter()
+    storage = build(items)
+    elapsed = time.perf_counter() - start
+    del items
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del storage
+    return size, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print("{0} tracks".format(count))
+    print("{0:>22} | {1:>15} | {2:>14}".format(
+        'storage', 'bytes/track', 'tracks/s'))
+    for label, build in (
+            ('dict Track list', lambda items: build_list(DictTrack, items)),
+            ('slots Track list', lambda items: build_list(Track, items)),
+            ('TrackColumns', build_columns)):
+        size, elapsed = measure(build, count)
+        print("{0:>22} | {1:>15.1f} | {2:>14.0f}".format(
+            label, size / count, count / elapsed))
+
+
+if __name__ == "__main__":
+    main()
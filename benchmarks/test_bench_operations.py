@@ -0,0 +1,162 @@
+"""
+Benchmark suite: wall time and API call counts of each CLI operation against
+the in-memory fake client, with a generated library and injected latency.
+Call counts are asserted, so a change that adds requests fails the suite;
+wall times can be compared between runs with pytest-benchmark.
+
+Requires the 'pytest-benchmark' plugin (skipped otherwise).
+
+Usage:
+    python -m pytest benchmarks --benchmark-autosave
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+"""
+import configparser
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'tests'))
+
+from fakes import FakeSpotify, generate_library  # noqa: E402
+from spotify_playlist_utility.Spotify import SpotifyManager  # noqa: E402
+from spotify_playlist_utility.Track import Track  # noqa: E402
+from spotify_playlist_utility.TrackLists import TrackListing  # noqa: E402
+
+PLAYLIST_COUNT = 20
+TRACKS_PER_PLAYLIST = 500
+SAVED_TRACK_COUNT = 2000
+IMPORT_TRACK_COUNT = 1000
+LATENCY = 0.002  # seconds per call
+CONCURRENCY = 8
+ROUNDS = 5
+
+
+def build_manager() -> SpotifyManager:
+    manager = SpotifyManager(configparser.ConfigParser(),
+                             concurrency=CONCURRENCY)
+    manager.sp = FakeSpotify(latency=LATENCY, **generate_library(
+        PLAYLIST_COUNT, TRACKS_PER_PLAYLIST, SAVED_TRACK_COUNT))
+    manager.authorized = True
+    manager.user_id = 'user'
+    return manager
+
+
+def run_benchmark(benchmark, operation):
+    """
+    Benchmarks 'operation(manager)' on a fresh library each round. Returns
+    the manager and result of the last round.
+    """
+    last_round = {}
+
+    def setup():
+        last_round['manager'] = build_manager()
+        return (last_round['manager'],), {}
+
+    def run(manager):
+        last_round['result'] = operation(manager)
+
+    benchmark.pedantic(run, setup=setup, rounds=ROUNDS)
+    return last_round['manager'], last_round['result']
+
+
+def test_get_saved_tracks(benchmark):
+    manager, saved_tracks = run_benchmark(
+        benchmark, lambda manager: manager.get_saved_tracks())
+
+    assert len(saved_tracks.tracks) == SAVED_TRACK_COUNT
+    assert manager.sp.calls == {'current_user_saved_tracks': 40}
+
+
+def test_get_playlists(benchmark):
+    manager, playlists = run_benchmark(
+        benchmark, lambda manager: manager.get_playlists())
+
+    assert len(playlists) == PLAYLIST_COUNT
+    assert manager.sp.calls == {'current_user_playlists': 1,
+                                'playlist': PLAYLIST_COUNT}
+
+
+def test_get_playlist(benchmark):
+    manager, tracks = run_benchmark(
+        benchmark, lambda manager: list(manager.get_playlist('p00000').tracks))
+
+    assert len(tracks) == TRACKS_PER_PLAYLIST
+    assert manager.sp.calls == {'playlist': 1, 'playlist_items': 5}
+
+
+@pytest.mark.parametrize('mode', ['replace', 'moves'])
+def test_shuffle(benchmark, mode):
+    manager, write_count = run_benchmark(
+        benchmark, lambda manager: manager.shuffle_playlist(
+            manager.get_playlist('p00000'), mode))
+
+    calls = manager.sp.calls
+    assert calls['playlist_items'] == 5
+    if mode == 'replace':
+        assert write_count == 5
+        assert (calls['playlist_replace_items'],
+                calls['playlist_add_items']) == (1, 4)
+    else:
+        assert calls['playlist_reorder_items'] == write_count
+        assert write_count < TRACKS_PER_PLAYLIST
+
+
+def test_import(benchmark, tmp_path):
+    uris = ['spotify:track:{0:022d}'.format(i)
+            for i in range(IMPORT_TRACK_COUNT)]
+    import_path = str(tmp_path / 'Imported.csv')
+    TrackListing([Track(uri, 'name', 'artist', 'album') for uri in uris]
+                 ).export_tracks(import_path)
+
+    manager, playlist_id = run_benchmark(
+        benchmark, lambda manager: manager.import_tracks_to_playlist(import_path))
+
+    calls = manager.sp.calls
+    assert (calls['user_playlist_create'], calls['playlist_add_items'],
+            calls['playlist_items']) == (1, 10, 10)
+    assert calls['playlist_reorder_items'] < 10
+    assert sorted(manager.sp.playlists[playlist_id]['uris']) == uris
+
+
+def test_export_all_playlists(benchmark, tmp_path):
+    round_numbers = iter(range(ROUNDS))
+
+    def export_all_playlists(manager):
+        # Each round exports to a new directory, as exports skip playlists
+        # unchanged since the directory's last export.
+        directory = tmp_path / str(next(round_numbers))
+        manager.export_all_playlists(str(directory))
+        return directory
+
+    manager, directory = run_benchmark(benchmark, export_all_playlists)
+
+    assert len(list(directory.glob('*.csv'))) == PLAYLIST_COUNT
+    assert manager.sp.calls == {'current_user_playlists': 1,
+                                'playlist': PLAYLIST_COUNT,
+                                'playlist_items': PLAYLIST_COUNT * 5}
+
+
+def test_liked_memory_sync(benchmark):
+    manager, playlist_id = run_benchmark(
+        benchmark,
+        lambda manager: manager.export_saved_tracks_to_liked_memory_playlist())
+
+    assert len(manager.sp.playlists[playlist_id]['uris']) == SAVED_TRACK_COUNT
+    assert manager.sp.calls == {'current_user_saved_tracks': 40,
+                                'current_user_playlists': 1,
+                                'playlist': 1,
+                                'user_playlist_create': 1,
+                                'playlist_add_items': 20}
+
+
+def test_analyze_playlists(benchmark, tmp_path):
+    manager, track_index = run_benchmark(
+        benchmark, lambda manager: manager.analyze_playlists(
+            str(tmp_path / 'report.json')))
+
+    assert track_index.playlist_count == PLAYLIST_COUNT
+    assert manager.sp.calls == {'current_user_playlists': 1,
+                                'playlist': PLAYLIST_COUNT,
+                                'playlist_items': PLAYLIST_COUNT * 5}
@@ -0,0 +1,284 @@
+import bisect
+import collections
+import csv
+import itertools
+import json
+import os
+import typing
+from array import array
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:  # Optional, see the 'analytics' extra in setup.cfg.
+    numpy = None
+    sparse = None
+
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import FILE_EXTENSIONS, TrackListing
+
+# Typecode of the track and playlist number arrays (a C long).
+NUMBER_TYPECODE = 'l'
+
+# Columns of each report section (see 'build_report').
+REPORT_FIELDS = {
+    'playlists': ['id', 'name', 'track_count'],
+    'overlap': ['playlist_a_id', 'playlist_a_name', 'playlist_b_id',
+                'playlist_b_name', 'shared_tracks', 'jaccard'],
+    'duplicates': Track.csv_export_header() + ['playlist_count', 'playlists'],
+    'artists': ['artist', 'track_count', 'playlist_entry_count'],
+    'albums': ['album', 'artist', 'track_count', 'playlist_entry_count'],
+}
+
+
+class TrackIndex():
+    """
+    Tracks of many playlists, interned by URI: each distinct track is kept
+    once and numbered, and each playlist is held as the sorted array of its
+    distinct track numbers. Cross-playlist reports are computed on these
+    numbers rather than on Track objects or URI strings.
+    """
+
+    def __init__(self) -> None:
+        self.track_numbers = {}  # URI to track number
+        self.tracks = []  # Track of each track number
+        self.playlist_ids = []
+        self.playlist_names = []
+        self.playlist_tracks = []  # array of distinct track numbers, sorted
+        self._postings = None
+
+    def add_playlist(self, playlist_id: str, name: str, tracks: typing.Iterable[Track]) -> None:
+        """
+        Adds a playlist's tracks. Repeats of a track within the playlist
+        count once.
+
+        Args:
+            playlist_id (str): Playlist ID (or other unique label).
+            name (str): Playlist name.
+            tracks (typing.Iterable[Track]): Tracks of the playlist.
+        """
+        track_numbers = self.track_numbers
+        numbers = set()
+        for track in tracks:
+            number = track_numbers.get(track.uri)
+            if number is None:
+                number = track_numbers[track.uri] = len(self.tracks)
+                self.tracks.append(track)
+            numbers.add(number)
+        self.playlist_ids.append(playlist_id)
+        self.playlist_names.append(name)
+        self.playlist_tracks.append(array(NUMBER_TYPECODE, sorted(numbers)))
+        self._postings = None
+
+    @classmethod
+    def from_files(cls, path: str, file_format: str = None) -> 'TrackIndex':
+        """
+        Returns the index of a track listing file, or of each track listing
+        file in a directory (e.g. as exported by '-e'). Playlists are named
+        by file name, and identified by the playlist ID in it, if any.
+        """
+        # Imported here, as the Spotify module imports this one.
+        from spotify_playlist_utility.Spotify import SpotifyManager
+
+        if os.path.isdir(path):
+            file_paths = sorted(
+                os.path.join(path, file_name) for file_name in os.listdir(path)
+                if os.path.splitext(file_name)[1] in FILE_EXTENSIONS.values())
+        else:
+            file_paths = [path]
+        track_index = cls()
+        for file_path in file_paths:
+            tracks = TrackListing()
+            tracks.import_tracks(file_path, file_format=file_format)
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            playlist_id = SpotifyManager.playlist_id_of_file(file_path)
+            if playlist_id is not None:
+                name = name[:-len(" ({0})".format(playlist_id))]
+            track_index.add_playlist(playlist_id or file_path, name,
+                                     tracks.tracks)
+        return track_index
+
+    @property
+    def playlist_count(self) -> int:
+        return len(self.playlist_tracks)
+
+    @property
+    def track_count(self) -> int:
+        """Number of distinct tracks across every playlist."""
+        return len(self.tracks)
+
+    def postings(self) -> typing.List[array]:
+        """
+        Returns the inverted index: for each track number, the sorted
+        numbers of the playlists containing the track.
+        """
+        if self._postings is None:
+            postings = [array(NUMBER_TYPECODE) for _ in self.tracks]
+            for playlist_number, track_numbers in enumerate(self.playlist_tracks):
+                for track_number in track_numbers:
+                    postings[track_number].append(playlist_number)
+            self._postings = postings
+        return self._postings
+
+    def overlaps(self, min_shared: int = 1) -> typing.List[typing.Tuple[int, int, int, float]]:
+        """
+        Returns the non-zero cells of the pairwise overlap matrix: (playlist
+        number a, playlist number b, shared track count, Jaccard index) of
+        each pair of playlists (a < b) sharing at least 'min_shared' tracks,
+        sorted by playlist numbers.
+
+        With NumPy and SciPy installed, the shared counts are the product of
+        the sparse playlist/track incidence matrix and its transpose.
+        Otherwise they are counted from the inverted index, one playlist at
+        a time. Either way, only pairs that share tracks are ever visited.
+        """
+        min_shared = max(1, min_shared)
+        if sparse is not None:
+            return self._sparse_overlaps(min_shared)
+        return self._posting_overlaps(min_shared)
+
+    def _posting_overlaps(self, min_shared: int = 1) -> typing.List[typing.Tuple[int, int, int, float]]:
+        postings = self.postings()
+        sizes = [len(track_numbers) for track_numbers in self.playlist_tracks]
+        overlaps = []
+        for a, track_numbers in enumerate(self.playlist_tracks):
+            # Each of the playlist's tracks is shared with the playlists
+            # after 'a' in its (sorted) posting.
+            shared_counts = collections.Counter(itertools.chain.from_iterable(
+                postings[track_number][bisect.bisect_right(postings[track_number], a):]
+                for track_number in track_numbers))
+            overlaps.extend(
+                (a, b, shared, shared / (sizes[a] + sizes[b] - shared))
+                for b, shared in sorted(shared_counts.items())
+                if shared >= min_shared)
+        return overlaps
+
+    def _sparse_overlaps(self, min_shared: int = 1) -> typing.List[typing.Tuple[int, int, int, float]]:
+        if not self.playlist_tracks:
+            return []
+        sizes = numpy.array([len(track_numbers) for track_numbers
+                             in self.playlist_tracks], dtype=numpy.int64)
+        indptr = numpy.concatenate(([0], numpy.cumsum(sizes)))
+        indices = numpy.concatenate([
+            numpy.frombuffer(track_numbers, dtype=NUMBER_TYPECODE)
+            for track_numbers in self.playlist_tracks])
+        incidence = sparse.csr_matrix(
+            (numpy.ones(len(indices), dtype=numpy.int32), indices, indptr),
+            shape=(self.playlist_count, self.track_count))
+        shared = sparse.triu(incidence @ incidence.T, k=1).tocoo()
+        kept = shared.data >= min_shared
+        rows, columns, shared_counts = (
+            shared.row[kept], shared.col[kept], shared.data[kept])
+        order = numpy.lexsort((columns, rows))
+        rows, columns, shared_counts = (
+            rows[order], columns[order], shared_counts[order])
+        jaccard = shared_counts / (sizes[rows] + sizes[columns] - shared_counts)
+        return list(zip(rows.tolist(), columns.tolist(),
+                        shared_counts.tolist(), jaccard.tolist()))
+
+    def duplicates(self) -> typing.List[typing.Tuple[Track, array]]:
+        """
+        Returns (track, playlist numbers) of each track in several
+        playlists, most widespread first.
+        """
+        postings = self.postings()
+        duplicates = [(self.tracks[track_number], playlist_numbers)
+                      for track_number, playlist_numbers in enumerate(postings)
+                      if len(playlist_numbers) > 1]
+        duplicates.sort(key=lambda duplicate: -len(duplicate[1]))
+        return duplicates
+
+    def histogram(self, key: typing.Callable[[Track], typing.Hashable]) -> typing.List[typing.Tuple[typing.Hashable, int, int]]:
+        """
+        Returns (key, distinct track count, playlist entry count) of each
+        key of the tracks (e.g. artist), most playlist entries first. A
+        track in three playlists is one distinct track and three entries.
+        """
+        track_counts = collections.Counter()
+        entry_counts = collections.Counter()
+        for track, playlist_numbers in zip(self.tracks, self.postings()):
+            value = key(track)
+            track_counts[value] += 1
+            entry_counts[value] += len(playlist_numbers)
+        return [(value, track_counts[value], entry_count) for value, entry_count
+                in sorted(entry_counts.items(),
+                          key=lambda item: (-item[1], str(item[0])))]
+
+    def artist_histogram(self) -> typing.List[typing.Tuple[str, int, int]]:
+        return self.histogram(lambda track: track.artist)
+
+    def album_histogram(self) -> typing.List[typing.Tuple[typing.Tuple[str, str], int, int]]:
+        """Albums are told apart by (album, artist), as names repeat."""
+        return self.histogram(lambda track: (track.album, track.artist))
+
+
+def build_report(track_index: TrackIndex, min_shared: int = 1) -> typing.Dict[str, typing.List[dict]]:
+    """
+    Returns the report sections of an index, each a list of rows:
+
+        'playlists': Each playlist's ID, name and distinct track count.
+
+        'overlap': Each pair of playlists sharing at least 'min_shared'
+        tracks, with the shared track count and Jaccard index, most similar
+        first.
+
+        'duplicates': Each track in several playlists, and those playlists.
+
+        'artists', 'albums': Distinct tracks and playlist entries of each
+        artist and album.
+    """
+    ids = track_index.playlist_ids
+    names = track_index.playlist_names
+    overlap_rows = [
+        {'playlist_a_id': ids[a], 'playlist_a_name': names[a],
+         'playlist_b_id': ids[b], 'playlist_b_name': names[b],
+         'shared_tracks': shared, 'jaccard': round(jaccard, 6)}
+        for a, b, shared, jaccard in sorted(
+            track_index.overlaps(min_shared), key=lambda overlap: (-overlap[3], -overlap[2]))]
+    return {
+        'playlists': [
+            {'id': playlist_id, 'name': name, 'track_count': len(track_numbers)}
+            for playlist_id, name, track_numbers in zip(
+                ids, names, track_index.playlist_tracks)],
+        'overlap': overlap_rows,
+        'duplicates': [
+            dict(track.csv_export_row(), playlist_count=len(playlist_numbers),
+                 playlists=[names[number] for number in playlist_numbers])
+            for track, playlist_numbers in track_index.duplicates()],
+        'artists': [
+            {'artist': artist, 'track_count': track_count,
+             'playlist_entry_count': entry_count}
+            for artist, track_count, entry_count
+            in track_index.artist_histogram()],
+        'albums': [
+            {'album': album, 'artist': artist, 'track_count': track_count,
+             'playlist_entry_count': entry_count}
+            for (album, artist), track_count, entry_count
+            in track_index.album_histogram()],
+    }
+
+
+def write_report(track_index: TrackIndex, output_path: str, min_shared: int = 1) -> None:
+    """
+    Saves the report of an index (see 'build_report'): as one JSON document
+    if 'output_path' ends in '.json', else as one .csv file per section in
+    the 'output_path' directory. In .csv files, the playlists of a
+    duplicate are joined by '; '.
+    """
+    report = build_report(track_index, min_shared)
+    if os.path.splitext(output_path)[1].lower() == '.json':
+        with open(output_path, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, ensure_ascii=False, indent=1)
+        return
+
+    os.makedirs(output_path, exist_ok=True)
+    for section, rows in report.items():
+        if section == 'duplicates':
+            rows = [dict(row, playlists='; '.join(row['playlists']))
+                    for row in rows]
+        with open(os.path.join(output_path, section + '.csv'), 'w',
+                  newline='', encoding='utf-8') as report_file:
+            writer = csv.DictWriter(
+                report_file, fieldnames=REPORT_FIELDS[section])
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,709 @@
+import asyncio
+import configparser
+import json
+import os
+import random
+import sys
+import typing
+from pathlib import Path
+
+import spotipy
+from spotipy.oauth2 import SpotifyOAuth
+
+try:
+    import aiohttp
+except ImportError:  # Optional, see the 'async' extra in setup.cfg.
+    aiohttp = None
+
+from spotify_playlist_utility.Auth import TokenManager
+from spotify_playlist_utility.Cache import MetadataCache
+from spotify_playlist_utility.Instrumentation import Profiler, TransferCounter
+from spotify_playlist_utility.Paginator import AsyncOffsetPaginator
+from spotify_playlist_utility.Scheduler import RequestScheduler
+from spotify_playlist_utility.Shuffle import plan_block_moves
+from spotify_playlist_utility.Spotify import SpotifyManager
+from spotify_playlist_utility.TrackLists import (FILE_EXTENSIONS, Playlist,
+                                                 TrackListing,
+                                                 drop_local_tracks,
+                                                 is_local_uri)
+
+
+class AccessToken():
+    """
+    Hands out the access token of a TokenManager to async requests. While
+    the token is fresh (the TokenManager refreshes it in the background)
+    it is returned directly; obtaining it otherwise (on first use, which
+    may prompt for authorization) runs off the event loop.
+    """
+
+    def __init__(self, token_manager: TokenManager) -> None:
+        self.token_manager = token_manager
+        self.lock = None
+
+    async def __call__(self) -> str:
+        token_info = self.token_manager.token_info
+        if token_info is not None and not SpotifyOAuth.is_token_expired(token_info):
+            return token_info['access_token']
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            token_info = self.token_manager.token_info
+            if token_info is not None and not SpotifyOAuth.is_token_expired(token_info):
+                return token_info['access_token']
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.token_manager.get_access_token)
+
+
+class AsyncSpotifyClient():
+    """
+    Minimal asyncio client for the Spotify Web API over a pooled,
+    keep-alive aiohttp session. Its methods mirror the spotipy.Spotify
+    methods used by SpotifyManager (same names, arguments and results), but
+    are coroutines. Error responses raise spotipy.SpotifyException, so
+    RequestScheduler's retry policy applies unchanged.
+    """
+
+    API_PREFIX = 'https://api.spotify.com/v1/'
+
+    def __init__(self, session: 'aiohttp.ClientSession',
+                 access_token: typing.Callable[[], typing.Awaitable[str]],
+                 prefix: str = API_PREFIX,
+                 transfer_counter: TransferCounter = None) -> None:
+        """
+        Args:
+            session (aiohttp.ClientSession): Session whose connector pools
+            the connections.
+            access_token (typing.Callable[[], typing.Awaitable[str]]):
+            Coroutine function returning a valid access token.
+            prefix (str): Base URL of the Web API.
+            transfer_counter (TransferCounter): Counts received responses.
+        """
+        self.session = session
+        self.access_token = access_token
+        self.prefix = prefix
+        self.transfer_counter = transfer_counter
+
+    async def _request(self, method: str, path: str, params: dict = None,
+                       payload: dict = None) -> typing.Optional[dict]:
+        headers = {'Authorization': 'Bearer {0}'.format(
+            await self.access_token())}
+        params = {name: value for name, value in (params or {}).items()
+                  if value is not None}
+        async with self.session.request(method, self.prefix + path,
+                                        params=params, json=payload,
+                                        headers=headers) as response:
+            body = await response.read()
+            if self.transfer_counter is not None:
+                self.transfer_counter.add(len(body))
+            if response.status >= 400:
+                try:
+                    error = json.loads(body)['error']
+                    message, reason = error.get('message'), error.get('reason')
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    message, reason = body.decode(errors='replace') or None, None
+                raise spotipy.SpotifyException(
+                    response.status, -1,
+                    "{0}:\n {1}".format(response.url, message),
+                    reason=reason, headers=dict(response.headers))
+        return json.loads(body) if body else None
+
+    async def me(self) -> dict:
+        return await self._request('GET', 'me')
+
+    async def current_user_saved_tracks(self, limit=20, offset=0, market=None) -> dict:
+        return await self._request('GET', 'me/tracks', params={
+            'limit': limit, 'offset': offset, 'market': market})
+
+    async def current_user_playlists(self, limit=50, offset=0) -> dict:
+        return await self._request('GET', 'me/playlists', params={
+            'limit': limit, 'offset': offset})
+
+    async def playlist(self, playlist_id, fields=None, market=None) -> dict:
+        return await self._request(
+            'GET', 'playlists/{0}'.format(playlist_id),
+            params={'fields': fields, 'market': market})
+
+    async def playlist_items(self, playlist_id, fields=None, limit=100,
+                             offset=0, market=None) -> dict:
+        return await self._request(
+            'GET', 'playlists/{0}/items'.format(playlist_id),
+            params={'fields': fields, 'limit': limit, 'offset': offset,
+                    'market': market})
+
+    async def user_playlist_create(self, user, name, public=True,
+                                   collaborative=False, description='') -> dict:
+        return await self._request(
+            'POST', 'users/{0}/playlists'.format(user),
+            payload={'name': name, 'public': public,
+                     'collaborative': collaborative,
+                     'description': description})
+
+    async def playlist_add_items(self, playlist_id, items, position=None) -> dict:
+        payload = {'uris': list(items)}
+        if position is not None:
+            payload['position'] = position
+        return await self._request(
+            'POST', 'playlists/{0}/items'.format(playlist_id), payload=payload)
+
+    async def playlist_replace_items(self, playlist_id, items) -> dict:
+        return await self._request(
+            'PUT', 'playlists/{0}/items'.format(playlist_id),
+            payload={'uris': list(items)})
+
+    async def playlist_reorder_items(self, playlist_id, range_start,
+                                     insert_before, range_length=1,
+                                     snapshot_id=None) -> dict:
+        payload = {'range_start': range_start, 'insert_before': insert_before,
+                   'range_length': range_length}
+        if snapshot_id is not None:
+            payload['snapshot_id'] = snapshot_id
+        return await self._request(
+            'PUT', 'playlists/{0}/items'.format(playlist_id), payload=payload)
+
+
+class AsyncRequestScheduler(RequestScheduler):
+    """
+    RequestScheduler for AsyncSpotifyClient: the same pacing and retry
+    policy, but calls are coroutines and waiting never blocks the event
+    loop.
+    """
+
+    async def call(self, name: str, function: typing.Callable, *args, **kwargs):
+        write = name in RequestScheduler.WRITE_METHODS
+        attempt = 0
+        while True:
+            waited = await self.bucket.acquire_async(write)
+            with self.lock:
+                self.request_count += 1
+                self.wait_time += waited
+            try:
+                with self._profile(name):
+                    return await function(*args, **kwargs)
+            except spotipy.SpotifyException as error:
+                delay = self._retry_delay(error, write, attempt)
+                if delay is None:
+                    raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if write or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            self._count_retry(name, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+class AsyncSpotifyManager(object):
+    """
+    asyncio counterpart of SpotifyManager, for large libraries. Offers the
+    same non-interactive operations, as coroutines. Requests share one
+    pooled aiohttp session and fan-out (page fetches, track count lookups,
+    chunk writes) runs as tasks instead of on thread pools, so up to
+    'concurrency' requests can be in flight at once. Requests are still
+    paced by the 'RequestsPerSecond'/'RequestBurst' config keys.
+
+    Requires the optional 'aiohttp' dependency.
+
+    Usage:
+        async with AsyncSpotifyManager(config_parser) as manager:
+            await manager.export_all_playlists(directory)
+    """
+
+    DEFAULT_CONCURRENCY = 64
+
+    def __init__(self, config_parser: configparser.ConfigParser,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 cache: MetadataCache = None,
+                 scope_sets: typing.Iterable[str] = (),
+                 profiler: Profiler = None):
+        """
+        Args:
+            config_parser (configparser.ConfigParser): Parsed config file.
+            concurrency (int): Max number of API requests in flight.
+            cache (MetadataCache): Playlist metadata cache, or None to
+            always refetch.
+            scope_sets (typing.Iterable[str]): SCOPES keys of every
+            operation planned for this run, authorized together up front.
+            profiler (Profiler): Records per-endpoint request stats and
+            local phase timings, or None to not profile.
+        """
+        self.config_parser = config_parser
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.scope_sets = list(scope_sets)
+        self.profiler = profiler
+        self.transfer_counter = TransferCounter()
+        self.transfer_counter.profiler = profiler
+        self.authorized = False
+        self.token_manager = None
+        self.session = None
+        self.sp = None
+        self.user_id = None
+
+    async def __aenter__(self) -> 'AsyncSpotifyManager':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Closes the pooled session, if one was opened."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.token_manager is not None:
+            self.token_manager.stop()
+
+    async def authorize(self, scope_set: str) -> None:
+        """See SpotifyManager.authorize."""
+        if self.authorized and (self.token_manager is None or SpotifyManager.scopes_granted(
+                self.token_manager.scope, [scope_set])):
+            return
+        if aiohttp is None:
+            sys.exit("The async backend requires the 'aiohttp' package: "
+                     "pip install spotify-playlist-utility[async]")
+        if scope_set not in self.scope_sets:
+            self.scope_sets.append(scope_set)
+
+        if self.token_manager is not None:
+            self.token_manager.stop()
+        auth_manager = SpotifyManager.build_auth_manager(
+            self.config_parser, SpotifyManager.scopes_of(self.scope_sets))
+        self.token_manager = TokenManager(auth_manager)
+        if self.sp is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency))
+            self.sp = AsyncRequestScheduler.from_config(
+                self.config_parser,
+                AsyncSpotifyClient(self.session, AccessToken(self.token_manager),
+                                   transfer_counter=self.transfer_counter))
+            self.sp.profiler = self.profiler
+        else:
+            self.sp.client.access_token = AccessToken(self.token_manager)
+        self.authorized = True
+        self.user_id = SpotifyManager.cached_user_id(auth_manager)
+        if self.user_id is None:
+            self.user_id = (await self.sp.me())['id']
+            SpotifyManager.cache_user_id(auth_manager, self.user_id)
+
+    phase = SpotifyManager.phase
+    cache_prepended_tracks = SpotifyManager.cache_prepended_tracks
+
+    def paginate(self, fetch_page: typing.Callable[[int], typing.Awaitable[dict]]) -> AsyncOffsetPaginator:
+        return AsyncOffsetPaginator(fetch_page, concurrency=self.concurrency)
+
+    async def iter_saved_track_pages(self) -> typing.AsyncIterator[list]:
+        """
+        Yields the user's saved tracks one page at a time, in listing order.
+        """
+        paginator = self.paginate(
+            lambda offset: self.sp.current_user_saved_tracks(
+                limit=SpotifyManager.LIBRARY_PAGE_SIZE, offset=offset))
+        async for saved_tracks_response in paginator.pages():
+            with self.phase('build_tracks'):
+                saved_track_page = [
+                    SpotifyManager.build_track_object_from_data(saved_track_data['track'])
+                    for saved_track_data in saved_tracks_response['items']]
+            yield saved_track_page
+
+    async def get_saved_tracks(self) -> TrackListing:
+        saved_tracks = TrackListing()
+        async for saved_track_page in self.iter_saved_track_pages():
+            saved_tracks.tracks.extend(saved_track_page)
+        return saved_tracks
+
+    async def export_saved_tracks(self, file_path: str, file_format: str = None) -> None:
+        """See SpotifyManager.export_saved_tracks."""
+        await self.authorize("ExportSavedTracks")
+        # Each page is written as it arrives, as by SpotifyManager.
+        with self.phase('write_tracks'), TrackListing.track_page_writer(
+                file_path, file_format=file_format) as write_page:
+            async for saved_track_page in self.iter_saved_track_pages():
+                write_page(saved_track_page)
+
+    async def get_playlists(self, resolve_track_counts: bool = True) -> typing.List[Playlist]:
+        """
+        See SpotifyManager.get_playlists (including why track counts are
+        looked up separately).
+        """
+        paginator = self.paginate(
+            lambda offset: self.sp.current_user_playlists(
+                limit=SpotifyManager.LIBRARY_PAGE_SIZE, offset=offset))
+        playlists_data = [playlist_data
+                          async for playlist_data in paginator.items()]
+
+        if resolve_track_counts:
+            track_counts = [None] * len(playlists_data)
+            if self.cache is not None:
+                for index, playlist_data in enumerate(playlists_data):
+                    track_counts[index] = self.cache.get_track_count(
+                        playlist_data['id'], playlist_data['snapshot_id'])
+            uncached_indices = [index for index, track_count in enumerate(
+                track_counts) if track_count is None]
+            fetched_track_counts = await self.get_playlist_track_counts(
+                [playlists_data[index]['id'] for index in uncached_indices])
+            for index, track_count in zip(uncached_indices, fetched_track_counts):
+                track_counts[index] = track_count
+            if self.cache is not None:
+                self.cache.put_many(
+                    (playlists_data[index]['id'],
+                     playlists_data[index]['snapshot_id'], track_count, None)
+                    for index, track_count in zip(uncached_indices,
+                                                  fetched_track_counts))
+        else:
+            track_counts = [playlist_data['tracks']['total']
+                            for playlist_data in playlists_data]
+
+        return [Playlist(uri=playlist_data['uri'], name=playlist_data['name'], description=playlist_data['description'], track_count=track_count, snapshot_id=playlist_data['snapshot_id'])
+                for playlist_data, track_count in zip(playlists_data, track_counts)]
+
+    async def get_playlist_track_counts(self, playlist_ids: typing.List[str]) -> typing.List[int]:
+        """
+        Resolves the track count of each playlist ID, with every lookup
+        issued at once (bounded by the session's connection pool).
+
+        Returns:
+            typing.List[int]: Track counts, in the same order as playlist_ids.
+        """
+        playlist_responses = await asyncio.gather(*[
+            self.sp.playlist(playlist_id, fields='tracks.total')
+            for playlist_id in playlist_ids])
+        return [playlist_response['tracks']['total']
+                for playlist_response in playlist_responses]
+
+    async def get_playlist(self, playlist_id: str) -> Playlist:
+        """See SpotifyManager.get_playlist."""
+        playlist_response = await self.sp.playlist(
+            playlist_id, fields=SpotifyManager.PLAYLIST_FIELDS)
+        playlist = Playlist(
+            uri=playlist_response["uri"],
+            name=playlist_response["name"],
+            description=playlist_response["description"],
+            track_count=playlist_response["tracks"]["total"],
+            snapshot_id=playlist_response["snapshot_id"]
+        )
+        if self.cache is not None:
+            cached_tracks = self.cache.get_tracks(
+                playlist.id, playlist.snapshot_id)
+            if cached_tracks is not None:
+                playlist.tracks.extend(cached_tracks)
+                return playlist
+
+        paginator = self.paginate(
+            lambda offset: self.sp.playlist_items(
+                playlist.id, fields=SpotifyManager.PLAYLIST_ITEMS_FIELDS,
+                limit=SpotifyManager.PLAYLIST_ITEMS_PAGE_SIZE, offset=offset))
+        async for playlist_items_response in paginator.pages():
+            with self.phase('build_tracks'):
+                playlist.tracks.extend(
+                    SpotifyManager.build_track_object_from_data(playlist_track_data['track'])
+                    for playlist_track_data in playlist_items_response['items'])
+        if self.cache is not None:
+            self.cache.put(playlist.id, playlist.snapshot_id,
+                           playlist.track_count, playlist.tracks)
+        return playlist
+
+    async def export_playlist_tracks(self, playlist_id: str, filepath: str, file_format: str = None) -> None:
+        """
+        Saves a listing of the tracks of the playlist with the given ID (no
+        interactive picker, unlike SpotifyManager.export_playlist_tracks).
+        """
+        await self.authorize("ExportPlaylistTracks")
+        playlist = await self.get_playlist(playlist_id)
+        with self.phase('write_tracks'):
+            playlist.export_tracks(filepath, file_format=file_format)
+
+    async def export_all_playlists(self, directory: str, file_format: str = None) -> None:
+        """See SpotifyManager.export_all_playlists."""
+        file_extension = FILE_EXTENSIONS[file_format or 'csv']
+        await self.authorize("ExportPlaylistTracks")
+        if directory == 'const':
+            directory = os.path.join(os.getcwd(), "all_playlists")
+        os.makedirs(directory, exist_ok=True)
+
+        manifest_path = os.path.join(
+            directory, SpotifyManager.EXPORT_MANIFEST_NAME)
+        manifest = SpotifyManager.load_export_manifest(manifest_path)
+
+        playlists = await self.get_playlists(resolve_track_counts=False)
+        pending_playlists = SpotifyManager.changed_playlists(
+            playlists, manifest, directory)
+        print("Exporting {0} of {1} playlists ({2} unchanged since last export).".format(
+            len(pending_playlists), len(playlists),
+            len(playlists) - len(pending_playlists)))
+
+        async def export(playlist: Playlist) -> typing.Tuple[Playlist, typing.Optional[Exception]]:
+            try:
+                playlist = await self.get_playlist(playlist.id)
+            except Exception as error:
+                return playlist, error
+            file_name = SpotifyManager.export_file_name(
+                playlist, file_extension)
+            with self.phase('write_tracks'):
+                TrackListing.export_track_pages(
+                    [playlist.tracks], os.path.join(directory, file_name),
+                    announce=False, file_format=file_format)
+            return playlist, None
+
+        failure_count = 0
+        try:
+            exports = [export(playlist) for playlist in pending_playlists]
+            for done_count, finished_export in enumerate(
+                    asyncio.as_completed(exports), 1):
+                playlist, error = await finished_export
+                if error is not None:
+                    failure_count += 1
+                    print("[{0}/{1}] Failed: {2} ({3})".format(
+                        done_count, len(exports), playlist.name, error))
+                    continue
+                manifest[playlist.id] = {
+                    'snapshot_id': playlist.snapshot_id,
+                    'file': SpotifyManager.export_file_name(playlist, file_extension)}
+                print("[{0}/{1}] Exported: {2}".format(
+                    done_count, len(exports), playlist.name))
+        finally:
+            with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+                json.dump(manifest, manifest_file, indent=2)
+
+        print("Playlist Export Files saved to the following directory: {0}{1}".format(
+            directory, " ({0} failed)".format(failure_count) if failure_count else ""))
+
+    async def import_tracks_to_playlist(self, filepath: str, dedup: str = None, file_format: str = None) -> str:
+        """
+        See SpotifyManager.import_tracks_to_playlist. Every track chunk is
+        added at once, then the chunk order is restored with block moves.
+        """
+        await self.authorize("ImportTracksToPlaylist")
+        imported_tracks = TrackListing()
+        with self.phase('read_tracks'):
+            imported_tracks.import_tracks(
+                filepath, dedup=dedup, file_format=file_format)
+
+        name = Path(filepath).stem
+        track_ids = [imported_track.uri for imported_track
+                     in drop_local_tracks(imported_tracks.tracks)]
+
+        checkpoint_path = filepath + '.checkpoint.json'
+        checkpoint = SpotifyManager.load_import_checkpoint(
+            checkpoint_path, len(track_ids))
+        resumed = checkpoint is not None
+        if checkpoint is None:
+            checkpoint = {'track_count': len(track_ids),
+                          'seed': random.randrange(2 ** 32),
+                          'confirmed_chunks': []}
+            checkpoint['playlist_id'] = (await self.sp.user_playlist_create(
+                self.user_id, name, public=False))['id']
+            SpotifyManager.write_import_checkpoint(checkpoint_path, checkpoint)
+            print(
+                "Tracks Import File uploaded as Spotify playlist with the following name: {0}".format(name))
+        else:
+            print("Resuming import into Spotify playlist with the following name: {0}".format(name))
+        playlist_id = checkpoint['playlist_id']
+
+        random.Random(checkpoint['seed']).shuffle(track_ids)
+        track_id_chunks = SpotifyManager.chunk_list(track_ids, 100)
+
+        confirmed_chunks = set(checkpoint['confirmed_chunks'])
+        if resumed:
+            chunk_order = SpotifyManager.match_chunks(
+                await self.get_playlist_uris(playlist_id), track_id_chunks)
+            if chunk_order is not None:
+                confirmed_chunks = set(chunk_order)
+
+        async def add_chunk(chunk_index: int) -> int:
+            await self.sp.playlist_add_items(
+                playlist_id, track_id_chunks[chunk_index])
+            return chunk_index
+
+        pending_chunks = [chunk_index for chunk_index in range(
+            len(track_id_chunks)) if chunk_index not in confirmed_chunks]
+        failures = []
+        for finished_chunk in asyncio.as_completed(
+                [add_chunk(chunk_index) for chunk_index in pending_chunks]):
+            try:
+                confirmed_chunks.add(await finished_chunk)
+            except Exception as error:
+                failures.append(error)
+                continue
+            checkpoint['confirmed_chunks'] = sorted(confirmed_chunks)
+            SpotifyManager.write_import_checkpoint(checkpoint_path, checkpoint)
+
+        if failures:
+            sys.exit("Import interrupted after {0} of {1} track chunks ({2}). "
+                     "Rerun the import to resume.".format(
+                         len(confirmed_chunks), len(track_id_chunks), failures[0]))
+
+        await self.restore_chunk_order(playlist_id, track_id_chunks)
+
+        os.remove(checkpoint_path)
+        return playlist_id
+
+    async def get_playlist_uris(self, playlist_id: str) -> typing.List[str]:
+        """Returns the track URIs of a playlist, in playlist order."""
+        paginator = self.paginate(
+            lambda offset: self.sp.playlist_items(
+                playlist_id, fields='items(track(uri)),limit,offset,total',
+                limit=SpotifyManager.PLAYLIST_ITEMS_PAGE_SIZE, offset=offset))
+        return [item['track']['uri'] async for item in paginator.items()]
+
+    async def restore_chunk_order(self, playlist_id: str, chunks: typing.List[typing.List[str]]) -> None:
+        """See SpotifyManager.restore_chunk_order."""
+        chunk_order = SpotifyManager.match_chunks(
+            await self.get_playlist_uris(playlist_id), chunks)
+        if chunk_order is None or len(chunk_order) != len(chunks):
+            sys.exit("Imported playlist contents do not match the import file. "
+                     "Track order was not verified.")
+        chunk_starts = [0]
+        for chunk in chunks:
+            chunk_starts.append(chunk_starts[-1] + len(chunk))
+        current_order = []
+        for chunk_index in chunk_order:
+            current_order.extend(range(
+                chunk_starts[chunk_index], chunk_starts[chunk_index + 1]))
+        snapshot_id = None
+        # Each move is guarded by the snapshot of the previous one, so moves
+        # are applied one at a time.
+        with self.phase('plan_moves'):
+            moves = plan_block_moves(current_order)
+        for range_start, insert_before, range_length in moves:
+            snapshot_id = (await self.sp.playlist_reorder_items(
+                playlist_id, range_start, insert_before,
+                range_length=range_length, snapshot_id=snapshot_id
+            ))['snapshot_id']
+
+    async def shuffle_playlist(self, playlist: Playlist, mode: str = 'replace') -> int:
+        """
+        See SpotifyManager.shuffle_playlist.
+
+        Returns:
+            int: Number of API write calls made.
+        """
+        track_uris = [track.uri for track in playlist.tracks]
+        target_order = list(range(len(track_uris)))
+        random.shuffle(target_order)
+        api_call_count = 0
+        if mode == 'replace' and any(is_local_uri(uri) for uri in track_uris):
+            print("Playlist '{0}' has local files, so it is shuffled with "
+                  "moves.".format(playlist.name))
+            mode = 'moves'
+
+        if mode == 'moves':
+            current_order = [0] * len(target_order)
+            for position, source_position in enumerate(target_order):
+                current_order[source_position] = position
+            snapshot_id = playlist.snapshot_id
+            with self.phase('plan_moves'):
+                moves = plan_block_moves(current_order)
+            for range_start, insert_before, range_length in moves:
+                snapshot_id = (await self.sp.playlist_reorder_items(
+                    playlist.id, range_start, insert_before,
+                    range_length=range_length, snapshot_id=snapshot_id
+                ))['snapshot_id']
+                api_call_count += 1
+        elif mode == 'replace':
+            current_snapshot_id = (await self.sp.playlist(
+                playlist.id, fields='snapshot_id'))['snapshot_id']
+            if current_snapshot_id != playlist.snapshot_id:
+                sys.exit("Playlist '{0}' changed since it was fetched. "
+                         "Exiting without shuffling.".format(playlist.name))
+            tracks = list(playlist.tracks)
+            shuffled_tracks = [tracks[position] for position in target_order]
+            shuffled_uris = [track.uri for track in shuffled_tracks]
+            recovery_path = os.path.join(
+                os.getcwd(), SpotifyManager.SHUFFLE_RECOVERY_PREFIX
+                + SpotifyManager.export_file_name(playlist))
+            TrackListing.export_track_pages(
+                [shuffled_tracks], recovery_path, announce=False,
+                file_format='csv')
+            track_uri_chunks = SpotifyManager.chunk_list(
+                shuffled_uris, 100) or [[]]
+            try:
+                # Chunks are appended in order, so they are written one at a
+                # time.
+                await self.sp.playlist_replace_items(playlist.id, track_uri_chunks[0])
+                api_call_count += 1
+                for track_uri_chunk in track_uri_chunks[1:]:
+                    await self.sp.playlist_add_items(playlist.id, track_uri_chunk)
+                    api_call_count += 1
+            except (spotipy.SpotifyException, aiohttp.ClientError,
+                    asyncio.TimeoutError) as error:
+                sys.exit("Shuffle of playlist '{0}' was interrupted ({1}). Its "
+                         "shuffled tracks are saved at the following path; "
+                         "restore them with '--sync': {2}".format(
+                             playlist.name, error, recovery_path))
+            os.remove(recovery_path)
+        else:
+            raise ValueError("Unknown shuffle mode: {0}".format(mode))
+
+        return api_call_count
+
+    async def export_saved_tracks_to_liked_memory_playlist(self, full_resync: bool = False) -> typing.Optional[str]:
+        """See SpotifyManager.export_saved_tracks_to_liked_memory_playlist."""
+        await self.authorize("ExportSavedTracksToLikedMemoryPlaylist")
+        watermark_name = 'saved_tracks_added_at:{0}'.format(self.user_id)
+        added_after = None
+        if self.cache is not None and not full_resync:
+            added_after = self.cache.get_watermark(watermark_name)
+
+        # Saved tracks are listed first (with at most one page prefetched,
+        # see SpotifyManager.get_saved_tracks_added_after): without new ones,
+        # nothing else is fetched.
+        saved_tracks, newest_added_at = await self.get_saved_tracks_added_after(
+            added_after)
+        if added_after is not None and newest_added_at == added_after:
+            print("No tracks saved since the previous run.")
+            return None
+        playlists = await self.get_playlists(resolve_track_counts=False)
+
+        liked_memory_playlist_list = [
+            x for x in playlists if x.name == "Liked Memory"]
+        if not liked_memory_playlist_list:
+            liked_memory_playlist_id = (await self.sp.user_playlist_create(
+                self.user_id, "Liked Memory", public=False))['id']
+        elif len(liked_memory_playlist_list) == 1:
+            liked_memory_playlist_id = liked_memory_playlist_list[0].id
+        else:
+            sys.exit(
+                "Too many playlists matching the 'Liked Memory' name found.... Don't know which one is correct. Exiting.")
+
+        liked_memory_playlist = await self.get_playlist(liked_memory_playlist_id)
+        saved_tracks_to_append = saved_tracks.difference(liked_memory_playlist)
+        saved_track_to_append_chunks = SpotifyManager.chunk_list(
+            saved_tracks_to_append.tracks, 100)
+
+        # Chunks are inserted at the top in listing order, so they are
+        # written one at a time.
+        snapshot_id = None
+        for saved_track_to_append_chunk in saved_track_to_append_chunks:
+            snapshot_id = (await self.sp.playlist_add_items(
+                liked_memory_playlist_id,
+                [track.uri for track in saved_track_to_append_chunk], 0))['snapshot_id']
+        if snapshot_id is not None:
+            self.cache_prepended_tracks(
+                liked_memory_playlist, saved_track_to_append_chunks, snapshot_id)
+
+        if self.cache is not None and newest_added_at is not None:
+            self.cache.set_watermark(watermark_name, newest_added_at)
+
+        return liked_memory_playlist_id
+
+    async def get_saved_tracks_added_after(self, added_after: str = None) -> typing.Tuple[TrackListing, typing.Optional[str]]:
+        """See SpotifyManager.get_saved_tracks_added_after."""
+        saved_tracks = TrackListing()
+        newest_added_at = added_after
+        paginator = AsyncOffsetPaginator(
+            lambda offset: self.sp.current_user_saved_tracks(
+                limit=SpotifyManager.LIBRARY_PAGE_SIZE, offset=offset))
+        saved_tracks_data = paginator.items()
+        try:
+            async for saved_track_data in saved_tracks_data:
+                added_at = saved_track_data['added_at']
+                if added_after is not None and added_at < added_after:
+                    break
+                if newest_added_at is None or added_at > newest_added_at:
+                    newest_added_at = added_at
+                saved_tracks.tracks.append(SpotifyManager.build_track_object_from_data(
+                    saved_track_data['track']))
+        finally:
+            # Cancels the page still in flight when stopping early.
+            await saved_tracks_data.aclose()
+        return saved_tracks, newest_added_at
@@ -0,0 +1,103 @@
+import threading
+import time
+import typing
+
+from spotipy.oauth2 import SpotifyOAuth
+
+
+class TokenManager():
+    """
+    Access token source shared by every request of a run. Usable as the
+    'auth_manager' of a spotipy.Spotify client, in place of the wrapped
+    SpotifyOAuth auth manager.
+
+    The token is held in memory, so handing it out never touches the token
+    cache file or the network. A background thread refreshes it
+    'refresh_margin' seconds before it expires, so requests (and long,
+    unattended runs) never wait on a refresh. Only the first request, or
+    one made after background refreshes kept failing until expiry,
+    obtains the token itself.
+    """
+
+    REFRESH_MARGIN = 300.0  # seconds before expiry
+    RETRY_DELAY = 30.0  # seconds between failed background refreshes
+
+    def __init__(self, auth_manager: SpotifyOAuth,
+                 refresh_margin: float = REFRESH_MARGIN,
+                 retry_delay: float = RETRY_DELAY) -> None:
+        """
+        Args:
+            auth_manager (SpotifyOAuth): Auth manager for the scopes of the
+            whole run.
+            refresh_margin (float): Seconds before expiry to refresh at.
+            retry_delay (float): Seconds to wait after a failed refresh.
+        """
+        self.auth_manager = auth_manager
+        self.refresh_margin = refresh_margin
+        self.retry_delay = retry_delay
+        self.token_info = None
+        self.refresh_count = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @property
+    def scope(self) -> str:
+        return self.auth_manager.scope
+
+    def get_access_token(self, as_dict: bool = False) -> typing.Union[str, dict]:
+        token_info = self.token_info
+        if token_info is None or SpotifyOAuth.is_token_expired(token_info):
+            with self.lock:
+                token_info = self.token_info
+                if token_info is None or SpotifyOAuth.is_token_expired(token_info):
+                    # Reads (or refreshes) the cached token, authorizing
+                    # the user first if there is none.
+                    self.auth_manager.get_access_token(as_dict=False)
+                    token_info = self.token_info = \
+                        self.auth_manager.cache_handler.get_cached_token()
+                    self.start()
+        return token_info if as_dict else token_info['access_token']
+
+    def refresh(self) -> None:
+        """
+        Refreshes the token now. The user ID stored with the cached token
+        (see SpotifyManager.cache_user_id) is carried over.
+        """
+        with self.lock:
+            cache_handler = self.auth_manager.cache_handler
+            user_id = (cache_handler.get_cached_token() or {}).get('user_id')
+            token_info = self.auth_manager.refresh_access_token(
+                self.token_info['refresh_token'])
+            if user_id is not None:
+                token_info['user_id'] = user_id
+                cache_handler.save_token_to_cache(token_info)
+            self.token_info = token_info
+            self.refresh_count += 1
+
+    def start(self) -> None:
+        """Starts the background refresh thread, unless already running."""
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self._refresh_loop, name='token-refresh', daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        """Stops the background refresh thread."""
+        self.stopped.set()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            delay = (self.token_info['expires_at'] - self.refresh_margin
+                     - time.time())
+            # At least a second apart, should tokens live shorter than the
+            # margin.
+            if self.stopped.wait(max(delay, 1.0)):
+                return
+            try:
+                self.refresh()
+            except Exception:
+                # The current token stays in use; a request made once it
+                # has expired refreshes it directly.
+                if self.stopped.wait(self.retry_delay):
+                    return
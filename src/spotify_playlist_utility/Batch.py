@@ -0,0 +1,255 @@
+import argparse
+import concurrent.futures
+import configparser
+import contextlib
+import json
+import sys
+import threading
+import time
+import typing
+from pathlib import Path
+
+from spotify_playlist_utility.Cache import MetadataCache
+from spotify_playlist_utility.Scheduler import (RequestScheduler, TokenBucket,
+                                                build_session)
+from spotify_playlist_utility.Spotify import SpotifyManager
+
+
+class BatchRunner():
+    """
+    Runs CLI commands for many accounts (config files) in one process, as
+    listed in a JSON manifest:
+
+        {
+            "concurrency": 4,
+            "requests_per_second": 10,
+            "request_burst": 20,
+            "summary": "batch_summary.json",
+            "accounts": [
+                {"config": "alice.ini", "commands": [["-e", "exports/alice"], ["-a"]]},
+                {"config": "bob.ini", "commands": [["--sync", "curated/bob"]]}
+            ]
+        }
+
+    Each command is the CLI arguments of one run, without the config file.
+    '--no-cache', '--refresh' and '--concurrency' apply to their command
+    only. Accounts run 'concurrency' at a time, each with its own SpotifyManager
+    (authorized once for all of its commands) and token cache. Every
+    account shares one connection pool and one request rate budget, since
+    the Web API rate limits the app rather than each user. Playlist
+    metadata caches are shared by accounts with the same 'CacheDir'.
+
+    A JSON summary of each account's commands (status, error, timing) and
+    request stats is written to 'summary', or printed if none is given.
+
+    Keys other than 'accounts' are optional; the values shown for
+    'concurrency', 'requests_per_second' and 'request_burst' are their
+    defaults. Relative paths are relative to the working directory.
+    """
+
+    DEFAULT_CONCURRENCY = 4  # accounts run at once
+
+    # Commands that only make sense once per run.
+    UNSUPPORTED_OPTIONS = {
+        'config': 'the config file (given by the account)',
+        'batch': "'--batch'",
+        'convert': "'-c'",
+        'use_async': "'--async'",
+        'analyze_input': "'--analyze-input' (local)",
+        'profile': "'--profile'",
+        'profile_python': "'--profile-python'",
+        'verbose': "'--verbose' (request stats are always in the summary)",
+    }
+
+    # Commands that prompt for a playlist unless given '--playlist'.
+    INTERACTIVE_OPTIONS = {
+        'export_playlist_tracks': "'-p' without '--playlist'",
+        'shuffle_playlist_tracks': "'-z' without '--playlist'",
+    }
+
+    def __init__(self, manifest: dict, argument_parser: argparse.ArgumentParser,
+                 run_command: typing.Callable[[SpotifyManager, argparse.Namespace], None],
+                 scope_sets_of: typing.Callable[[argparse.Namespace], typing.List[str]]) -> None:
+        """
+        Args:
+            manifest (dict): Parsed manifest (see class docstring).
+            argument_parser (argparse.ArgumentParser): CLI argument parser,
+            to parse each command.
+            run_command: Runs the command of parsed arguments on a manager.
+            scope_sets_of: Returns the SCOPES keys of parsed arguments.
+        """
+        self.run_command = run_command
+        self.concurrency = max(1, int(manifest.get(
+            'concurrency', BatchRunner.DEFAULT_CONCURRENCY)))
+        self.summary_path = manifest.get('summary')
+        self.bucket = TokenBucket(
+            float(manifest.get('requests_per_second',
+                               RequestScheduler.DEFAULT_RATE)),
+            float(manifest.get('request_burst',
+                               RequestScheduler.DEFAULT_BURST)))
+
+        self.accounts = []
+        for account in manifest['accounts']:
+            commands = []
+            for command in account['commands']:
+                args = argument_parser.parse_args(command)
+                unsupported_options = dict(BatchRunner.UNSUPPORTED_OPTIONS)
+                if not args.playlists:
+                    unsupported_options.update(BatchRunner.INTERACTIVE_OPTIONS)
+                for option, description in unsupported_options.items():
+                    if getattr(args, option):
+                        sys.exit("Batch commands cannot use {0}: {1} ({2})".format(
+                            description, ' '.join(command), account['config']))
+                commands.append((command, args))
+            scope_sets = []
+            for _, args in commands:
+                scope_sets.extend(scope_set for scope_set in scope_sets_of(args)
+                                  if scope_set not in scope_sets)
+            self.accounts.append((account['config'], commands, scope_sets))
+
+        self.session = None
+        self.caches = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, manifest_path: str, *args) -> 'BatchRunner':
+        try:
+            with open(manifest_path, encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError) as error:
+            sys.exit("Error: Could not read batch manifest at the provided "
+                     "path: {0} ({1})".format(manifest_path, error))
+        return cls(manifest, *args)
+
+    @staticmethod
+    def load_account_config(config_path: str) -> configparser.ConfigParser:
+        """
+        Reads an account's config file. Unless the file sets
+        'TokenCachePath', the account's token is cached as
+        '.cache-<config file name>' beside it, so accounts never share one.
+        """
+        config_parser = configparser.ConfigParser()
+        with open(config_path) as config_file:
+            config_parser.read_file(config_file)
+        config_parser["DEFAULT"].setdefault("TokenCachePath", str(
+            Path(config_path).parent / '.cache-{0}'.format(Path(config_path).stem)))
+        return config_parser
+
+    def cache_for(self, config_parser: configparser.ConfigParser) -> MetadataCache:
+        # One MetadataCache (and SQLite connection) per cache directory.
+        cache_dir = str(Path(config_parser["DEFAULT"].get(
+            "CacheDir", str(MetadataCache.DEFAULT_DIR))).expanduser().resolve())
+        with self.lock:
+            if cache_dir not in self.caches:
+                self.caches[cache_dir] = MetadataCache.from_config(config_parser)
+            return self.caches[cache_dir]
+
+    @contextlib.contextmanager
+    def command_options(self, manager: SpotifyManager, config_parser: configparser.ConfigParser,
+                        args: argparse.Namespace) -> typing.Iterator[None]:
+        """
+        Applies a command's '--no-cache', '--refresh' and '--concurrency' to
+        the account's manager while the command runs. A refreshing command
+        gets a cache connection of its own, as the shared one may be in use
+        by other accounts.
+        """
+        cache, concurrency = manager.cache, manager.concurrency
+        refresh_cache = None
+        if args.no_cache:
+            manager.cache = None
+        elif args.refresh:
+            refresh_cache = MetadataCache.from_config(config_parser, refresh=True)
+            manager.cache = refresh_cache
+        if args.concurrency:
+            manager.concurrency = max(1, args.concurrency)
+        try:
+            yield
+        finally:
+            manager.cache, manager.concurrency = cache, concurrency
+            if refresh_cache is not None:
+                refresh_cache.close()
+
+    def run(self) -> bool:
+        """
+        Runs every account's commands, then writes the summary.
+
+        Returns:
+            bool: Whether every command succeeded.
+        """
+        started_at = time.perf_counter()
+        self.session = build_session(
+            self.concurrency * SpotifyManager.DEFAULT_CONCURRENCY)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                results = list(executor.map(
+                    lambda account: self.run_account(*account), self.accounts))
+        finally:
+            self.session.close()
+            for cache in self.caches.values():
+                cache.close()
+
+        failed_count = sum(1 for result in results if not result['succeeded'])
+        summary = {
+            'accounts': results,
+            'account_count': len(results),
+            'failed_account_count': failed_count,
+            'seconds': round(time.perf_counter() - started_at, 3),
+        }
+        if self.summary_path:
+            with open(self.summary_path, 'w', encoding='utf-8') as summary_file:
+                json.dump(summary, summary_file, indent=2)
+            print("Batch summary saved to the following path: {0}".format(
+                self.summary_path))
+        else:
+            print(json.dumps(summary, indent=2))
+        return not failed_count
+
+    def run_account(self, config_path: str, commands: typing.List[typing.Tuple[typing.List[str], argparse.Namespace]],
+                    scope_sets: typing.List[str]) -> dict:
+        """
+        Runs one account's commands in order, recording each one's outcome.
+        A failed command does not stop the account's later commands.
+        """
+        started_at = time.perf_counter()
+        result = {'config': config_path, 'succeeded': False, 'commands': []}
+        manager = None
+        try:
+            config_parser = self.load_account_config(config_path)
+            manager = SpotifyManager(
+                config_parser, cache=self.cache_for(config_parser),
+                scope_sets=scope_sets, bucket=self.bucket)
+            manager.session = self.session
+        except (OSError, configparser.Error) as error:
+            result['error'] = str(error)
+            commands = []
+
+        for command, args in commands:
+            command_started_at = time.perf_counter()
+            command_result = {'args': command, 'succeeded': False}
+            try:
+                with self.command_options(manager, config_parser, args):
+                    self.run_command(manager, args)
+                command_result['succeeded'] = True
+            except SystemExit as error:
+                # Commands report failures as sys.exit messages.
+                if error.code in (None, 0):
+                    command_result['succeeded'] = True
+                else:
+                    command_result['error'] = str(error.code)
+            except Exception as error:
+                command_result['error'] = "{0}: {1}".format(
+                    type(error).__name__, error)
+            command_result['seconds'] = round(
+                time.perf_counter() - command_started_at, 3)
+            result['commands'].append(command_result)
+
+        if manager is not None:
+            result['succeeded'] = all(command_result['succeeded']
+                                      for command_result in result['commands'])
+            result['user_id'] = manager.user_id
+            if manager.authorized:
+                result['requests'] = manager.sp.stats()
+            if manager.token_manager is not None:
+                manager.token_manager.stop()
+        result['seconds'] = round(time.perf_counter() - started_at, 3)
+        return result
@@ -0,0 +1,221 @@
+import configparser
+import json
+import sqlite3
+import threading
+import time
+import typing
+from pathlib import Path
+
+from spotify_playlist_utility.Track import Track
+
+
+class MetadataCache():
+    """
+    On-disk (SQLite) cache of playlist metadata and tracks, keyed by each
+    playlist's snapshot_id. A cached entry is only used while the playlist's
+    current snapshot_id matches the one it was stored under, so any edit to
+    the playlist invalidates it.
+    """
+
+    DEFAULT_DIR = Path.home() / '.cache' / 'spotify-playlist-utility'
+    DEFAULT_TTL = 7 * 24 * 60 * 60  # seconds
+    DEFAULT_MAX_ENTRIES = 1000
+    FILE_NAME = 'metadata.sqlite3'
+
+    def __init__(self, cache_dir: typing.Union[str, Path] = DEFAULT_DIR,
+                 ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 refresh: bool = False) -> None:
+        """
+        Args:
+            cache_dir (typing.Union[str, Path]): Directory holding the cache.
+            ttl (float): Seconds after which a stored entry expires.
+            max_entries (int): Max number of playlists kept; the least
+            recently used entries are evicted beyond it.
+            refresh (bool): Ignore stored entries (entries are still written,
+            replacing stale ones).
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(
+            str(self.cache_dir / MetadataCache.FILE_NAME),
+            check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS playlists ("
+            "playlist_id TEXT PRIMARY KEY, snapshot_id TEXT NOT NULL, "
+            "track_count INTEGER, tracks TEXT, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        # Sync watermarks are state rather than cached data, so they are
+        # exempt from TTL and size eviction.
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # Each user's playlist name index, in listing order. It is checked
+        # against the listing whenever used, so it is exempt from eviction
+        # too.
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS playlist_names ("
+            "user_id TEXT NOT NULL, position INTEGER NOT NULL, "
+            "playlist_id TEXT NOT NULL, name TEXT NOT NULL, "
+            "PRIMARY KEY (user_id, position))")
+        self.connection.commit()
+
+    @classmethod
+    def from_config(cls, config_parser: configparser.ConfigParser,
+                    refresh: bool = False) -> 'MetadataCache':
+        """
+        Builds a MetadataCache from the optional 'CacheDir', 'CacheTTL' and
+        'CacheMaxEntries' keys of the config file's DEFAULT section.
+        """
+        config = config_parser["DEFAULT"]
+        return cls(
+            cache_dir=Path(config.get("CacheDir", str(cls.DEFAULT_DIR))).expanduser(),
+            ttl=float(config.get("CacheTTL", cls.DEFAULT_TTL)),
+            max_entries=int(config.get("CacheMaxEntries", cls.DEFAULT_MAX_ENTRIES)),
+            refresh=refresh
+        )
+
+    def _lookup(self, playlist_id: str, snapshot_id: str, column: str):
+        now = time.time()
+        with self.lock:
+            row = None
+            if not self.refresh:
+                row = self.connection.execute(
+                    "SELECT {0} FROM playlists WHERE playlist_id = ? "
+                    "AND snapshot_id = ? AND stored_at >= ?".format(column),
+                    (playlist_id, snapshot_id, now - self.ttl)).fetchone()
+            if row is None or row[0] is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute(
+                "UPDATE playlists SET accessed_at = ? WHERE playlist_id = ?",
+                (now, playlist_id))
+            self.connection.commit()
+            return row[0]
+
+    def get_track_count(self, playlist_id: str, snapshot_id: str) -> typing.Optional[int]:
+        """
+        Returns the cached track count of the playlist at the given snapshot,
+        or None on a miss.
+        """
+        return self._lookup(playlist_id, snapshot_id, 'track_count')
+
+    def get_tracks(self, playlist_id: str, snapshot_id: str) -> typing.Optional[typing.List[Track]]:
+        """
+        Returns the cached tracks of the playlist at the given snapshot, or
+        None on a miss.
+        """
+        tracks = self._lookup(playlist_id, snapshot_id, 'tracks')
+        if tracks is None:
+            return None
+        return [Track(*fields) for fields in json.loads(tracks)]
+
+    def put(self, playlist_id: str, snapshot_id: str, track_count: int,
+            tracks: typing.Iterable[Track] = None) -> None:
+        """
+        Stores a playlist's track count (and, optionally, its tracks) under
+        the given snapshot. Storing a count alone keeps previously stored
+        tracks of the same snapshot.
+        """
+        self.put_many([(playlist_id, snapshot_id, track_count, tracks)])
+
+    def put_many(self, entries: typing.Iterable[typing.Tuple[
+            str, str, int, typing.Optional[typing.Iterable[Track]]]]) -> None:
+        """
+        Stores several playlists as 'put' does, in a single transaction
+        followed by a single eviction pass.
+
+        Args:
+            entries: (playlist ID, snapshot ID, track count, tracks or None)
+            of each playlist to store.
+        """
+        now = time.time()
+        rows = []
+        for playlist_id, snapshot_id, track_count, tracks in entries:
+            tracks_json = None
+            if tracks is not None:
+                tracks_json = json.dumps(
+                    [[track.uri, track.name, track.artist, track.album]
+                     for track in tracks])
+            rows.append((playlist_id, snapshot_id, track_count, tracks_json))
+        if not rows:
+            return
+        with self.lock:
+            for playlist_id, snapshot_id, track_count, tracks_json in rows:
+                if tracks_json is None:
+                    row = self.connection.execute(
+                        "SELECT tracks FROM playlists WHERE playlist_id = ? "
+                        "AND snapshot_id = ?", (playlist_id, snapshot_id)).fetchone()
+                    tracks_json = row[0] if row else None
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?, ?, ?)",
+                    (playlist_id, snapshot_id, track_count, tracks_json, now, now))
+            self._evict(now)
+            self.connection.commit()
+
+    def _evict(self, now: float) -> None:
+        self.connection.execute(
+            "DELETE FROM playlists WHERE stored_at < ?", (now - self.ttl,))
+        self.connection.execute(
+            "DELETE FROM playlists WHERE playlist_id NOT IN ("
+            "SELECT playlist_id FROM playlists "
+            "ORDER BY accessed_at DESC LIMIT ?)", (self.max_entries,))
+
+    def get_watermark(self, name: str) -> typing.Optional[str]:
+        """
+        Returns the stored watermark with the given name, or None if unset
+        (or if the cache is being refreshed).
+        """
+        if self.refresh:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM watermarks WHERE name = ?",
+                (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, name: str, value: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?)",
+                (name, value))
+            self.connection.commit()
+
+    def get_playlist_names(self, user_id: str) -> typing.Optional[typing.List[typing.Tuple[str, str]]]:
+        """
+        Returns the stored (playlist ID, name) index of the user's
+        playlists, in listing order, or None if none is stored (or if the
+        cache is being refreshed).
+        """
+        if self.refresh:
+            return None
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT playlist_id, name FROM playlist_names "
+                "WHERE user_id = ? ORDER BY position", (user_id,)).fetchall()
+        return [tuple(row) for row in rows] if rows else None
+
+    def put_playlist_names(self, user_id: str, playlist_names: typing.List[typing.Tuple[str, str]]) -> None:
+        """Replaces the user's (playlist ID, name) index."""
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM playlist_names WHERE user_id = ?", (user_id,))
+            self.connection.executemany(
+                "INSERT INTO playlist_names VALUES (?, ?, ?, ?)",
+                [(user_id, position, playlist_id, name) for position,
+                 (playlist_id, name) in enumerate(playlist_names)])
+            self.connection.commit()
+
+    def stats_summary(self) -> str:
+        return "Metadata cache ({0}): {1} hits, {2} misses".format(
+            self.cache_dir, self.hits, self.misses)
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,241 @@
+import collections
+import contextlib
+import contextvars
+import json
+import sys
+import threading
+import time
+import typing
+
+import requests
+
+
+class TransferCounter():
+    """
+    Counts the responses received by a requests.Session and the size of
+    their (decoded) bodies.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.response_count = 0
+        self.bytes_received = 0
+        # Also attributes bytes to endpoints, when profiling.
+        self.profiler = None
+
+    def attach(self, session: requests.Session) -> None:
+        """Counts every response subsequently received by 'session'."""
+        session.hooks['response'].append(self.record)
+
+    def record(self, response: requests.Response, *args, **kwargs) -> None:
+        self.add(len(response.content or b''))
+
+    def add(self, size: int) -> None:
+        """Counts one response with a body of 'size' bytes."""
+        with self.lock:
+            self.response_count += 1
+            self.bytes_received += size
+        if self.profiler is not None:
+            self.profiler.record_bytes(size)
+
+    def stats_summary(self) -> str:
+        return "Transfer: {0} responses, {1} bytes received".format(
+            self.response_count, self.bytes_received)
+
+
+class Profiler():
+    """
+    Records where a run spends its time. For each API endpoint (named after
+    the client method, e.g. 'playlist_items'): call count, latency
+    percentiles and histogram, bytes received, retries and error statuses
+    (including 429s). For named local phases (e.g. 'build_tracks'): call
+    count and total time.
+
+    Requests are recorded by RequestScheduler ('request'), and bytes by
+    TransferCounter; phases are timed by the managers ('phase').
+    """
+
+    # Upper bounds (milliseconds) of the latency histogram buckets.
+    LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000,
+                          5000, 10000)
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.latencies = collections.defaultdict(list)
+        self.bytes_received = collections.Counter()
+        self.retries = collections.Counter()
+        self.errors = collections.defaultdict(collections.Counter)
+        self.phase_calls = collections.Counter()
+        self.phase_seconds = collections.Counter()
+        # Endpoint of the request in progress, per thread (or asyncio task),
+        # so that received bytes are attributed to it.
+        self.current_endpoint = contextvars.ContextVar(
+            'current_endpoint', default=None)
+
+    @contextlib.contextmanager
+    def request(self, endpoint: str) -> typing.Iterator[None]:
+        """Times one attempt of a request to 'endpoint'."""
+        token = self.current_endpoint.set(endpoint)
+        started_at = time.perf_counter()
+        status = None
+        try:
+            yield
+        except Exception as error:
+            status = getattr(error, 'http_status', None) or type(error).__name__
+            raise
+        finally:
+            latency = time.perf_counter() - started_at
+            self.current_endpoint.reset(token)
+            with self.lock:
+                self.latencies[endpoint].append(latency)
+                if status is not None:
+                    self.errors[endpoint][str(status)] += 1
+
+    def record_retry(self, endpoint: str) -> None:
+        with self.lock:
+            self.retries[endpoint] += 1
+
+    def record_bytes(self, size: int) -> None:
+        endpoint = self.current_endpoint.get()
+        if endpoint is not None:
+            with self.lock:
+                self.bytes_received[endpoint] += size
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """
+        Times a local phase of work. Phases are timed inclusively: a phase
+        that consumes a lazily fetched listing includes those fetches.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self.lock:
+                self.phase_calls[name] += 1
+                self.phase_seconds[name] += elapsed
+
+    @staticmethod
+    def _percentile(sorted_values: typing.List[float], percent: float) -> float:
+        # Nearest-rank percentile.
+        rank = max(1, -(-len(sorted_values) * percent // 100))
+        return sorted_values[int(rank) - 1]
+
+    def report(self) -> dict:
+        """Returns everything recorded, as a JSON serializable dict."""
+        with self.lock:
+            endpoints = {}
+            for endpoint, latencies in sorted(self.latencies.items()):
+                latencies_ms = sorted(latency * 1000 for latency in latencies)
+                histogram = collections.OrderedDict(
+                    ('<={0}'.format(bound), 0)
+                    for bound in Profiler.LATENCY_BUCKETS_MS)
+                histogram['>{0}'.format(Profiler.LATENCY_BUCKETS_MS[-1])] = 0
+                bucket_names = list(histogram)
+                bucket_index = 0
+                for latency_ms in latencies_ms:
+                    while (bucket_index < len(Profiler.LATENCY_BUCKETS_MS)
+                           and latency_ms > Profiler.LATENCY_BUCKETS_MS[bucket_index]):
+                        bucket_index += 1
+                    histogram[bucket_names[bucket_index]] += 1
+                endpoints[endpoint] = {
+                    'calls': len(latencies_ms),
+                    'retries': self.retries[endpoint],
+                    'throttled': self.errors[endpoint]['429'],
+                    'errors': dict(self.errors[endpoint]),
+                    'bytes': self.bytes_received[endpoint],
+                    'latency_ms': {
+                        'total': round(sum(latencies_ms), 3),
+                        'mean': round(sum(latencies_ms) / len(latencies_ms), 3),
+                        'p50': round(self._percentile(latencies_ms, 50), 3),
+                        'p90': round(self._percentile(latencies_ms, 90), 3),
+                        'p99': round(self._percentile(latencies_ms, 99), 3),
+                        'max': round(latencies_ms[-1], 3),
+                    },
+                    'histogram_ms': {name: count for name, count
+                                     in histogram.items() if count},
+                }
+            phases = {name: {'calls': self.phase_calls[name],
+                             'seconds': round(self.phase_seconds[name], 6)}
+                      for name in sorted(self.phase_calls)}
+        return {'elapsed_seconds': round(time.perf_counter() - self.started_at, 3),
+                'endpoints': endpoints, 'phases': phases}
+
+    def summary(self) -> str:
+        """Returns the report as console tables."""
+        report = self.report()
+        lines = ["Profile ({0}s elapsed)".format(report['elapsed_seconds']),
+                 "{0:<32} {1:>6} {2:>9} {3:>9} {4:>9} {5:>9} {6:>7} {7:>5} {8:>11}".format(
+                     'Endpoint', 'Calls', 'p50 ms', 'p90 ms', 'p99 ms',
+                     'max ms', 'Retries', '429s', 'Bytes')]
+        for endpoint, stats in report['endpoints'].items():
+            latency = stats['latency_ms']
+            lines.append("{0:<32} {1:>6} {2:>9} {3:>9} {4:>9} {5:>9} {6:>7} {7:>5} {8:>11}".format(
+                endpoint, stats['calls'], latency['p50'], latency['p90'],
+                latency['p99'], latency['max'], stats['retries'],
+                stats['throttled'], stats['bytes']))
+        if report['phases']:
+            lines.append("{0:<32} {1:>6} {2:>9}".format(
+                'Phase', 'Calls', 'Seconds'))
+            for name, phase in report['phases'].items():
+                lines.append("{0:<32} {1:>6} {2:>9.3f}".format(
+                    name, phase['calls'], phase['seconds']))
+        return "\n".join(lines)
+
+    def write_json(self, file_path: str) -> None:
+        with open(file_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+
+class PythonProfiler():
+    """
+    Optional function-level profiling of a whole run, with cProfile or
+    (if installed) pyinstrument.
+    """
+
+    KINDS = ('cprofile', 'pyinstrument')
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        if kind == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+        elif kind == 'pyinstrument':
+            try:
+                import pyinstrument
+            except ImportError:
+                sys.exit("Profiling with pyinstrument requires the "
+                         "'pyinstrument' package: pip install pyinstrument")
+            self.profiler = pyinstrument.Profiler()
+        else:
+            raise ValueError("Unknown profiler: {0}".format(kind))
+
+    def start(self) -> None:
+        if self.kind == 'cprofile':
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self, output_path: str = None) -> str:
+        """
+        Stops profiling and returns a text report. The full profile is also
+        saved to 'output_path' if given (pstats data for cProfile, HTML for
+        pyinstrument).
+        """
+        if self.kind == 'cprofile':
+            import io
+            import pstats
+            self.profiler.disable()
+            if output_path:
+                self.profiler.dump_stats(output_path)
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats(
+                'cumulative').print_stats(25)
+            return stream.getvalue()
+        self.profiler.stop()
+        if output_path:
+            with open(output_path, 'w', encoding='utf-8') as output_file:
+                output_file.write(self.profiler.output_html())
+        return self.profiler.output_text()
@@ -0,0 +1,142 @@
+import asyncio
+import collections
+import concurrent.futures
+import typing
+
+
+class OffsetPaginator():
+    """
+    Walks a Spotify "PagingObject" listing by offset instead of following each
+    page's 'next' link. Once the first page reports 'total' and 'limit', every
+    remaining offset is known up front, so the remaining pages are requested
+    in parallel through a bounded worker pool and yielded back in offset
+    order.
+    """
+
+    def __init__(self, fetch_page: typing.Callable[[int], dict],
+                 concurrency: int = 1) -> None:
+        """
+        Args:
+            fetch_page (typing.Callable[[int], dict]): Callable returning the
+            page (PagingObject dict) starting at the given offset.
+            concurrency (int): Max number of pages requested at the same time.
+        """
+        self.fetch_page = fetch_page
+        self.concurrency = max(1, concurrency)
+
+    def pages(self) -> typing.Iterator[dict]:
+        """
+        Yields each page of the listing, in offset order.
+
+        At most 'concurrency' pages are in flight (or waiting to be consumed)
+        at once, so memory stays bounded when the consumer is slower than
+        the API.
+
+        Yields:
+            dict: PagingObject dict for each page of the listing.
+        """
+        first_page = self.fetch_page(0)
+        yield first_page
+
+        limit = first_page.get('limit') or len(first_page['items'])
+        total = first_page.get('total') or 0
+        if not limit:
+            return
+        offsets = iter(range(first_page.get('offset', 0) + limit, total, limit))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = collections.deque()
+            try:
+                for offset in offsets:
+                    pending.append(executor.submit(self.fetch_page, offset))
+                    if len(pending) >= self.concurrency:
+                        break
+                while pending:
+                    page = pending.popleft().result()
+                    offset = next(offsets, None)
+                    if offset is not None:
+                        pending.append(
+                            executor.submit(self.fetch_page, offset))
+                    yield page
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def items(self) -> typing.Iterator[dict]:
+        """
+        Yields each item of the listing, in listing order.
+
+        Yields:
+            dict: Item dicts of each page of the listing.
+        """
+        for page in self.pages():
+            yield from page['items']
+
+
+class AsyncOffsetPaginator():
+    """
+    asyncio counterpart of OffsetPaginator: 'fetch_page' is a coroutine
+    function, and the remaining pages are requested as concurrent tasks
+    instead of on a worker pool.
+    """
+
+    def __init__(self, fetch_page: typing.Callable[[int], typing.Awaitable[dict]],
+                 concurrency: int = 1) -> None:
+        """
+        Args:
+            fetch_page (typing.Callable[[int], typing.Awaitable[dict]]):
+            Coroutine function returning the page (PagingObject dict)
+            starting at the given offset.
+            concurrency (int): Max number of pages requested at the same time.
+        """
+        self.fetch_page = fetch_page
+        self.concurrency = max(1, concurrency)
+
+    async def pages(self) -> typing.AsyncIterator[dict]:
+        """
+        Yields each page of the listing, in offset order, with at most
+        'concurrency' pages in flight (or waiting to be consumed) at once.
+
+        Yields:
+            dict: PagingObject dict for each page of the listing.
+        """
+        first_page = await self.fetch_page(0)
+        yield first_page
+
+        limit = first_page.get('limit') or len(first_page['items'])
+        total = first_page.get('total') or 0
+        if not limit:
+            return
+        offsets = iter(range(first_page.get('offset', 0) + limit, total, limit))
+
+        pending = collections.deque()
+        try:
+            for offset in offsets:
+                pending.append(asyncio.ensure_future(self.fetch_page(offset)))
+                if len(pending) >= self.concurrency:
+                    break
+            while pending:
+                page = await pending.popleft()
+                offset = next(offsets, None)
+                if offset is not None:
+                    pending.append(
+                        asyncio.ensure_future(self.fetch_page(offset)))
+                yield page
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def items(self) -> typing.AsyncIterator[dict]:
+        """
+        Yields each item of the listing, in listing order.
+
+        Yields:
+            dict: Item dicts of each page of the listing.
+        """
+        pages = self.pages()
+        try:
+            async for page in pages:
+                for item in page['items']:
+                    yield item
+        finally:
+            await pages.aclose()
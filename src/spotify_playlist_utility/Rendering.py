@@ -0,0 +1,186 @@
+import fnmatch
+import json
+import sys
+import typing
+
+from spotify_playlist_utility.TrackLists import Playlist
+
+OUTPUT_FORMATS = ('table', 'json', 'jsonl', 'tsv')
+SORT_KEYS = ('name', '-name', 'tracks', '-tracks')
+
+
+class LineWriter():
+    """
+    Collects output lines and writes them to a stream in batches, instead of
+    one write (and, for a console, one flush) per line.
+    """
+
+    BUFFER_LINES = 1024
+
+    def __init__(self, stream: typing.TextIO, buffer_lines: int = BUFFER_LINES) -> None:
+        self.stream = stream
+        self.buffer_lines = buffer_lines
+        self.lines = []
+
+    def write(self, line: str) -> None:
+        self.lines.append(line)
+        self.lines.append('\n')
+        if len(self.lines) >= 2 * self.buffer_lines:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.lines:
+            self.stream.write(''.join(self.lines))
+            self.lines = []
+        self.stream.flush()
+
+
+class PlaylistRenderer():
+    """
+    Renders listed playlists as one of OUTPUT_FORMATS:
+
+        'table': Columns aligned for the console (the default).
+
+        'json': One array of objects.
+
+        'jsonl': One object per line.
+
+        'tsv': Tab separated values with a header row.
+
+    Objects and rows hold each playlist's index, ID, name and track count.
+    The index is the playlist's position in the full listing, whatever is
+    filtered out or sorted. Unsorted 'json', 'jsonl' and 'tsv' output is
+    written page by page as the listing arrives; tables and sorted output
+    are written once every page has arrived.
+    """
+
+    COLUMN_TITLES = ('Index', 'Name', 'Track Count')
+    TSV_FIELDS = ('index', 'id', 'name', 'track_count')
+
+    def __init__(self, output_format: str = 'table', sort: str = None,
+                 name_glob: str = None, min_tracks: int = None,
+                 max_tracks: int = None, stream: typing.TextIO = None) -> None:
+        """
+        Args:
+            output_format (str): One of OUTPUT_FORMATS.
+            sort (str): One of SORT_KEYS: by name (case-insensitive) or by
+            track count, '-' prefixed for descending. None keeps the
+            listing order.
+            name_glob (str): Only render playlists whose name matches this
+            glob (case-sensitive, as '--playlist').
+            min_tracks (int): Only render playlists with at least this many
+            tracks.
+            max_tracks (int): Only render playlists with at most this many
+            tracks.
+            stream (typing.TextIO): Output stream (default: stdout).
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError("Unknown output format: {0}".format(output_format))
+        if sort is not None and sort not in SORT_KEYS:
+            raise ValueError("Unknown sort key: {0}".format(sort))
+        self.output_format = output_format
+        self.sort = sort
+        self.name_glob = name_glob
+        self.min_tracks = min_tracks
+        self.max_tracks = max_tracks
+        self.stream = stream if stream is not None else sys.stdout
+
+    def matches(self, playlist: Playlist) -> bool:
+        return ((self.name_glob is None
+                 or fnmatch.fnmatchcase(playlist.name, self.name_glob))
+                and (self.min_tracks is None
+                     or playlist.track_count >= self.min_tracks)
+                and (self.max_tracks is None
+                     or playlist.track_count <= self.max_tracks))
+
+    def render(self, playlist_pages: typing.Iterable[typing.List[Playlist]]) -> typing.List[Playlist]:
+        """
+        Renders the matching playlists of each page.
+
+        Args:
+            playlist_pages (typing.Iterable[typing.List[Playlist]]): Pages
+            of the listing, in order (see SpotifyManager.iter_playlist_pages).
+
+        Returns:
+            typing.List[Playlist]: Rendered playlists, in rendered order.
+        """
+        writer = LineWriter(self.stream)
+        streamed = self.sort is None and self.output_format != 'table'
+        rows = []  # (index, playlist)
+        index = 0
+        if streamed:
+            self.write_header(writer)
+        for playlist_page in playlist_pages:
+            page_start = len(rows)
+            for playlist in playlist_page:
+                if self.matches(playlist):
+                    rows.append((index, playlist))
+                index += 1
+            if streamed:
+                for row_number in range(page_start, len(rows)):
+                    self.write_row(writer, row_number, *rows[row_number])
+                writer.flush()
+
+        if not streamed:
+            if self.sort is not None:
+                if self.sort.lstrip('-') == 'name':
+                    def sort_key(row):
+                        return row[1].name.casefold()
+                else:
+                    def sort_key(row):
+                        return row[1].track_count
+                rows.sort(key=sort_key, reverse=self.sort.startswith('-'))
+            if self.output_format == 'table':
+                self.write_table(writer, rows)
+            else:
+                self.write_header(writer)
+                for row_number, row in enumerate(rows):
+                    self.write_row(writer, row_number, *row)
+        if self.output_format == 'json':
+            writer.write(']')
+        writer.flush()
+        return [playlist for _, playlist in rows]
+
+    def write_header(self, writer: LineWriter) -> None:
+        if self.output_format == 'json':
+            writer.write('[')
+        elif self.output_format == 'tsv':
+            writer.write('\t'.join(PlaylistRenderer.TSV_FIELDS))
+
+    def write_row(self, writer: LineWriter, row_number: int, index: int, playlist: Playlist) -> None:
+        # 'row_number' is the row's position in the output, 'index' the
+        # playlist's position in the listing.
+        if self.output_format == 'tsv':
+            name = playlist.name.replace('\t', ' ').replace(
+                '\r', ' ').replace('\n', ' ')
+            writer.write('{0}\t{1}\t{2}\t{3}'.format(
+                index, playlist.id, name, playlist.track_count))
+            return
+        line = json.dumps({'index': index, 'id': playlist.id,
+                           'name': playlist.name,
+                           'track_count': playlist.track_count},
+                          ensure_ascii=False)
+        if self.output_format == 'json':
+            line = ('  ' if row_number == 0 else ', ') + line
+        writer.write(line)
+
+    def write_table(self, writer: LineWriter, rows: typing.List[typing.Tuple[int, Playlist]]) -> None:
+        # Column widths are worked out in one pass over the rows.
+        index_width, name_width, track_count_width = (
+            len(title) for title in PlaylistRenderer.COLUMN_TITLES)
+        for index, playlist in rows:
+            index_width = max(index_width, len(str(index)))
+            name_width = max(name_width, len(playlist.name))
+            track_count_width = max(
+                track_count_width, len(str(playlist.track_count)))
+        line_format = '{{0:<{0}}}|{{1:<{1}}}|{{2:<{2}}}'.format(
+            index_width + 1, name_width + 1, track_count_width + 1)
+
+        writer.write('')
+        title_line = line_format.format(*PlaylistRenderer.COLUMN_TITLES)
+        writer.write(title_line)
+        writer.write('-' * len(title_line))
+        for index, playlist in rows:
+            writer.write(line_format.format(
+                index, playlist.name, playlist.track_count))
+        writer.write('')
@@ -0,0 +1,283 @@
+import asyncio
+import configparser
+import contextlib
+import random
+import threading
+import time
+import typing
+
+import requests
+import spotipy
+
+
+class TokenBucket():
+    """
+    Thread-safe token bucket pacing API requests. Requests waiting for a
+    token are served reads first: a write only takes a token while no read
+    is waiting for one.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Args:
+            rate (float): Tokens added per second (sustained request rate).
+            capacity (float): Max tokens stored (burst size).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.waiting_reads = 0
+        self.condition = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, write: bool = False) -> float:
+        """
+        Blocks until a token is available and takes it.
+
+        Args:
+            write (bool): Whether the request modifies data (lower priority).
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        started_at = time.monotonic()
+        with self.condition:
+            if not write:
+                self.waiting_reads += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self.paused_until:
+                        self.condition.wait(self.paused_until - now)
+                    elif self.tokens >= 1 and (not write or not self.waiting_reads):
+                        self.tokens -= 1
+                        return time.monotonic() - started_at
+                    else:
+                        self.condition.wait(
+                            max(1 - self.tokens, 0.1) / self.rate)
+            finally:
+                if not write:
+                    self.waiting_reads -= 1
+                    self.condition.notify_all()
+
+    async def acquire_async(self, write: bool = False) -> float:
+        """
+        Waits, without blocking the event loop, until a token is available
+        and takes it. Shares the bucket (and read priority) with 'acquire'.
+
+        Args:
+            write (bool): Whether the request modifies data (lower priority).
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        started_at = time.monotonic()
+        with self.condition:
+            if not write:
+                self.waiting_reads += 1
+        try:
+            while True:
+                with self.condition:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self.paused_until:
+                        delay = self.paused_until - now
+                    elif self.tokens >= 1 and (not write or not self.waiting_reads):
+                        self.tokens -= 1
+                        return time.monotonic() - started_at
+                    else:
+                        delay = max(1 - self.tokens, 0.1) / self.rate
+                await asyncio.sleep(delay)
+        finally:
+            if not write:
+                with self.condition:
+                    self.waiting_reads -= 1
+                    self.condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every request for the given number of seconds."""
+        with self.condition:
+            self.paused_until = max(self.paused_until,
+                                    time.monotonic() + seconds)
+            self.condition.notify_all()
+
+
+class RequestScheduler():
+    """
+    Wraps a spotipy.Spotify client so that every API call is paced by a
+    TokenBucket and retried when throttled. Methods of the wrapped client
+    are called through the scheduler exactly as on the client itself.
+
+    HTTP 429 responses pause the whole bucket for the 'Retry-After' period
+    and are retried for every request. Server errors (5xx) and connection
+    errors are retried with jittered exponential backoff for reads only,
+    since a write may already have been applied.
+    """
+
+    WRITE_METHODS = frozenset([
+        'playlist_add_items',
+        'playlist_change_details',
+        'playlist_remove_all_occurrences_of_items',
+        'playlist_remove_specific_occurrences_of_items',
+        'playlist_reorder_items',
+        'playlist_replace_items',
+        'user_playlist_create',
+    ])
+
+    DEFAULT_RATE = 10.0  # requests per second
+    DEFAULT_BURST = 20
+
+    def __init__(self, client: spotipy.Spotify, bucket: TokenBucket = None,
+                 max_retries: int = 5, base_delay: float = 0.5,
+                 max_delay: float = 30.0) -> None:
+        self.client = client
+        self.bucket = bucket or TokenBucket(
+            RequestScheduler.DEFAULT_RATE, RequestScheduler.DEFAULT_BURST)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.started_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.retry_count = 0
+        self.throttled_count = 0
+        self.wait_time = 0.0
+        # Per-endpoint latency and retry recorder, when profiling.
+        self.profiler = None
+
+    @classmethod
+    def from_config(cls, config_parser: configparser.ConfigParser,
+                    client: spotipy.Spotify,
+                    bucket: TokenBucket = None) -> 'RequestScheduler':
+        """
+        Builds a RequestScheduler paced by the optional 'RequestsPerSecond'
+        and 'RequestBurst' keys of the config file's DEFAULT section, or by
+        'bucket' if given (e.g. a rate budget shared by several clients).
+        """
+        if bucket is None:
+            config = config_parser["DEFAULT"]
+            bucket = TokenBucket(
+                float(config.get("RequestsPerSecond", cls.DEFAULT_RATE)),
+                float(config.get("RequestBurst", cls.DEFAULT_BURST)))
+        return cls(client, bucket)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        def scheduled_call(*args, **kwargs):
+            return self.call(name, attribute, *args, **kwargs)
+        return scheduled_call
+
+    def call(self, name: str, function: typing.Callable, *args, **kwargs):
+        """
+        Calls 'function' (the client method 'name') once a token is
+        available, retrying per the class' retry policy.
+        """
+        write = name in RequestScheduler.WRITE_METHODS
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire(write)
+            with self.lock:
+                self.request_count += 1
+                self.wait_time += waited
+            try:
+                with self._profile(name):
+                    return function(*args, **kwargs)
+            except spotipy.SpotifyException as error:
+                delay = self._retry_delay(error, write, attempt)
+                if delay is None:
+                    raise
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout):
+                if write or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            self._count_retry(name, delay)
+            attempt += 1
+            time.sleep(delay)
+
+    def _profile(self, name: str) -> typing.ContextManager:
+        """Times one attempt of a call to 'name', when profiling."""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.request(name)
+
+    def _count_retry(self, name: str, delay: float) -> None:
+        with self.lock:
+            self.retry_count += 1
+            self.wait_time += delay
+        if self.profiler is not None:
+            self.profiler.record_retry(name)
+
+    def _retry_delay(self, error: spotipy.SpotifyException, write: bool, attempt: int) -> typing.Optional[float]:
+        """
+        Returns the delay before retrying a request that failed with
+        'error', or None if it must not be retried.
+        """
+        if attempt >= self.max_retries:
+            return None
+        if error.http_status == 429:
+            delay = self._retry_after(error, attempt)
+            self.bucket.pause(delay)
+            with self.lock:
+                self.throttled_count += 1
+            return delay
+        if error.http_status >= 500 and not write:
+            return self._backoff(attempt)
+        return None
+
+    def _retry_after(self, error: spotipy.SpotifyException, attempt: int) -> float:
+        retry_after = (error.headers or {}).get('Retry-After')
+        try:
+            return min(float(retry_after), self.max_delay)
+        except (TypeError, ValueError):
+            return self._backoff(attempt)
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter" exponential backoff.
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def stats(self) -> dict:
+        """
+        Returns request counts and throughput since the scheduler was built.
+        """
+        elapsed = time.monotonic() - self.started_at
+        with self.lock:
+            return {
+                'requests': self.request_count,
+                'retries': self.retry_count,
+                'throttled': self.throttled_count,
+                'wait_seconds': round(self.wait_time, 3),
+                'requests_per_second': round(
+                    self.request_count / elapsed, 3) if elapsed else 0.0,
+            }
+
+    def stats_summary(self) -> str:
+        return ("Request scheduler: {requests} requests "
+                "({requests_per_second}/s), {retries} retries, "
+                "{throttled} throttled (429), {wait_seconds}s waiting".format(
+                    **self.stats()))
+
+
+def build_session(pool_size: int) -> requests.Session:
+    """
+    Returns a requests.Session for spotipy.Spotify with a connection pool
+    sized for 'pool_size' concurrent requests and no transport-level
+    retries, leaving retry decisions to RequestScheduler.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
@@ -0,0 +1,142 @@
+import bisect
+import typing
+
+# (range_start, insert_before, range_length), matching the arguments of the
+# Web API's "Reorder a Playlist's Items" endpoint.
+BlockMove = typing.Tuple[int, int, int]
+
+
+def apply_block_move(items: list, range_start: int, insert_before: int,
+                     range_length: int = 1) -> list:
+    """
+    Returns a copy of 'items' with the block starting at 'range_start' moved
+    in front of the item at 'insert_before'. Positions refer to the list
+    before the move, as with the Web API's reorder endpoint.
+    """
+    block = items[range_start:range_start + range_length]
+    rest = items[:range_start] + items[range_start + range_length:]
+    if insert_before > range_start:
+        insert_before -= range_length
+    return rest[:insert_before] + block + rest[insert_before:]
+
+
+def longest_increasing_subsequence(values: typing.List[int]) -> typing.Set[int]:
+    """
+    Returns the values forming a longest strictly increasing subsequence of
+    'values' (patience sorting, O(n log n)).
+    """
+    tails = []
+    tail_positions = []
+    predecessors = [None] * len(values)
+    for position, value in enumerate(values):
+        pile = bisect.bisect_left(tails, value)
+        if pile:
+            predecessors[position] = tail_positions[pile - 1]
+        if pile == len(tails):
+            tails.append(value)
+            tail_positions.append(position)
+        else:
+            tails[pile] = value
+            tail_positions[pile] = position
+
+    subsequence = set()
+    position = tail_positions[-1] if tail_positions else None
+    while position is not None:
+        subsequence.add(values[position])
+        position = predecessors[position]
+    return subsequence
+
+
+class PositionCounter():
+    """
+    Fenwick (binary indexed) tree of counts over positions 0..size - 1:
+    adds to a count and sums the counts below a position in O(log size).
+    """
+
+    def __init__(self, size: int) -> None:
+        self.tree = [0] * (size + 1)
+
+    def add(self, position: int, amount: int) -> None:
+        position += 1
+        while position < len(self.tree):
+            self.tree[position] += amount
+            position += position & -position
+
+    def count_below(self, position: int) -> int:
+        """Sum of the counts at positions 0..position - 1."""
+        total = 0
+        while position > 0:
+            total += self.tree[position]
+            position -= position & -position
+        return total
+
+
+def plan_block_moves(current_order: typing.List[int]) -> typing.List[BlockMove]:
+    """
+    Plans the reorder calls turning the current order of a playlist into its
+    target order.
+
+    Items on a longest increasing subsequence of target positions stay put;
+    every other item is moved directly behind its target predecessor, and
+    runs of items that are already adjacent and in order move as one block.
+
+    Planning takes O(n log n): the list is never rebuilt. Each item is
+    instead placed by a key (anchor, depth), where the anchor is the
+    original position of the item it was moved behind (transitively) and
+    the depth counts the items between them. Items are moved only behind
+    items that never move again, so keys keep their order, and an item's
+    position is the number of items with a lower anchor plus its depth.
+
+    Args:
+        current_order (typing.List[int]): Target position of the item
+        currently at each position (a permutation of range(n)).
+
+    Returns:
+        typing.List[BlockMove]: Moves to apply, in order.
+    """
+    size = len(current_order)
+    keep = longest_increasing_subsequence(current_order)
+    original_positions = [0] * size
+    for position, target in enumerate(current_order):
+        original_positions[target] = position
+    # Key of each item; anchor -1 is the front of the playlist. Anchors are
+    # counted one up in 'anchor_counts', so -1 fits.
+    anchors = list(original_positions)
+    depths = [0] * size
+    anchor_counts = PositionCounter(size + 1)
+    for position in range(size):
+        anchor_counts.add(position + 1, 1)
+
+    def position_of(item: int) -> int:
+        return anchor_counts.count_below(anchors[item] + 1) + depths[item]
+
+    moves = []
+    target = 0
+    while target < size:
+        if target in keep:
+            target += 1
+            continue
+        range_start = position_of(target)
+        range_length = 1
+        # Items not yet reached are still at their original positions, in
+        # original order: the next one follows directly if no item is left
+        # between their original positions.
+        while target + range_length < size and target + range_length not in keep:
+            previous_position = original_positions[target + range_length - 1]
+            next_position = original_positions[target + range_length]
+            if next_position < previous_position or anchor_counts.count_below(
+                    next_position + 1) != anchor_counts.count_below(previous_position + 2):
+                break
+            range_length += 1
+        insert_before = position_of(target - 1) + 1 if target else 0
+        if not range_start <= insert_before <= range_start + range_length:
+            moves.append((range_start, insert_before, range_length))
+            anchor = anchors[target - 1] if target else -1
+            depth = depths[target - 1] + 1 if target else 0
+            for item in range(target, target + range_length):
+                anchor_counts.add(anchors[item] + 1, -1)
+                anchors[item] = anchor
+                depths[item] = depth + item - target
+                anchor_counts.add(anchor + 1, 1)
+        target += range_length
+    return moves
@@ -0,0 +1,209 @@
+"""
+Compact, columnar binary snapshot format for track listings ('.spsnap').
+
+Layout (little-endian), every section starting on an 8-byte boundary:
+
+    header:   magic (8 bytes), row count (uint64), then (offset, length)
+              uint64 pairs locating each of the sections below
+    sections: uri kinds (uint8[n]), uri id offsets (uint32[n + 1]),
+              uri id data (UTF-8), name offsets (uint32[n + 1]),
+              name data (UTF-8), artist codes (uint32[n]),
+              album codes (uint32[n]), dictionary offsets (uint32[d + 1]),
+              dictionary data (UTF-8)
+
+URIs are split into a kind, indexing URI_PREFIXES, and the remainder after
+that prefix, so a track URI costs one byte plus its 22-character ID. Artist
+and album names are dictionary-encoded: each distinct value is stored once in
+the dictionary and referenced by code. Files are read through mmap, so
+opening a snapshot does not copy or decode it; tracks are decoded on access,
+and whole columns can be decoded in bulk with 'SnapshotTracks.column'.
+"""
+import array
+import collections.abc
+import mmap
+import struct
+import sys
+import typing
+
+from spotify_playlist_utility.Track import Track
+
+MAGIC = b'SPSNAP02'
+EXTENSION = '.spsnap'
+SECTION_COUNT = 9
+HEADER = struct.Struct('<8sQ' + 'QQ' * SECTION_COUNT)
+# Kind 0 stores the whole URI, for anything not matching a known prefix.
+URI_PREFIXES = ('', 'spotify:track:', 'spotify:episode:', 'spotify:local:')
+COLUMNS = ('uri', 'name', 'artist', 'album')
+MAX_OFFSET = 2 ** 32 - 1
+
+
+def _string_column(values: typing.Iterable[str]) -> typing.Tuple[array.array, bytes]:
+    offsets = array.array('I', [0])
+    data = bytearray()
+    for value in values:
+        data += (value or '').encode('utf-8')
+        if len(data) > MAX_OFFSET:
+            raise ValueError("Snapshot string column exceeds 4 GiB.")
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+def _split_uri(uri: str) -> typing.Tuple[int, str]:
+    for kind in range(1, len(URI_PREFIXES)):
+        if uri.startswith(URI_PREFIXES[kind]):
+            return kind, uri[len(URI_PREFIXES[kind]):]
+    return 0, uri
+
+
+def _to_little_endian(values: array.array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(tracks: typing.Iterable[Track], file_path) -> None:
+    """
+    Writes tracks to a snapshot file.
+
+    Args:
+        tracks (typing.Iterable[Track]): Tracks to write.
+        file_path: Path of the snapshot file.
+
+    Raises:
+        ValueError: If a string column would exceed the 4 GiB its uint32
+            offsets can address.
+    """
+    uri_kinds, uri_ids, names = array.array('B'), [], []
+    artist_codes, album_codes = array.array('I'), array.array('I')
+    dictionary = {}
+    for track in tracks:
+        uri_kind, uri_id = _split_uri(track.uri or '')
+        uri_kinds.append(uri_kind)
+        uri_ids.append(uri_id)
+        names.append(track.name)
+        artist_codes.append(dictionary.setdefault(
+            track.artist or '', len(dictionary)))
+        album_codes.append(dictionary.setdefault(
+            track.album or '', len(dictionary)))
+
+    uri_offsets, uri_data = _string_column(uri_ids)
+    name_offsets, name_data = _string_column(names)
+    dictionary_offsets, dictionary_data = _string_column(dictionary)
+    sections = [uri_kinds.tobytes(), _to_little_endian(uri_offsets), uri_data,
+                _to_little_endian(name_offsets), name_data,
+                _to_little_endian(artist_codes), _to_little_endian(album_codes),
+                _to_little_endian(dictionary_offsets), dictionary_data]
+
+    locations = []
+    position = HEADER.size
+    for section in sections:
+        position += -position % 8
+        locations.extend((position, len(section)))
+        position += len(section)
+
+    with open(file_path, 'wb') as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, len(uri_ids), *locations))
+        for section_index, section in enumerate(sections):
+            offset = locations[section_index * 2]
+            snapshot_file.write(b'\0' * (offset - snapshot_file.tell()))
+            snapshot_file.write(section)
+
+
+class SnapshotTracks(collections.abc.Sequence):
+    """
+    Read-only sequence of the tracks of a memory-mapped snapshot file.
+    Reading an item decodes a new Track from the mapped columns; iterating
+    decodes the columns in bulk.
+    """
+
+    def __init__(self, file_path) -> None:
+        with open(file_path, 'rb') as snapshot_file:
+            self.buffer = mmap.mmap(snapshot_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            self.buffer.close()
+            raise ValueError("Not a track snapshot file: {0}".format(file_path))
+        header = HEADER.unpack_from(self.buffer)
+        self.row_count = header[1]
+        view = memoryview(self.buffer)
+        sections = [view[offset:offset + length]
+                    for offset, length in zip(header[2::2], header[3::2])]
+        (self.uri_kinds, uri_offsets, self.uri_data, name_offsets,
+         self.name_data, artist_codes, album_codes, dictionary_offsets,
+         dictionary_data) = sections
+        self.uri_offsets = self._numbers(uri_offsets, 'I')
+        self.name_offsets = self._numbers(name_offsets, 'I')
+        self.artist_codes = self._numbers(artist_codes, 'I')
+        self.album_codes = self._numbers(album_codes, 'I')
+        self.dictionary = self._strings(
+            dictionary_data, self._numbers(dictionary_offsets, 'I'))
+
+    @staticmethod
+    def _numbers(section: memoryview, typecode: str):
+        if sys.byteorder == 'little':
+            return section.cast(typecode)
+        values = array.array(typecode, section.tobytes())
+        values.byteswap()
+        return values
+
+    @staticmethod
+    def _strings(data: memoryview, offsets) -> typing.List[str]:
+        offsets = offsets.tolist()
+        text = str(data, 'utf-8')
+        if len(text) == len(data):
+            # ASCII only: byte offsets are also character offsets.
+            return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        data = data.tobytes()
+        return [data[start:end].decode('utf-8')
+                for start, end in zip(offsets, offsets[1:])]
+
+    def _string(self, data: memoryview, offsets, index: int) -> str:
+        return str(data[offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def column(self, name: str) -> typing.List[str]:
+        """
+        Decodes a single column of every track in one pass, without
+        building Track objects.
+
+        Args:
+            name (str): One of 'uri', 'name', 'artist' or 'album'.
+
+        Returns:
+            typing.List[str]: The column's values, in track order.
+        """
+        if name == 'uri':
+            uri_ids = self._strings(self.uri_data, self.uri_offsets)
+            return [URI_PREFIXES[uri_kind] + uri_id
+                    for uri_kind, uri_id in zip(self.uri_kinds, uri_ids)]
+        if name == 'name':
+            return self._strings(self.name_data, self.name_offsets)
+        if name in ('artist', 'album'):
+            codes = self.artist_codes if name == 'artist' else self.album_codes
+            return [self.dictionary[code] for code in codes]
+        raise ValueError("Unknown snapshot column: {0}".format(name))
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __iter__(self) -> typing.Iterator[Track]:
+        return map(Track, *(self.column(name) for name in COLUMNS))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = range(self.row_count)[index]
+        return Track(URI_PREFIXES[self.uri_kinds[index]]
+                     + self._string(self.uri_data, self.uri_offsets, index),
+                     self._string(self.name_data, self.name_offsets, index),
+                     self.dictionary[self.artist_codes[index]],
+                     self.dictionary[self.album_codes[index]])
+
+    def close(self) -> None:
+        """Releases the mapping. Tracks already read remain valid."""
+        for name in ('uri_kinds', 'uri_offsets', 'name_offsets', 'artist_codes',
+                     'album_codes', 'uri_data', 'name_data'):
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                column.release()
+        self.buffer.close()
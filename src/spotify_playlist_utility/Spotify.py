@@ -1,14 +1,35 @@
+import concurrent.futures
 import configparser
+import contextlib
+import fnmatch
+import json
+import os
 import random
+import re
 import sys
+import time
 import typing
 from pathlib import Path
 
+import requests
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 
+from spotify_playlist_utility.Auth import TokenManager
+from spotify_playlist_utility.Cache import MetadataCache
+from spotify_playlist_utility.Instrumentation import Profiler, TransferCounter
+from spotify_playlist_utility.Paginator import OffsetPaginator
+from spotify_playlist_utility.Rendering import PlaylistRenderer
+from spotify_playlist_utility.Scheduler import (RequestScheduler, TokenBucket,
+                                                build_session)
+from spotify_playlist_utility.Shuffle import plan_block_moves
+from spotify_playlist_utility.Sync import (SyncPlan, plan_sync,
+                                           writable_target_uris)
 from spotify_playlist_utility.Track import Track
-from spotify_playlist_utility.TrackLists import Playlist, TrackListing
+from spotify_playlist_utility.TrackLists import (FILE_EXTENSIONS, LazyTracks,
+                                                 Playlist, TrackListing,
+                                                 drop_local_tracks,
+                                                 is_local_uri)
 
 
 class SpotifyManager(object):
@@ -24,51 +45,232 @@ class SpotifyManager(object):
         'ListPlaylists':
             'playlist-read-private, playlist-read-collaborative',
         'ShufflePlaylistTracks':
-            'playlist-read-private, playlist-read-collaborative, playlist-modify-private'
+            'playlist-read-private, playlist-read-collaborative, playlist-modify-private',
+        'ImportTracksToPlaylist':
+            'playlist-read-private, playlist-modify-private',
+        'ExportSavedTracksToLikedMemoryPlaylist':
+            'user-library-read, playlist-read-private, playlist-read-collaborative, playlist-modify-private',
+        'SyncPlaylistTracks':
+            'playlist-read-private, playlist-read-collaborative, playlist-modify-private',
+        'AnalyzePlaylists':
+            'playlist-read-private, playlist-read-collaborative'
     }
 
-    def __init__(self, config_parser: configparser.ConfigParser):
+    # Upper bound on simultaneous in-flight API requests for fan-out lookups.
+    DEFAULT_CONCURRENCY = 8
+
+    # Recovery file of a 'replace' shuffle, in the working directory:
+    # prefix + 'export_file_name', so '--sync' restores from it.
+    SHUFFLE_RECOVERY_PREFIX = 'shuffle-recovery '
+    # Attempts of each chunk write of a 'replace' shuffle, and the delay
+    # (seconds, doubled for each further attempt) before retrying one.
+    SHUFFLE_WRITE_ATTEMPTS = 3
+    SHUFFLE_RETRY_DELAY = 1.0
+
+    # Records the snapshot_id of each playlist exported by
+    # 'export_all_playlists', to skip unchanged playlists on later runs.
+    EXPORT_MANIFEST_NAME = '.playlist_snapshots.json'
+
+    # Fields of '/v1/playlists/{playlist_id}' used to build a Playlist.
+    PLAYLIST_FIELDS = 'uri,name,description,snapshot_id,tracks.total'
+    # Fields of '/v1/playlists/{playlist_id}/tracks' used to build Tracks
+    # (see 'build_track_object_from_data') and to page by offset.
+    PLAYLIST_ITEMS_FIELDS = ('items(track(uri,name,artists(name),album(name))),'
+                             'limit,offset,total')
+    # Max page sizes allowed by the Web API. The library endpoints
+    # ('/v1/me/tracks', '/v1/me/playlists') do not support 'fields'.
+    PLAYLIST_ITEMS_PAGE_SIZE = 100
+    LIBRARY_PAGE_SIZE = 50
+
+    def __init__(self, config_parser: configparser.ConfigParser,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 cache: MetadataCache = None,
+                 scope_sets: typing.Iterable[str] = (),
+                 profiler: Profiler = None,
+                 bucket: TokenBucket = None):
         """[summary]
 
         :param config_parser: [description]
         :type config_parser: configparser.ConfigParser
+        :param concurrency: Max number of API requests issued in parallel.
+        :type concurrency: int
+        :param cache: Playlist metadata cache, or None to always refetch.
+        :type cache: MetadataCache
+        :param scope_sets: SCOPES keys of every operation planned for this
+            run, authorized together up front (see 'authorize').
+        :type scope_sets: typing.Iterable[str]
+        :param profiler: Records per-endpoint request stats and local phase
+            timings, or None to not profile.
+        :type profiler: Profiler
+        :param bucket: Rate budget to pace requests by, instead of one per
+            the config file (see RequestScheduler.from_config).
+        :type bucket: TokenBucket
         """
         self.config_parser = config_parser
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.scope_sets = list(scope_sets)
+        self.profiler = profiler
+        self.bucket = bucket
+        self.transfer_counter = TransferCounter()
+        self.transfer_counter.profiler = profiler
         self.authorized = False
+        self.token_manager = None
+        self.session = None
         self.sp = None
         self.user_id = None
 
     def authorize(self, scope_set: str) -> None:
-        if not self.authorized:
-            auth_message = ("\n-------\nNote: If valid session was not "
-                            "previously cached, then the spotipy library will "
-                            "open a web browser to authorize the user. If "
-                            "script flow pauses, check your browser for the "
-                            "challenge. Review the permissions and 'Agree' to "
-                            "authorize the app you previously created on "
-                            "Spotify's developer site per the README.md"
-                            "('SetupConfig' section).\n-------\n")
-            print(auth_message)
-            auth_manager = SpotifyOAuth(
-                client_id=self.config_parser["DEFAULT"]["ClientID"],
-                client_secret=self.config_parser["DEFAULT"]["ClientSecret"],
-                redirect_uri=self.config_parser["DEFAULT"]
-                ["RedirectURI"],
-                scope=SpotifyManager.SCOPES[scope_set],
-                open_browser=True
-            )
-            """
-                Note on 'open_browser' argument above:
-                Change to False so that console provides URL to navigate to.
-                Then, one enters the URL they were redirected to.
-                'False' works, but I find 'True' to be more clear for end user.
-            """
-
-            self.sp = spotipy.Spotify(auth_manager=auth_manager)
-            self.authorized = True
+        """
+        Authorizes the Spotify client for the union of the scopes of
+        'scope_set' and of every scope set planned for the run
+        ('scope_sets'), so the whole run shares one client, connection pool
+        and token (kept fresh by a TokenManager).
+
+        Once authorized, this is a no-op for scope sets that were granted.
+        Other scope sets are authorized again for the union of all scopes,
+        which may prompt the user.
+
+        Args:
+            scope_set (str): SCOPES key of the operation about to run.
+        """
+        # (Without a token manager, the client was supplied ready to use.)
+        if self.authorized and (self.token_manager is None or SpotifyManager.scopes_granted(
+                self.token_manager.scope, [scope_set])):
+            return
+        if scope_set not in self.scope_sets:
+            self.scope_sets.append(scope_set)
+
+        if self.sp is None:
+            # Every API call is paced and retried by the RequestScheduler.
+            # (A session may be supplied to share its connection pool.)
+            if self.session is None:
+                self.session = build_session(self.concurrency)
+                self.transfer_counter.attach(self.session)
+        else:
+            self.token_manager.stop()
+        auth_manager = SpotifyManager.build_auth_manager(
+            self.config_parser, SpotifyManager.scopes_of(self.scope_sets),
+            requests_session=self.session)
+        self.token_manager = TokenManager(auth_manager)
+        if self.sp is None:
+            self.sp = RequestScheduler.from_config(
+                self.config_parser,
+                spotipy.Spotify(auth_manager=self.token_manager,
+                                requests_session=self.session),
+                bucket=self.bucket)
+            self.sp.profiler = self.profiler
+        else:
+            self.sp.client.auth_manager = self.token_manager
+        self.authorized = True
+        self.user_id = SpotifyManager.cached_user_id(auth_manager)
+        if self.user_id is None:
             self.user_id = self.sp.me()['id']
+            SpotifyManager.cache_user_id(auth_manager, self.user_id)
+
+    def phase(self, name: str) -> typing.ContextManager:
+        """Times a local phase of work, when profiling (see Profiler.phase)."""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.phase(name)
+
+    @staticmethod
+    def scopes_of(scope_sets: typing.Iterable[str]) -> typing.List[str]:
+        """Returns the union of the scopes of the given SCOPES keys."""
+        return sorted({scope.strip() for scope_set in scope_sets
+                       for scope in SpotifyManager.SCOPES[scope_set].split(',')})
+
+    @staticmethod
+    def scopes_granted(granted_scope: str, scope_sets: typing.Iterable[str]) -> bool:
+        """
+        Returns whether a token's space separated 'scope' string covers
+        the scopes of the given SCOPES keys.
+        """
+        return set(SpotifyManager.scopes_of(scope_sets)) <= set(
+            (granted_scope or '').split())
 
-    def build_track_object_from_data(self, data: dict) -> Track:
+    @staticmethod
+    def cached_user_id(auth_manager: SpotifyOAuth) -> typing.Optional[str]:
+        """
+        Returns the user ID stored with the cached OAuth token (see
+        'cache_user_id'), or None. It is only trusted while the cached token
+        covers the requested scopes; otherwise spotipy authorizes again,
+        possibly as another user.
+        """
+        token_info = auth_manager.cache_handler.get_cached_token()
+        if not token_info or 'user_id' not in token_info:
+            return None
+        requested_scopes = set((auth_manager.scope or '').split())
+        if not requested_scopes <= set((token_info.get('scope') or '').split()):
+            return None
+        return token_info['user_id']
+
+    @staticmethod
+    def cache_user_id(auth_manager: SpotifyOAuth, user_id: str) -> None:
+        """
+        Stores the user ID in spotipy's OAuth token cache, saving a 'me'
+        request on later runs. spotipy rewrites the cache whenever it
+        obtains a new token, which drops the ID until it is looked up again.
+        """
+        token_info = auth_manager.cache_handler.get_cached_token()
+        if token_info:
+            token_info['user_id'] = user_id
+            auth_manager.cache_handler.save_token_to_cache(token_info)
+
+    @staticmethod
+    def build_auth_manager(config_parser: configparser.ConfigParser, scope: typing.List[str], requests_session: requests.Session = True) -> SpotifyOAuth:
+        """
+        Returns the SpotifyOAuth auth manager for the app set up in the
+        config file, requesting the given scopes (see 'scopes_of').
+        Token requests go through 'requests_session' if given.
+
+        The token is cached at the optional 'TokenCachePath' key of the
+        config file (default: spotipy's '.cache' in the working directory).
+        """
+        auth_message = ("\n-------\nNote: If valid session was not "
+                        "previously cached, then the spotipy library will "
+                        "open a web browser to authorize the user. If "
+                        "script flow pauses, check your browser for the "
+                        "challenge. Review the permissions and 'Agree' to "
+                        "authorize the app you previously created on "
+                        "Spotify's developer site per the README.md"
+                        "('SetupConfig' section).\n-------\n")
+        print(auth_message)
+        auth_manager = SpotifyOAuth(
+            client_id=config_parser["DEFAULT"]["ClientID"],
+            client_secret=config_parser["DEFAULT"]["ClientSecret"],
+            redirect_uri=config_parser["DEFAULT"]
+            ["RedirectURI"],
+            scope=scope,
+            cache_path=config_parser["DEFAULT"].get("TokenCachePath"),
+            open_browser=True,
+            requests_session=requests_session
+        )
+        """
+            Note on 'open_browser' argument above:
+            Change to False so that console provides URL to navigate to.
+            Then, one enters the URL they were redirected to.
+            'False' works, but I find 'True' to be more clear for end user.
+        """
+        return auth_manager
+
+    def paginate(self, fetch_page: typing.Callable[[int], dict]) -> OffsetPaginator:
+        """
+        Returns an OffsetPaginator over a listing endpoint, sharing this
+        manager's concurrency limit. Used by every listing path in this
+        module.
+
+        Args:
+            fetch_page (typing.Callable[[int], dict]): Callable returning the
+            page of the listing starting at the given offset.
+
+        Returns:
+            OffsetPaginator: Paginator over the listing.
+        """
+        return OffsetPaginator(fetch_page, concurrency=self.concurrency)
+
+    @staticmethod
+    def build_track_object_from_data(data: dict) -> Track:
         """Returns a Track object from a provided dict data
 
         Args:
@@ -89,26 +291,72 @@ class SpotifyManager(object):
         """
         Generate a TrackListing of the user's saved tracks.
 
-        Called by argument: "-s/--export-saved-tracks".
-
         Returns:
             TrackListing: TrackListing object storing a list of saved tracks.
         """
         saved_tracks = TrackListing()
-        saved_tracks_response = self.sp.current_user_saved_tracks()
-        while saved_tracks_response:
-            for saved_track_data in saved_tracks_response['items']:
-                saved_track_data = saved_track_data['track']
-                saved_track = self.build_track_object_from_data(
-                    saved_track_data)
-                saved_tracks.tracks.append(saved_track)
-            if saved_tracks_response['next']:
-                saved_tracks_response = self.sp.next(saved_tracks_response)
-            else:
-                saved_tracks_response = None
+        for saved_track_page in self.iter_saved_track_pages():
+            saved_tracks.tracks.extend(saved_track_page)
         return saved_tracks
 
-    def export_saved_tracks(self, file_path: str) -> None:
+    def iter_saved_track_pages(self) -> typing.Iterator[typing.List[Track]]:
+        """
+        Yields the user's saved tracks one page at a time, as pages arrive.
+
+        Called by argument: "-s/--export-saved-tracks".
+
+        Yields:
+            typing.List[Track]: Saved tracks of each page, in listing order.
+        """
+        paginator = self.paginate(
+            lambda offset: self.sp.current_user_saved_tracks(
+                limit=SpotifyManager.LIBRARY_PAGE_SIZE, offset=offset))
+        for saved_tracks_response in paginator.pages():
+            with self.phase('build_tracks'):
+                saved_track_page = [
+                    self.build_track_object_from_data(saved_track_data['track'])
+                    for saved_track_data in saved_tracks_response['items']]
+            yield saved_track_page
+
+    def get_saved_tracks_added_after(self, added_after: str = None) -> typing.Tuple[TrackListing, typing.Optional[str]]:
+        """
+        Generate a TrackListing of the user's saved tracks added at, or after,
+        the 'added_after' watermark. Saved tracks are listed newest first, so
+        paging stops at the first page reaching an older track; on most runs
+        only one request is made.
+
+        Tracks saved at exactly the watermark are included again, so callers
+        must tolerate already-seen tracks.
+
+        Args:
+            added_after (str): ISO 8601 'added_at' watermark of a previous
+            run, or None to list every saved track.
+
+        Returns:
+            typing.Tuple[TrackListing, typing.Optional[str]]: Saved tracks
+            added since the watermark, and the new watermark (newest
+            'added_at' seen, or 'added_after' if nothing newer was found).
+        """
+        saved_tracks = TrackListing()
+        newest_added_at = added_after
+        # Pages are requested with a concurrency of 1: the first page is
+        # fetched on its own, and afterwards only the page following the one
+        # being read is prefetched, so stopping early wastes at most one
+        # request.
+        paginator = OffsetPaginator(
+            lambda offset: self.sp.current_user_saved_tracks(
+                limit=SpotifyManager.LIBRARY_PAGE_SIZE, offset=offset))
+        for saved_track_data in paginator.items():
+            added_at = saved_track_data['added_at']
+            if added_after is not None and added_at < added_after:
+                break
+            if newest_added_at is None or added_at > newest_added_at:
+                newest_added_at = added_at
+            saved_tracks.tracks.append(
+                self.build_track_object_from_data(saved_track_data['track']))
+        return saved_tracks, newest_added_at
+
+    def export_saved_tracks(self, file_path: str, file_format: str = None) -> None:
         """
         Generate a .csv listing of the user's saved tracks and save to the
         specified file path (If not specified, default: .\data.csv).
@@ -117,121 +365,172 @@ class SpotifyManager(object):
 
         Args:
             file_path (string): File path pointing at where to save the generated .csv file.
+            file_format (str): 'csv' or 'snapshot' (default: per the file extension).
         """
         self.authorize("ExportSavedTracks")
-        saved_tracks = self.get_saved_tracks()
-        saved_tracks.export_tracks(file_path)
+        with self.phase('write_tracks'):
+            TrackListing.export_track_pages(
+                self.iter_saved_track_pages(), file_path, file_format=file_format)
 
-    def get_playlists(self) -> typing.List[Playlist]:
+    def get_playlists(self, resolve_track_counts: bool = True) -> typing.List[Playlist]:
         """
         Fetches playlists from the user's playlists. Creates data objects from
         the resulting playlists.
 
         Called by arguments:
             "-p"/"--export-playlist-tracks"
-            "-l"/"--list-playlists"
             "-z"/"--shuffle-playlist-tracks"
+            "-e"/"--export-all-playlists"
+
+        Args:
+            resolve_track_counts (bool): Look up each playlist's accurate
+            track count (see 'iter_playlist_pages'). When False, the possibly
+            inaccurate count reported by the listing is used and no extra
+            requests are made.
 
         Returns:
             typing.List[Playlist]:  List of playlist objects representing the
             user's playlists.
         """
-        playlists = []
-        current_user_playlists_response = self.sp.current_user_playlists()
-        while current_user_playlists_response:
-            for playlist_data in current_user_playlists_response['items']:
-                '''
-                Per my testing, the '/v1/me/playlists' endpoint 
-                ('current_user_playlists' spotipy function) is currently 
-                buggy when reporting track count for returned playlists. I'm 
-                unclear as to why, but when I create valid playlists with this 
-                script, they sometimes get reported as having a length of 0 in 
-                response to the above API endpoint call. If I drill down into 
-                each playlist using '/v1/playlists/{playlist_id}' ('playlist' 
-                spotipy function), then the reported tracks total is accurate.
-
-                Therefore, this logic is to work around that discrepancy by 
-                making a call to the '/v1/playlists/{playlist_id}' for each 
-                received playlist to grab the tracks count.
-                '''
-                playlist_response = self.sp.playlist(playlist_data['id'])
-                track_count = playlist_response['tracks']['total']
-
-                '''
-                Now to continue on building the Playlist objects using the 
-                track_count specially captured via the call above (because of track count errors in playlist_data) and all other values captured within the playlist_data object
-                '''
-                playlist = Playlist(
-                    uri=playlist_data['uri'], name=playlist_data['name'], description=playlist_data['description'], track_count=track_count)
-                playlists.append(playlist)
-            if current_user_playlists_response['next']:
-                current_user_playlists_response = self.sp.next(
-                    current_user_playlists_response)
-            else:
-                current_user_playlists_response = None
-        return playlists
+        return [playlist for playlist_page in self.iter_playlist_pages(
+            resolve_track_counts) for playlist in playlist_page]
 
-    def list_playlists(self) -> typing.List[Playlist]:
+    def iter_playlist_pages(self, resolve_track_counts: bool = True, name_glob: str = None) -> typing.Iterator[typing.List[Playlist]]:
+        """
+        Yields the user's playlists one listing page at a time, each page
+        once its track counts are resolved, so callers can start on the
+        first playlists while later pages are still being fetched.
+
+        Called by argument: "-l"/"--list-playlists"
+
+        Args:
+            resolve_track_counts (bool): See 'get_playlists'.
+            name_glob (str): Only resolve the track counts of playlists
+            whose name matches this glob. The others are still yielded, so
+            listing positions are kept, with the listing's reported count.
+
+        Yields:
+            typing.List[Playlist]: Playlists of each listing page, in
+            listing order.
+        """
+        paginator = self.paginate(
+            lambda offset: self.sp.current_user_playlists(
+                limit=SpotifyManager.LIBRARY_PAGE_SIZE, offset=offset))
+        for page in paginator.pages():
+            playlists_data = page['items']
+            resolved_track_counts = {}
+            if resolve_track_counts:
+                matching_indices = [
+                    index for index, playlist_data in enumerate(playlists_data)
+                    if name_glob is None
+                    or fnmatch.fnmatchcase(playlist_data['name'], name_glob)]
+                resolved_track_counts = dict(zip(
+                    matching_indices, self.resolve_track_counts(
+                        [playlists_data[index] for index in matching_indices])))
+            track_counts = [
+                resolved_track_counts[index] if index in resolved_track_counts
+                else playlist_data['tracks']['total']
+                for index, playlist_data in enumerate(playlists_data)]
+            yield [Playlist(uri=playlist_data['uri'], name=playlist_data['name'], description=playlist_data['description'], track_count=track_count, snapshot_id=playlist_data['snapshot_id'])
+                   for playlist_data, track_count in zip(playlists_data, track_counts)]
+
+    def resolve_track_counts(self, playlists_data: typing.List[dict]) -> typing.List[int]:
+        """
+        Returns the accurate track count of each playlist of a listing page.
+
+        Per my testing, the '/v1/me/playlists' endpoint
+        ('current_user_playlists' spotipy function) is currently
+        buggy when reporting track count for returned playlists. I'm
+        unclear as to why, but when I create valid playlists with this
+        script, they sometimes get reported as having a length of 0 in
+        response to the above API endpoint call. If I drill down into
+        each playlist using '/v1/playlists/{playlist_id}' ('playlist'
+        spotipy function), then the reported tracks total is accurate.
+
+        Therefore, this logic is to work around that discrepancy by
+        making a call to the '/v1/playlists/{playlist_id}' for each
+        received playlist to grab the tracks count.
+
+        Playlists whose snapshot_id is unchanged since a previous run reuse
+        the cached count instead.
+        """
+        track_counts = [None] * len(playlists_data)
+        if self.cache is not None:
+            for index, playlist_data in enumerate(playlists_data):
+                track_counts[index] = self.cache.get_track_count(
+                    playlist_data['id'], playlist_data['snapshot_id'])
+        uncached_indices = [index for index, track_count in enumerate(
+            track_counts) if track_count is None]
+        fetched_track_counts = self.get_playlist_track_counts(
+            [playlists_data[index]['id'] for index in uncached_indices])
+        for index, track_count in zip(uncached_indices, fetched_track_counts):
+            track_counts[index] = track_count
+        if self.cache is not None:
+            self.cache.put_many(
+                (playlists_data[index]['id'],
+                 playlists_data[index]['snapshot_id'], track_count, None)
+                for index, track_count in zip(uncached_indices,
+                                              fetched_track_counts))
+        return track_counts
+
+    def get_playlist_track_counts(self, playlist_ids: typing.List[str]) -> typing.List[int]:
+        """
+        Resolves the track count of each playlist ID. Lookups are fanned out
+        across a bounded thread pool (see 'concurrency') and only the
+        'tracks.total' field is requested for each playlist.
+
+        Args:
+            playlist_ids (typing.List[str]): IDs of the playlists to look up.
+
+        Returns:
+            typing.List[int]: Track counts, in the same order as playlist_ids.
+        """
+        def fetch_track_count(playlist_id: str) -> int:
+            playlist_response = self.sp.playlist(
+                playlist_id, fields='tracks.total')
+            return playlist_response['tracks']['total']
+
+        if not playlist_ids:
+            return []
+        max_workers = min(self.concurrency, len(playlist_ids))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 'map' yields results in submission order, preserving the
+            # order of the user's playlists.
+            return list(executor.map(fetch_track_count, playlist_ids))
+
+    def list_playlists(self, output_format: str = 'table', sort: str = None, name_glob: str = None, min_tracks: int = None, max_tracks: int = None) -> typing.List[Playlist]:
         """
         Lists playlists in the console with indexing for user selection
-        purposes.
+        purposes (see 'PlaylistRenderer' for the formats and options).
+        Unsorted 'json', 'jsonl' and 'tsv' rows are printed as listing pages
+        arrive; the table (also shown by the playlist picker) and sorted
+        output are printed once the whole listing has arrived, as column
+        widths and order depend on every row.
 
         Called by arguments:
             "-p"/"--export-playlist-tracks"
             "-l"/"--list-playlists"
             "-z"/"--shuffle-playlist-tracks"
 
+        Args:
+            output_format (str): 'table' (default), 'json', 'jsonl' or 'tsv'.
+            sort (str): 'name' or 'tracks', '-' prefixed for descending.
+            name_glob (str): Only list playlists whose name matches.
+            min_tracks (int): Only list playlists with at least this many tracks.
+            max_tracks (int): Only list playlists with at most this many tracks.
+
         Returns:
             typing.List[Playlist]: List of Playlist objects representing the
-            user's playlists.
+            user's playlists, as listed.
         """
         self.authorize("ListPlaylists")
 
-        playlists = self.get_playlists()
-
-        column_titles = ['Index', 'Name', 'Track Count']
-
-        playlist_indicies_for_table_printing = [
-            str(x) for x in range(0, len(playlists))
-        ]
-        playlist_names_for_table_printing = [
-            playlist.name for playlist in playlists
-        ]
-        playlist_track_counts_for_table_printing = [
-            str(playlist.track_count) for playlist in playlists
-        ]
-
-        column_length_maximums = [
-            max(len(column_titles[0]),
-                len(max(playlist_indicies_for_table_printing, key=len))
-                ),
-            max(len(column_titles[1]),
-                len(max(playlist_names_for_table_printing, key=len))
-                ),
-            max(len(column_titles[2]),
-                len(max(playlist_track_counts_for_table_printing, key=len))
-                )
-        ]
-
-        data_for_table_printing = [column_titles] + list(zip(
-            playlist_indicies_for_table_printing,
-            playlist_names_for_table_printing,
-            playlist_track_counts_for_table_printing
-        ))
-
-        print("")
-        for row_index, data in enumerate(data_for_table_printing):
-            line_parts = []
-            for column_index, value in enumerate(data):
-                line_parts.append(str(value).ljust(
-                    column_length_maximums[column_index]+1))
-            line = '|'.join(line_part for line_part in line_parts)
-            print(line)
-            if row_index == 0:
-                print('-' * len(line))
-        print("")
-
-        return playlists
+        renderer = PlaylistRenderer(
+            output_format, sort=sort, name_glob=name_glob,
+            min_tracks=min_tracks, max_tracks=max_tracks)
+        # Names are filtered before track counts are resolved, so only the
+        # matching playlists are looked up.
+        return renderer.render(self.iter_playlist_pages(name_glob=name_glob))
 
     def playlist_picker(self) -> Playlist:
         """
@@ -250,131 +549,938 @@ class SpotifyManager(object):
         playlist_choice_input = input("Please provide chosen playlist index: ")
         return playlists[int(playlist_choice_input)]
 
+    def choose_playlists(self, playlist_selectors: typing.List[str] = None) -> typing.List[Playlist]:
+        """
+        Returns the playlists given by 'playlist_selectors' (see
+        'select_playlists'), or else the one picked interactively (see
+        'playlist_picker'), each with a lazy 'tracks' sequence.
+        """
+        if playlist_selectors:
+            return self.select_playlists(playlist_selectors)
+        return [self.load_tracks(self.playlist_picker())]
+
+    @staticmethod
+    def playlist_id_of(selector: str) -> typing.Optional[str]:
+        """
+        Returns the playlist ID given by a playlist URI, open.spotify.com
+        URL or bare ID, or None if 'selector' is none of these (i.e. a name
+        or glob).
+        """
+        match = re.match(
+            r'(?:spotify:playlist:|https?://open\.spotify\.com/playlist/)?'
+            r'([0-9A-Za-z]{22})(?:\?.*)?\Z', selector)
+        return match.group(1) if match else None
+
+    def select_playlists(self, selectors: typing.List[str]) -> typing.List[Playlist]:
+        """
+        Resolves playlists without prompting. Playlist URIs, URLs and IDs
+        are fetched directly, without listing any playlists. Names and glob
+        patterns (e.g. 'Mix *') are matched against the playlist name index
+        (see 'playlist_name_index'), which is re-listed in full if a name
+        matches nothing or a match turns out to be stale (renamed or
+        deleted since it was indexed).
+
+        Called by argument: "--playlist"
+
+        Args:
+            selectors (typing.List[str]): Playlist URIs, IDs, names or
+            globs.
+
+        Returns:
+            typing.List[Playlist]: Matching playlists (see 'get_playlist'),
+            in selector order, without repeats.
+        """
+        name_selectors = [selector for selector in selectors
+                          if self.playlist_id_of(selector) is None]
+        full_refresh = False
+        while True:
+            index = self.playlist_name_index(full_refresh) if name_selectors else []
+            # (playlist ID, name selector it matched or None for IDs)
+            selections = []
+            unmatched = []
+            for selector in selectors:
+                playlist_id = self.playlist_id_of(selector)
+                if playlist_id is not None:
+                    matches = [(playlist_id, None)]
+                else:
+                    matches = [(playlist_id, selector) for playlist_id, name
+                               in index if fnmatch.fnmatchcase(name, selector)]
+                    if not matches:
+                        unmatched.append(selector)
+                selected_ids = [playlist_id for playlist_id, _ in selections]
+                selections.extend(match for match in matches
+                                  if match[0] not in selected_ids)
+
+            if unmatched and full_refresh:
+                sys.exit("No playlist matches: {0}".format(", ".join(unmatched)))
+            if not unmatched:
+                playlists = self.fetch_playlists(
+                    [playlist_id for playlist_id, _ in selections])
+                is_current = []
+                for playlist, (playlist_id, selector) in zip(playlists, selections):
+                    if playlist is None and selector is None:
+                        sys.exit("Playlist not found: {0}".format(playlist_id))
+                    is_current.append(playlist is not None and (
+                        selector is None or fnmatch.fnmatchcase(playlist.name, selector)))
+                if all(is_current) or full_refresh:
+                    return [playlist for playlist, current
+                            in zip(playlists, is_current) if current]
+            full_refresh = True
+
+    def fetch_playlists(self, playlist_ids: typing.List[str]) -> typing.List[typing.Optional[Playlist]]:
+        """
+        Fetches playlists by ID (see 'get_playlist') across a bounded thread
+        pool. Playlists that do not exist are returned as None.
+        """
+        def fetch_playlist(playlist_id: str) -> typing.Optional[Playlist]:
+            try:
+                return self.get_playlist(playlist_id)
+            except spotipy.SpotifyException as error:
+                if error.http_status == 404:
+                    return None
+                raise
+
+        if not playlist_ids:
+            return []
+        max_workers = min(self.concurrency, len(playlist_ids))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(fetch_playlist, playlist_ids))
+
+    def playlist_name_index(self, full_refresh: bool = False) -> typing.List[typing.Tuple[str, str]]:
+        """
+        Returns (playlist ID, name) of each of the user's playlists, in
+        listing order, without per-playlist lookups.
+
+        The index is kept in the metadata cache and refreshed
+        incrementally: only the first listing page is fetched, and merged
+        into the stored index (see 'merge_playlist_names'). The full listing
+        is fetched on first use, when 'full_refresh' is set, without a
+        cache, or when the first page cannot account for the changes.
+
+        Args:
+            full_refresh (bool): Re-list every playlist.
+        """
+        def fetch_page(offset: int) -> dict:
+            return self.sp.current_user_playlists(
+                limit=SpotifyManager.LIBRARY_PAGE_SIZE, offset=offset)
+
+        playlist_names = None
+        stored_names = None
+        if self.cache is not None and not full_refresh:
+            stored_names = self.cache.get_playlist_names(self.user_id)
+        if stored_names is not None:
+            playlist_names = self.merge_playlist_names(
+                stored_names, fetch_page(0))
+        if playlist_names is None:
+            playlist_names = [(playlist_data['id'], playlist_data['name'])
+                              for playlist_data in self.paginate(fetch_page).items()]
+        if self.cache is not None and playlist_names != stored_names:
+            self.cache.put_playlist_names(self.user_id, playlist_names)
+        return playlist_names
+
+    @staticmethod
+    def merge_playlist_names(stored_names: typing.List[typing.Tuple[str, str]], first_page: dict) -> typing.Optional[typing.List[typing.Tuple[str, str]]]:
+        """
+        Merges the first page of the playlist listing into a stored name
+        index. New (created or followed) playlists are listed first, so
+        they appear on the first page; playlists after it keep their stored
+        names. Returns None if the merged index does not add up to the
+        listing's total, e.g. after a playlist past the first page was
+        removed.
+        """
+        page_names = [(playlist_data['id'], playlist_data['name'])
+                      for playlist_data in first_page['items']]
+        if first_page['next'] is None:
+            return page_names
+        page_ids = set(playlist_id for playlist_id, _ in page_names)
+        merged_names = page_names + [
+            (playlist_id, name) for playlist_id, name in stored_names
+            if playlist_id not in page_ids]
+        if len(merged_names) != first_page['total']:
+            return None
+        return merged_names
+
     def get_playlist(self, playlist_id: str) -> Playlist:
         """
-        Fetches Playlist object and populates the instance's 'tracks'
-        variable with the playlist's tracks.
+        Fetches Playlist object and gives it a lazy 'tracks' sequence (see
+        'load_tracks').
 
         Called by argument:
-            "-p"/"--export-playlist-tracks"
-            "-z"/"--shuffle-playlist-tracks"
+            "-e"/"--export-all-playlists"
+            "-a"/"--export-saved-tracks-to-liked-memory-playlist"
 
         Args:
             playlist_id (str): ID of desired playlist.
 
         Returns:
-            Playlist: Playlist object with populated 'tracks' instance variable per playlist's contents.
+            Playlist: Playlist object whose 'tracks' are fetched on access.
         """
 
-        playlist_response = self.sp.playlist(playlist_id)
+        playlist_response = self.sp.playlist(
+            playlist_id, fields=SpotifyManager.PLAYLIST_FIELDS)
         playlist = Playlist(
             uri=playlist_response["uri"],
             name=playlist_response["name"],
             description=playlist_response["description"],
-            track_count=playlist_response["tracks"]["total"]
+            track_count=playlist_response["tracks"]["total"],
+            snapshot_id=playlist_response["snapshot_id"]
         )
-        playlist_tracks_response = self.sp.playlist_items(playlist.id)
-
-        # playlist.uri = playlist_tracks_response
-        while playlist_tracks_response:
-            for playlist_track_data in playlist_tracks_response['items']:
-                playlist_track = self.build_track_object_from_data(
-                    playlist_track_data['track'])
-                playlist.tracks.append(playlist_track)
-            if playlist_tracks_response['next']:
-                playlist_tracks_response = self.sp.next(
-                    playlist_tracks_response)
-            else:
-                playlist_tracks_response = None
+        return self.load_tracks(playlist)
+
+    def load_tracks(self, playlist: Playlist) -> Playlist:
+        """
+        Replaces the playlist's 'tracks' with a LazyTracks sequence of its
+        'track_count' tracks, fetched a page at a time only when accessed.
+        Tracks cached for the playlist's snapshot_id are used instead, and
+        fully fetched tracks are added to the cache.
+
+        Since playlists listed by 'get_playlists' already carry their track
+        count and snapshot_id, they need no further metadata request.
+
+        Args:
+            playlist (Playlist): Playlist with 'track_count' and
+            'snapshot_id' set.
+
+        Returns:
+            Playlist: The same playlist.
+        """
+        if self.cache is not None:
+            cached_tracks = self.cache.get_tracks(
+                playlist.id, playlist.snapshot_id)
+            if cached_tracks is not None:
+                playlist.tracks = cached_tracks
+                return playlist
+
+        def fetch_page(offset: int) -> typing.List[Track]:
+            playlist_items_response = self.sp.playlist_items(
+                playlist.id, fields=SpotifyManager.PLAYLIST_ITEMS_FIELDS,
+                limit=SpotifyManager.PLAYLIST_ITEMS_PAGE_SIZE, offset=offset)
+            with self.phase('build_tracks'):
+                return [self.build_track_object_from_data(playlist_track_data['track'])
+                        for playlist_track_data in playlist_items_response['items']]
+
+        def cache_tracks(tracks: typing.List[Track]) -> None:
+            self.cache.put(playlist.id, playlist.snapshot_id,
+                           playlist.track_count, tracks)
+
+        playlist.tracks = LazyTracks(
+            fetch_page, playlist.track_count,
+            SpotifyManager.PLAYLIST_ITEMS_PAGE_SIZE,
+            concurrency=self.concurrency,
+            on_loaded=cache_tracks if self.cache is not None else None)
         return playlist
 
-    def export_playlist_tracks(self, filepath: str) -> None:
+    def export_playlist_tracks(self, filepath: str, file_format: str = None, playlist_selectors: typing.List[str] = None) -> None:
         """
         Generate a .csv listing of the specified playlist's tracks and save to
         the specified file path (if not specified, default: .\data.csv).
 
+        The playlist is picked interactively unless 'playlist_selectors' are
+        given (see 'select_playlists'). If they select several playlists,
+        or 'filepath' is a directory, each playlist is saved to the
+        directory, named as by '-e'.
+
         Called by argument: "-p"/"--export-playlist-tracks"
 
         Args:
             filepath (str): File path pointing at where to save the generated .csv file.
+            file_format (str): 'csv' or 'snapshot' (default: per the file extension).
+            playlist_selectors (typing.List[str]): Playlist URIs, IDs, names or globs.
         """
         self.authorize("ExportPlaylistTracks")
-        playlist = self.playlist_picker()
-        # Overwrite variable such that it holds a Playlist object populated with tracks, instead of a 'shell' playlist object.
-        playlist = self.get_playlist(playlist.id)
-        playlist.export_tracks(filepath)
+        playlists = self.choose_playlists(playlist_selectors)
+        if len(playlists) == 1 and not os.path.isdir(filepath):
+            with self.phase('write_tracks'):
+                playlists[0].export_tracks(filepath, file_format=file_format)
+            return
+
+        directory = os.getcwd() if filepath == 'const' else filepath
+        os.makedirs(directory, exist_ok=True)
+        file_extension = FILE_EXTENSIONS[file_format or 'csv']
+        for playlist in playlists:
+            with self.phase('write_tracks'):
+                TrackListing.export_track_pages(
+                    [playlist.tracks], os.path.join(
+                        directory, self.export_file_name(playlist, file_extension)),
+                    announce=False, file_format=file_format)
+            print("Exported: {0}".format(playlist.name))
+        print("Playlist Export Files saved to the following directory: {0}".format(
+            directory))
+
+    def export_all_playlists(self, directory: str, file_format: str = None) -> None:
+        """
+        Generate a .csv listing of each of the user's playlists' tracks and
+        save them to the specified directory (if not specified, default:
+        .\\all_playlists). Playlists are listed once, then fetched and
+        written by a pool of 'concurrency' workers.
+
+        A manifest (EXPORT_MANIFEST_NAME) in the directory records the snapshot_id of each
+        exported playlist; playlists unchanged since their last export are
+        skipped.
+
+        Called by argument: "-e"/"--export-all-playlists"
+
+        Args:
+            directory (str): Directory to save the generated .csv files to.
+            file_format (str): 'csv' (default) or 'snapshot'.
+        """
+        file_extension = FILE_EXTENSIONS[file_format or 'csv']
+        self.authorize("ExportPlaylistTracks")
+        if directory == 'const':
+            directory = os.path.join(os.getcwd(), "all_playlists")
+        os.makedirs(directory, exist_ok=True)
+
+        manifest_path = os.path.join(
+            directory, SpotifyManager.EXPORT_MANIFEST_NAME)
+        manifest = self.load_export_manifest(manifest_path)
+
+        playlists = self.get_playlists(resolve_track_counts=False)
+        pending_playlists = self.changed_playlists(
+            playlists, manifest, directory)
+        print("Exporting {0} of {1} playlists ({2} unchanged since last export).".format(
+            len(pending_playlists), len(playlists),
+            len(playlists) - len(pending_playlists)))
+
+        def export(playlist: Playlist) -> Playlist:
+            playlist = self.get_playlist(playlist.id)
+            file_name = self.export_file_name(playlist, file_extension)
+            with self.phase('write_tracks'):
+                TrackListing.export_track_pages(
+                    [playlist.tracks], os.path.join(directory, file_name),
+                    announce=False, file_format=file_format)
+            return playlist
+
+        failure_count = 0
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = {executor.submit(export, playlist): playlist
+                           for playlist in pending_playlists}
+                for done_count, future in enumerate(
+                        concurrent.futures.as_completed(futures), 1):
+                    try:
+                        playlist = future.result()
+                    except Exception as error:
+                        failure_count += 1
+                        print("[{0}/{1}] Failed: {2} ({3})".format(
+                            done_count, len(futures), futures[future].name, error))
+                        continue
+                    manifest[playlist.id] = {
+                        'snapshot_id': playlist.snapshot_id,
+                        'file': self.export_file_name(playlist, file_extension)}
+                    print("[{0}/{1}] Exported: {2}".format(
+                        done_count, len(futures), playlist.name))
+        finally:
+            with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+                json.dump(manifest, manifest_file, indent=2)
+
+        print("Playlist Export Files saved to the following directory: {0}{1}".format(
+            directory, " ({0} failed)".format(failure_count) if failure_count else ""))
+
+    @staticmethod
+    def load_export_manifest(manifest_path: str) -> dict:
+        """
+        Returns the export manifest at 'manifest_path' (playlist ID to
+        {'snapshot_id', 'file'}), or an empty one if there is none yet.
+        """
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+
+    @staticmethod
+    def changed_playlists(playlists: typing.List[Playlist], manifest: dict, directory: str) -> typing.List[Playlist]:
+        """
+        Returns the playlists whose export in 'directory' is missing or
+        older than their current snapshot_id, per the export manifest.
+        """
+        pending_playlists = []
+        for playlist in playlists:
+            entry = manifest.get(playlist.id)
+            if (entry and entry['snapshot_id'] == playlist.snapshot_id
+                    and os.path.exists(os.path.join(directory, entry['file']))):
+                continue
+            pending_playlists.append(playlist)
+        return pending_playlists
+
+    @staticmethod
+    def export_file_name(playlist: Playlist, file_extension: str = '.csv') -> str:
+        """
+        Returns a file system safe file name for the playlist. The playlist
+        ID is included since playlist names need not be unique.
+        """
+        name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', playlist.name).strip(' .')
+        return "{0} ({1}){2}".format(name, playlist.id, file_extension)
+
+    @staticmethod
+    def playlist_id_of_file(file_path: str) -> typing.Optional[str]:
+        """
+        Returns the playlist ID in a file name made by 'export_file_name',
+        or None if there is none.
+        """
+        match = re.search(r' \(([0-9A-Za-z]{22})\)$', Path(file_path).stem)
+        return match.group(1) if match else None
 
-    def import_tracks_to_playlist(self, filepath: str) -> str:
+    def import_tracks_to_playlist(self, filepath: str, dedup: str = None, file_format: str = None) -> str:
         """
         Generate a playlist using the name and data of a .csv at the specified
         file path (format must match that of exported .csv files).
 
+        Tracks are added in chunks of 100, with up to 'concurrency' chunks in
+        flight. Since concurrent chunks may land out of order, the resulting
+        order is then read back and corrected with block moves.
+
+        Progress is recorded in a checkpoint file next to the .csv file
+        ('<file>.checkpoint.json'). If an import fails part way, rerunning it
+        resumes into the same playlist instead of creating a new one.
+
         Args:
             filepath (str): File path to .csv file listing desired
             tracks to include in new playlist (format must match that of exported .csv files)
+            dedup (str): Drop repeated tracks, keeping the 'first' or 'last'
+            occurrence (None keeps every row).
+            file_format (str): 'csv' or 'snapshot' (default: per the file extension).
 
         Returns:
             str: ID of newly generated playlist
         """
-        self.authorize("CreateEditPlaylist")
+        self.authorize("ImportTracksToPlaylist")
         imported_tracks = TrackListing()
-        imported_tracks.import_tracks(filepath)
-        imported_tracks.tracks = imported_tracks.tracks
+        with self.phase('read_tracks'):
+            imported_tracks.import_tracks(
+                filepath, dedup=dedup, file_format=file_format)
 
         name = Path(filepath).stem
+        track_ids = [imported_track.uri for imported_track
+                     in drop_local_tracks(imported_tracks.tracks)]
+
+        checkpoint_path = filepath + '.checkpoint.json'
+        checkpoint = self.load_import_checkpoint(
+            checkpoint_path, len(track_ids))
+        resumed = False
+
+        if checkpoint is None:
+            checkpoint = {'track_count': len(track_ids),
+                          'seed': random.randrange(2 ** 32),
+                          'confirmed_chunks': []}
+            checkpoint['playlist_id'] = self.sp.user_playlist_create(
+                self.user_id, name, public=False)['id']
+            self.write_import_checkpoint(checkpoint_path, checkpoint)
+            print(
+                "Tracks Import File uploaded as Spotify playlist with the following name: {0}".format(name))
+        else:
+            resumed = True
+            print("Resuming import into Spotify playlist with the following name: {0}".format(name))
+        playlist_id = checkpoint['playlist_id']
+
+        # The shuffle is seeded from the checkpoint so a resumed import
+        # continues with the same order.
+        random.Random(checkpoint['seed']).shuffle(track_ids)
+        track_id_chunks = self.chunk_list(track_ids, 100)
 
-        playlist_id = self.sp.user_playlist_create(
-            self.user_id, name, public=False)['id']
+        confirmed_chunks = set(checkpoint['confirmed_chunks'])
+        if resumed:
+            # Chunks whose write was applied but never confirmed (e.g. the
+            # connection dropped) are found in the playlist's contents.
+            chunk_order = self.match_chunks(
+                self.get_playlist_uris(playlist_id), track_id_chunks)
+            if chunk_order is not None:
+                confirmed_chunks = set(chunk_order)
 
-        print(
-            "Tracks Import File uploaded as Spotify playlist with the following name: {0}".format(name))
+        def add_chunk(chunk_index: int) -> int:
+            self.sp.playlist_add_items(
+                playlist_id, track_id_chunks[chunk_index])
+            return chunk_index
+
+        pending_chunks = [chunk_index for chunk_index in range(
+            len(track_id_chunks)) if chunk_index not in confirmed_chunks]
+        failures = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(add_chunk, chunk_index)
+                       for chunk_index in pending_chunks]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    confirmed_chunks.add(future.result())
+                except Exception as error:
+                    failures.append(error)
+                    continue
+                checkpoint['confirmed_chunks'] = sorted(confirmed_chunks)
+                self.write_import_checkpoint(checkpoint_path, checkpoint)
+
+        if failures:
+            sys.exit("Import interrupted after {0} of {1} track chunks ({2}). "
+                     "Rerun the import to resume.".format(
+                         len(confirmed_chunks), len(track_id_chunks), failures[0]))
+
+        if self.concurrency > 1 or resumed:
+            self.restore_chunk_order(playlist_id, track_id_chunks)
+
+        os.remove(checkpoint_path)
+        return playlist_id
 
-        track_ids = [
-            imported_track.uri for imported_track in imported_tracks.tracks]
-        random.shuffle(track_ids)
+    @staticmethod
+    def load_import_checkpoint(checkpoint_path: str, track_count: int) -> typing.Optional[dict]:
+        """
+        Returns the checkpoint of an interrupted import of 'track_count'
+        tracks, or None if there is none (or it belongs to another file).
+        """
+        if not os.path.exists(checkpoint_path):
+            return None
+        with open(checkpoint_path, encoding='utf-8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint['track_count'] != track_count:
+            return None
+        return checkpoint
+
+    @staticmethod
+    def write_import_checkpoint(checkpoint_path: str, checkpoint: dict) -> None:
+        # Written to a temporary file first, so a crash mid-write never
+        # leaves a truncated checkpoint.
+        with open(checkpoint_path + '.tmp', 'w', encoding='utf-8') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+    def get_playlist_uris(self, playlist_id: str) -> typing.List[str]:
+        """
+        Returns the track URIs of a playlist, in playlist order.
+        """
+        paginator = self.paginate(
+            lambda offset: self.sp.playlist_items(
+                playlist_id, fields='items(track(uri)),limit,offset,total',
+                limit=SpotifyManager.PLAYLIST_ITEMS_PAGE_SIZE, offset=offset))
+        return [item['track']['uri'] for item in paginator.items()]
+
+    @staticmethod
+    def match_chunks(uris: typing.List[str], chunks: typing.List[typing.List[str]]) -> typing.Optional[typing.List[int]]:
+        """
+        Splits a playlist's URIs into the chunks they were added as.
 
-        track_id_chunks = self.chunk_list(track_ids, 100)
+        Returns:
+            typing.Optional[typing.List[int]]: Chunk indices in playlist order,
+            or None if the URIs are not a sequence of whole chunks.
+        """
+        chunks_by_first_uri = {}
+        for chunk_index, chunk in enumerate(chunks):
+            chunks_by_first_uri.setdefault(chunk[0], []).append(chunk_index)
+        chunk_order = []
+        position = 0
+        while position < len(uris):
+            for chunk_index in chunks_by_first_uri.get(uris[position], []):
+                chunk = chunks[chunk_index]
+                if uris[position:position + len(chunk)] == chunk:
+                    chunks_by_first_uri[uris[position]].remove(chunk_index)
+                    chunk_order.append(chunk_index)
+                    position += len(chunk)
+                    break
+            else:
+                return None
+        return chunk_order
 
-        for track_id_chunk in track_id_chunks:
-            self.sp.playlist_add_items(playlist_id, track_id_chunk)
+    def restore_chunk_order(self, playlist_id: str, chunks: typing.List[typing.List[str]]) -> None:
+        """
+        Reorders a playlist built from 'chunks' (added in any order) so that
+        the chunks appear in order, using one block move per misplaced chunk.
+        """
+        chunk_order = self.match_chunks(
+            self.get_playlist_uris(playlist_id), chunks)
+        if chunk_order is None or len(chunk_order) != len(chunks):
+            sys.exit("Imported playlist contents do not match the import file. "
+                     "Track order was not verified.")
+        chunk_starts = [0]
+        for chunk in chunks:
+            chunk_starts.append(chunk_starts[-1] + len(chunk))
+        # current_order[i] is the target position of the track at i.
+        current_order = []
+        for chunk_index in chunk_order:
+            current_order.extend(range(
+                chunk_starts[chunk_index], chunk_starts[chunk_index + 1]))
+        snapshot_id = None
+        with self.phase('plan_moves'):
+            moves = plan_block_moves(current_order)
+        for range_start, insert_before, range_length in moves:
+            snapshot_id = self.sp.playlist_reorder_items(
+                playlist_id, range_start, insert_before,
+                range_length=range_length, snapshot_id=snapshot_id
+            )['snapshot_id']
+
+    def shuffle_playlist_tracks(self, mode: str = 'replace', playlist_selectors: typing.List[str] = None) -> None:
+        """
+        Shuffles the track order of a selected spotify playlist, or of each
+        playlist given by 'playlist_selectors' (see 'select_playlists').
 
-        return playlist_id
+        Called by argument: "-z"/"--shuffle-playlist-tracks"
 
-    def shuffle_playlist_tracks(self) -> None:
-        """
-        Shuffles the track order of a selected spotify playlist.
+        Args:
+            mode (str): Write strategy, see 'shuffle_playlist'.
+            playlist_selectors (typing.List[str]): Playlist URIs, IDs, names or globs.
         """
         self.authorize("ShufflePlaylistTracks")
-        playlist = self.playlist_picker()
-        # Overwrite variable such that it holds a Playlist object populated with tracks, instead of a 'shell' playlist object.
-        playlist = self.get_playlist(playlist.id)
-
-        for i, playlist_track in enumerate(playlist.tracks):
-            insert_before = random.randint(0, len(playlist.tracks)-1)
-            self.sp.playlist_reorder_items(
-                playlist.id, i,
-                insert_before,
-                range_length=1,
-                snapshot_id=None
-            )
-
-        print("Shuffling complete on playlist: {0}".format(playlist.name))
-
-    def export_saved_tracks_to_liked_memory_playlist(self) -> None:
-        # Get liked songs
-        self.authorize("ListPlaylists")
-        saved_tracks = self.get_saved_tracks()
+        for playlist in self.choose_playlists(playlist_selectors):
+            api_call_count = self.shuffle_playlist(playlist, mode)
+
+            print("Shuffling complete on playlist: {0} ({1} API write calls)".format(
+                playlist.name, api_call_count))
+
+    def shuffle_playlist(self, playlist: Playlist, mode: str = 'replace') -> int:
+        """
+        Shuffles the tracks of a populated Playlist. The shuffled order is
+        computed locally, then written using one of two strategies:
+
+            'replace': Replace the playlist's contents in bulk (one
+            'playlist_replace_items' call plus one 'playlist_add_items' call
+            per further 100 tracks). Tracks' 'added at' dates are reset.
+            Since the playlist is cut short until the last chunk is added,
+            the shuffled tracks are first saved to a recovery file (see
+            'write_shuffle_chunk' and 'restore_shuffle'). Playlists with
+            local files, which cannot be written back, use 'moves'.
+
+            'moves': Apply the fewest block reorders that reach the shuffled
+            order, keeping tracks' 'added at' dates.
+
+        Both strategies are guarded by the playlist's snapshot_id, so edits
+        made since the playlist was fetched abort the shuffle.
+
+        Args:
+            playlist (Playlist): Playlist with tracks (see 'load_tracks').
+            mode (str): 'replace' or 'moves'.
+
+        Returns:
+            int: Number of API write calls made.
+        """
+        track_uris = [track.uri for track in playlist.tracks]
+        target_order = list(range(len(track_uris)))
+        random.shuffle(target_order)
+        api_call_count = 0
+        if mode == 'replace' and any(is_local_uri(uri) for uri in track_uris):
+            # Local files cannot be written back, only reordered.
+            print("Playlist '{0}' has local files, so it is shuffled with "
+                  "moves.".format(playlist.name))
+            mode = 'moves'
+
+        if mode == 'moves':
+            # current_order[i] is the shuffled position of the track at i.
+            current_order = [0] * len(target_order)
+            for position, source_position in enumerate(target_order):
+                current_order[source_position] = position
+            snapshot_id = playlist.snapshot_id
+            with self.phase('plan_moves'):
+                moves = plan_block_moves(current_order)
+            for range_start, insert_before, range_length in moves:
+                snapshot_id = self.sp.playlist_reorder_items(
+                    playlist.id, range_start, insert_before,
+                    range_length=range_length, snapshot_id=snapshot_id
+                )['snapshot_id']
+                api_call_count += 1
+        elif mode == 'replace':
+            current_snapshot_id = self.sp.playlist(
+                playlist.id, fields='snapshot_id')['snapshot_id']
+            if current_snapshot_id != playlist.snapshot_id:
+                sys.exit("Playlist '{0}' changed since it was fetched. "
+                         "Exiting without shuffling.".format(playlist.name))
+            tracks = list(playlist.tracks)
+            shuffled_tracks = [tracks[position] for position in target_order]
+            shuffled_uris = [track.uri for track in shuffled_tracks]
+            recovery_path = os.path.join(
+                os.getcwd(), SpotifyManager.SHUFFLE_RECOVERY_PREFIX
+                + self.export_file_name(playlist))
+            TrackListing.export_track_pages(
+                [shuffled_tracks], recovery_path, announce=False,
+                file_format='csv')
+            track_uri_chunks = self.chunk_list(shuffled_uris, 100) or [[]]
+            try:
+                self.write_shuffle_chunk(
+                    playlist.id, track_uri_chunks[0], 0, replace=True)
+                api_call_count += 1
+                written_count = len(track_uri_chunks[0])
+                for track_uri_chunk in track_uri_chunks[1:]:
+                    self.write_shuffle_chunk(
+                        playlist.id, track_uri_chunk, written_count)
+                    api_call_count += 1
+                    written_count += len(track_uri_chunk)
+            except (spotipy.SpotifyException, requests.exceptions.RequestException) as error:
+                api_call_count += self.restore_shuffle(
+                    playlist, shuffled_uris, recovery_path, error)
+            os.remove(recovery_path)
+        else:
+            raise ValueError("Unknown shuffle mode: {0}".format(mode))
+
+        return api_call_count
+
+    def write_shuffle_chunk(self, playlist_id: str, track_uris: typing.List[str], written_count: int, replace: bool = False) -> None:
+        """
+        Writes one chunk of a 'replace' shuffle, retrying server errors and
+        dropped connections up to SHUFFLE_WRITE_ATTEMPTS times. Replacing is
+        idempotent; before an add is retried, the playlist's track count
+        shows whether the failed attempt was applied after all.
+
+        Args:
+            playlist_id (str): ID of the playlist.
+            track_uris (typing.List[str]): URIs of the chunk.
+            written_count (int): Number of tracks written by earlier chunks.
+            replace (bool): Replace the playlist's tracks with the chunk
+            instead of appending it.
+        """
+        for attempt in range(SpotifyManager.SHUFFLE_WRITE_ATTEMPTS):
+            if attempt:
+                time.sleep(SpotifyManager.SHUFFLE_RETRY_DELAY * 2 ** (attempt - 1))
+                if not replace:
+                    track_count = self.sp.playlist(
+                        playlist_id, fields='tracks.total')['tracks']['total']
+                    if track_count == written_count + len(track_uris):
+                        return
+                    if track_count != written_count:
+                        raise spotipy.SpotifyException(
+                            409, -1, "Playlist holds {0} tracks, expected {1}".format(
+                                track_count, written_count))
+            try:
+                if replace:
+                    self.sp.playlist_replace_items(playlist_id, track_uris)
+                else:
+                    self.sp.playlist_add_items(playlist_id, track_uris)
+                return
+            except spotipy.SpotifyException as error:
+                if (error.http_status < 500
+                        or attempt + 1 == SpotifyManager.SHUFFLE_WRITE_ATTEMPTS):
+                    raise
+            except requests.exceptions.RequestException:
+                if attempt + 1 == SpotifyManager.SHUFFLE_WRITE_ATTEMPTS:
+                    raise
+
+    def restore_shuffle(self, playlist: Playlist, shuffled_uris: typing.List[str], recovery_path: str, error: Exception) -> int:
+        """
+        Brings a playlist whose 'replace' shuffle failed part way to its
+        shuffled tracks, with the fewest edits (see 'sync_playlist'). If
+        that fails too, exits, pointing at the recovery file, which '--sync'
+        restores the playlist from.
+
+        Returns:
+            int: Number of API write calls made.
+        """
+        print("Shuffle of playlist '{0}' was interrupted ({1}). Restoring "
+              "its tracks from the following path: {2}".format(
+                  playlist.name, error, recovery_path))
+        try:
+            plan = self.sync_playlist(self.get_playlist(playlist.id), shuffled_uris)
+        except (spotipy.SpotifyException, requests.exceptions.RequestException) as restore_error:
+            sys.exit("Could not restore playlist '{0}' ({1}). Its shuffled "
+                     "tracks are saved at the following path; restore them "
+                     "with '--sync': {2}".format(
+                         playlist.name, restore_error, recovery_path))
+        return plan.call_count
+
+    def sync_playlist_tracks(self, path: str, file_format: str = None, dry_run: bool = False, playlist_selectors: typing.List[str] = None) -> None:
+        """
+        Brings playlists in line with track listing files, editing only the
+        tracks that differ (see 'sync_playlist').
+
+        'path' is either one file or a directory, in which every file named
+        as by '-e' (i.e. with the playlist ID in brackets) is synced to its
+        playlist. The playlist of a single file without an ID is the one
+        given by 'playlist_selectors' (see 'select_playlists'), or else is
+        picked interactively.
+
+        Files with rows that cannot be read (see 'TrackListing.import_tracks')
+        are not synced, as their playlists would lose the skipped tracks.
+
+        Called by argument: "--sync"
+
+        Args:
+            path (str): Track listing file, or directory of them.
+            file_format (str): 'csv' or 'snapshot' (default: per the file extension).
+            dry_run (bool): Only print the edits each playlist needs.
+            playlist_selectors (typing.List[str]): Playlist URI, ID, name or glob.
+        """
+        self.authorize("SyncPlaylistTracks")
+        if os.path.isdir(path):
+            file_paths = sorted(
+                os.path.join(path, file_name) for file_name in os.listdir(path)
+                if os.path.splitext(file_name)[1] in FILE_EXTENSIONS.values()
+                and self.playlist_id_of_file(file_name))
+        else:
+            file_paths = [path]
+
+        refused_file_paths = []
+        for file_path in file_paths:
+            target_tracks = TrackListing()
+            with self.phase('read_tracks'):
+                invalid_rows = target_tracks.import_tracks(
+                    file_path, file_format=file_format)
+            if invalid_rows:
+                # The skipped rows may be tracks the playlist holds; syncing
+                # without them would remove those tracks.
+                print("Not syncing '{0}': fix or remove its invalid row(s) "
+                      "first.".format(file_path))
+                refused_file_paths.append(file_path)
+                continue
+            playlist_id = self.playlist_id_of_file(file_path)
+            if playlist_id is not None:
+                playlist = self.get_playlist(playlist_id)
+            else:
+                playlists = self.choose_playlists(playlist_selectors)
+                if len(playlists) > 1:
+                    sys.exit("'{0}' can only be synced to one playlist, but "
+                             "{1} match.".format(file_path, len(playlists)))
+                playlist = playlists[0]
+            plan = self.sync_playlist(
+                playlist, [track.uri for track in target_tracks.tracks],
+                dry_run=dry_run)
+            print("{0} playlist: {1}: {2}".format(
+                "Would sync" if dry_run else "Synced", playlist.name,
+                plan.summary()))
+        if refused_file_paths:
+            print("Operation Failed: {0} file(s) with invalid rows were not "
+                  "synced.".format(len(refused_file_paths)))
+            sys.exit(1)
+
+    def sync_playlist(self, playlist: Playlist, target_uris: typing.List[str], dry_run: bool = False) -> SyncPlan:
+        """
+        Edits a playlist so that its tracks are 'target_uris', in order,
+        with the fewest writes (see Sync.plan_sync): removals, then block
+        moves, then chunked additions. Tracks already in the playlist stay,
+        keeping their 'added at' dates. Local files can only be reordered
+        (see Sync.writable_target_uris).
+
+        Removals and moves are guarded by the playlist's snapshot_id, so
+        edits made since the playlist was fetched abort the sync. The add
+        endpoint takes no snapshot_id; if additions come first, the
+        snapshot_id is checked before them.
+
+        Args:
+            playlist (Playlist): Playlist with tracks (see 'load_tracks').
+            target_uris (typing.List[str]): Track URIs the playlist should have.
+            dry_run (bool): Plan the edits without applying them.
+
+        Returns:
+            SyncPlan: The planned (or applied) edits.
+        """
+        current_uris = [track.uri for track in playlist.tracks]
+        target_uris, dropped_uris, kept_uris = writable_target_uris(
+            current_uris, target_uris)
+        if dropped_uris:
+            print("Skipped {0} local file(s) missing from playlist '{1}', "
+                  "which cannot be added to playlists.".format(
+                      len(dropped_uris), playlist.name))
+        if kept_uris:
+            print("Kept {0} local file(s) of playlist '{1}' at its end, "
+                  "which cannot be removed from playlists.".format(
+                      len(kept_uris), playlist.name))
+        with self.phase('plan_sync'):
+            plan = plan_sync(current_uris, target_uris)
+        if dry_run:
+            return plan
+
+        snapshot_id = playlist.snapshot_id
+        for removal_chunk in plan.removal_chunks:
+            snapshot_id = self.sp.playlist_remove_specific_occurrences_of_items(
+                playlist.id, removal_chunk, snapshot_id=snapshot_id
+            )['snapshot_id']
+        for range_start, insert_before, range_length in plan.moves:
+            snapshot_id = self.sp.playlist_reorder_items(
+                playlist.id, range_start, insert_before,
+                range_length=range_length, snapshot_id=snapshot_id
+            )['snapshot_id']
+        if plan.addition_chunks and snapshot_id == playlist.snapshot_id:
+            current_snapshot_id = self.sp.playlist(
+                playlist.id, fields='snapshot_id')['snapshot_id']
+            if current_snapshot_id != playlist.snapshot_id:
+                sys.exit("Playlist '{0}' changed since it was fetched. "
+                         "Exiting without syncing.".format(playlist.name))
+        for position, uris in plan.addition_chunks:
+            self.sp.playlist_add_items(playlist.id, uris, position)
+        return plan
+
+    def analyze_playlists(self, output_path: str, playlist_selectors: typing.List[str] = None, min_shared: int = 1) -> 'TrackIndex':
+        """
+        Loads the user's playlists, or those given by 'playlist_selectors'
+        (see 'select_playlists'), into a TrackIndex and saves its report:
+        pairwise overlap, tracks in several playlists, and artist and album
+        histograms (see Analytics.write_report). Playlists are fetched by a
+        pool of 'concurrency' workers and interned as they arrive.
+
+        Called by argument: "--analyze"
+
+        Args:
+            output_path (str): Report path, a .json file or a directory of
+            .csv files.
+            playlist_selectors (typing.List[str]): Playlist URIs, IDs, names or globs.
+            min_shared (int): Only report overlaps of pairs of playlists
+            sharing at least this many tracks.
+
+        Returns:
+            TrackIndex: Index of the analyzed playlists.
+        """
+        # Deferred: Analytics pulls in numpy and scipy when installed, which
+        # only this command needs.
+        from spotify_playlist_utility.Analytics import TrackIndex, write_report
+
+        self.authorize("AnalyzePlaylists")
+        if playlist_selectors:
+            playlists = self.select_playlists(playlist_selectors)
+        else:
+            playlists = self.get_playlists(resolve_track_counts=False)
+
+        def load(playlist: Playlist) -> typing.Tuple[Playlist, typing.List[Track]]:
+            # Listed playlists come without tracks; selected ones are lazy.
+            if not isinstance(playlist.tracks, LazyTracks):
+                playlist = self.get_playlist(playlist.id)
+            return playlist, list(playlist.tracks)
+
+        track_index = TrackIndex()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for playlist, tracks in executor.map(load, playlists):
+                track_index.add_playlist(playlist.id, playlist.name, tracks)
+        with self.phase('analyze'):
+            write_report(track_index, output_path, min_shared)
+        print("Analyzed {0} playlists ({1} distinct tracks). Report saved to "
+              "the following path: {2}".format(
+                  track_index.playlist_count, track_index.track_count,
+                  output_path))
+        return track_index
+
+    def export_saved_tracks_to_liked_memory_playlist(self, full_resync: bool = False) -> typing.Optional[str]:
+        """
+        Appends saved tracks to the "Liked Memory" playlist, creating it
+        first if needed.
+
+        Only tracks saved since the previous run are considered: the newest
+        'added_at' seen is stored as a watermark in the metadata cache. A
+        full walk of the saved tracks happens on the first run, when
+        'full_resync' is set, or when the cache is disabled or refreshed.
+        If nothing was saved after the watermark, nothing else is fetched.
+
+        The Liked Memory playlist's tracks are cached under its new
+        snapshot_id after appending, so the next run does not refetch them.
+
+        Called by argument:
+            "-a"/"--export-saved-tracks-to-liked-memory-playlist"
+
+        Args:
+            full_resync (bool): Ignore the stored watermark.
 
-        # Get playlists to detect for liked memory playlist
-        playlists = self.get_playlists()
+        Returns:
+            str: ID of the Liked Memory playlist, or None if there were no
+            new saved tracks.
+        """
+        # Get liked songs
+        self.authorize("ExportSavedTracksToLikedMemoryPlaylist")
+        watermark_name = 'saved_tracks_added_at:{0}'.format(self.user_id)
+        added_after = None
+        if self.cache is not None and not full_resync:
+            added_after = self.cache.get_watermark(watermark_name)
+        saved_tracks, newest_added_at = self.get_saved_tracks_added_after(
+            added_after)
+        if added_after is not None and newest_added_at == added_after:
+            print("No tracks saved since the previous run.")
+            return None
+
+        # Get playlists to detect for liked memory playlist (by name only,
+        # so the listed track counts need no lookups)
+        playlists = self.get_playlists(resolve_track_counts=False)
         # list of all elements with .n==30
         liked_memory_playlist_list = [
             x for x in playlists if x.name == "Liked Memory"]
 
         liked_memory_playlist_id = None
 
-        self.authorize("CreateEditPlaylist")
-
         # Create liked memory playlist, if it doesn't exist
         if not liked_memory_playlist_list:  # empty list
             liked_memory_playlist_id = self.sp.user_playlist_create(
@@ -390,21 +1496,38 @@ class SpotifyManager(object):
 
         # Append saved tracks to liked memory playlist
         liked_memory_playlist = self.get_playlist(liked_memory_playlist_id)
-        saved_tracks_to_append = []
-        for saved_track in saved_tracks.tracks:
-            if not any(liked_memory_track.uri == saved_track.uri for liked_memory_track in liked_memory_playlist.tracks):
-                saved_tracks_to_append.append(saved_track)
-        saved_track_to_append_ids = [
-            saved_track_to_append.uri for saved_track_to_append in saved_tracks_to_append]
-
-        saved_tracks_to_append_id_chunks = self.chunk_list(
-            saved_track_to_append_ids, 100)
-
-        for saved_track_to_append_id_chunk in saved_tracks_to_append_id_chunks:
-            self.sp.playlist_add_items(
-                liked_memory_playlist_id, saved_track_to_append_id_chunk, 0)
+        saved_tracks_to_append = saved_tracks.difference(
+            liked_memory_playlist)
+        saved_track_to_append_chunks = self.chunk_list(
+            saved_tracks_to_append.tracks, 100)
+
+        snapshot_id = None
+        for saved_track_to_append_chunk in saved_track_to_append_chunks:
+            snapshot_id = self.sp.playlist_add_items(
+                liked_memory_playlist_id,
+                [track.uri for track in saved_track_to_append_chunk], 0)['snapshot_id']
+        if snapshot_id is not None:
+            self.cache_prepended_tracks(
+                liked_memory_playlist, saved_track_to_append_chunks, snapshot_id)
+
+        if self.cache is not None and newest_added_at is not None:
+            self.cache.set_watermark(watermark_name, newest_added_at)
 
         return liked_memory_playlist_id
 
-    def chunk_list(self, list, n):
+    def cache_prepended_tracks(self, playlist: Playlist, chunks: typing.List[typing.List[Track]], snapshot_id: str) -> None:
+        """
+        Caches a playlist's tracks after 'chunks' were each inserted at
+        its top, in order, leaving it at 'snapshot_id'. 'playlist' holds
+        its tracks from before the inserts.
+        """
+        if self.cache is None:
+            return
+        tracks = list(playlist.tracks)
+        for chunk in chunks:
+            tracks = list(chunk) + tracks
+        self.cache.put(playlist.id, snapshot_id, len(tracks), tracks)
+
+    @staticmethod
+    def chunk_list(list, n):
         return [list[i:i + n] for i in range(0, len(list), n)]
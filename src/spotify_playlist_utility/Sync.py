@@ -0,0 +1,157 @@
+import collections
+import typing
+
+from spotify_playlist_utility.Shuffle import BlockMove, plan_block_moves
+from spotify_playlist_utility.TrackLists import is_local_uri
+
+# Max items per call of the Web API's add and remove endpoints.
+CHUNK_SIZE = 100
+
+
+class SyncPlan():
+    """
+    Edits turning the current tracks of a playlist into target tracks, in
+    the order they must be applied:
+
+        removal_chunks: Arguments ('items') of each
+        'playlist_remove_specific_occurrences_of_items' call. Positions
+        refer to the playlist as left by the previous call.
+
+        moves: Block moves ordering the remaining tracks (see
+        Shuffle.plan_block_moves).
+
+        addition_chunks: (position, uris) of each 'playlist_add_items'
+        call.
+    """
+
+    def __init__(self, removal_chunks: typing.List[typing.List[dict]],
+                 moves: typing.List[BlockMove],
+                 addition_chunks: typing.List[typing.Tuple[int, typing.List[str]]]) -> None:
+        self.removal_chunks = removal_chunks
+        self.moves = moves
+        self.addition_chunks = addition_chunks
+
+    @property
+    def removed_count(self) -> int:
+        return sum(len(item['positions']) for chunk in self.removal_chunks
+                   for item in chunk)
+
+    @property
+    def added_count(self) -> int:
+        return sum(len(uris) for _, uris in self.addition_chunks)
+
+    @property
+    def edit_count(self) -> int:
+        """Number of tracks removed or added, plus number of block moves."""
+        return self.removed_count + len(self.moves) + self.added_count
+
+    @property
+    def call_count(self) -> int:
+        """Number of API write calls applying the plan."""
+        return (len(self.removal_chunks) + len(self.moves)
+                + len(self.addition_chunks))
+
+    def summary(self) -> str:
+        return ("{0} edits ({1} removed, {2} added, {3} block moves) in {4} "
+                "API write calls".format(
+                    self.edit_count, self.removed_count, self.added_count,
+                    len(self.moves), self.call_count))
+
+
+def plan_sync(current_uris: typing.List[str], target_uris: typing.List[str]) -> SyncPlan:
+    """
+    Plans the edits turning a playlist's tracks into the target tracks,
+    keeping every track that is in both (and so its 'added at' date).
+
+    Tracks are matched by URI, the n-th occurrence in the playlist to the
+    n-th occurrence in the target. Unmatched tracks of the playlist are
+    removed, highest positions first so that each call's positions are
+    unaffected by the previous calls. The remaining tracks are ordered with
+    the fewest block moves (those off a longest increasing subsequence
+    move). Unmatched target tracks are then inserted at their target
+    positions, consecutive ones together. Planning takes O(n log n).
+
+    Args:
+        current_uris (typing.List[str]): Track URIs of the playlist.
+        target_uris (typing.List[str]): Track URIs it should have, in order.
+
+    Returns:
+        SyncPlan: Edits to apply, in order.
+    """
+    target_positions = collections.defaultdict(collections.deque)
+    for position, uri in enumerate(target_uris):
+        target_positions[uri].append(position)
+
+    removals = []
+    kept_target_positions = []  # of the kept tracks, in playlist order
+    for position, uri in enumerate(current_uris):
+        matching_positions = target_positions.get(uri)
+        if matching_positions:
+            kept_target_positions.append(matching_positions.popleft())
+        else:
+            removals.append((position, uri))
+
+    removal_chunks = []
+    removals.reverse()
+    for chunk_start in range(0, len(removals), CHUNK_SIZE):
+        positions_by_uri = collections.OrderedDict()
+        for position, uri in removals[chunk_start:chunk_start + CHUNK_SIZE]:
+            positions_by_uri.setdefault(uri, []).append(position)
+        removal_chunks.append([{'uri': uri, 'positions': positions}
+                               for uri, positions in positions_by_uri.items()])
+
+    # Rank of each kept track among the kept tracks' target positions.
+    ranks = {target_position: rank for rank, target_position
+             in enumerate(sorted(kept_target_positions))}
+    moves = plan_block_moves(
+        [ranks[target_position] for target_position in kept_target_positions])
+
+    # Once the kept tracks are in order, inserting the missing tracks in
+    # target order puts each one at its target position.
+    kept = set(kept_target_positions)
+    addition_chunks = []
+    position = 0
+    while position < len(target_uris):
+        if position in kept:
+            position += 1
+            continue
+        run_end = position
+        while (run_end < len(target_uris) and run_end not in kept
+               and run_end - position < CHUNK_SIZE):
+            run_end += 1
+        addition_chunks.append((position, target_uris[position:run_end]))
+        position = run_end
+    return SyncPlan(removal_chunks, moves, addition_chunks)
+
+
+def writable_target_uris(current_uris: typing.List[str], target_uris: typing.List[str]) -> typing.Tuple[typing.List[str], typing.List[str], typing.List[str]]:
+    """
+    Adjusts target tracks to the edits the Web API can make: local files
+    can be reordered, but neither added nor removed. Local files of the
+    target beyond those already in the playlist are dropped, and local
+    files of the playlist missing from the target are kept, at its end.
+
+    Returns:
+        typing.Tuple[typing.List[str], typing.List[str], typing.List[str]]:
+        The adjusted target URIs, the dropped URIs and the kept URIs.
+    """
+    local_counts = collections.Counter(
+        uri for uri in current_uris if is_local_uri(uri))
+    if not local_counts and not any(is_local_uri(uri) for uri in target_uris):
+        return target_uris, [], []
+
+    writable_uris = []
+    dropped_uris = []
+    for uri in target_uris:
+        if is_local_uri(uri):
+            if not local_counts[uri]:
+                dropped_uris.append(uri)
+                continue
+            local_counts[uri] -= 1
+        writable_uris.append(uri)
+    kept_uris = []
+    for uri in current_uris:
+        if is_local_uri(uri) and local_counts[uri]:
+            local_counts[uri] -= 1
+            kept_uris.append(uri)
+    return writable_uris + kept_uris, dropped_uris, kept_uris
@@ -1,13 +1,22 @@
+import sys
+
+
 class Track():
     """
     Represents a single track within Spotify.
+
+    Tracks use '__slots__' rather than a per-instance '__dict__', and artist
+    and album names are interned so that tracks sharing them share a single
+    string object.
     """
 
+    __slots__ = ('uri', 'name', 'artist', 'album')
+
     def __init__(self, uri, name, artist, album):
         self.uri = uri
         self.name = name
-        self.artist = artist
-        self.album = album
+        self.artist = intern_name(artist)
+        self.album = intern_name(album)
 
     def __str__(self):
         return "{0} by {1} on {2} - {3}".format(self.name, self.artist, self.album, self.uri)
@@ -24,3 +33,8 @@ class Track():
     @staticmethod
     def csv_export_header():
         return ['uri', 'name', 'artist', 'album']
+
+
+def intern_name(value):
+    """Interns str values (e.g. artist/album names); returns others as-is."""
+    return sys.intern(value) if type(value) is str else value
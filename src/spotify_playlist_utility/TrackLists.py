@@ -1,50 +1,541 @@
+import array
+import collections.abc
+import concurrent.futures
+import contextlib
 import csv
+import itertools
 import os
+import re
 import sys
+import threading
 import typing
 
+from spotify_playlist_utility.Snapshot import (EXTENSION, SnapshotTracks,
+                                               write_snapshot)
 from spotify_playlist_utility.Track import Track
 
+FILE_EXTENSIONS = {'csv': '.csv', 'snapshot': EXTENSION}
+# URIs of playlist entries: Spotify tracks and episodes, and local files
+# ('spotify:local:<artist>:<album>:<title>:<duration>', each field
+# URL-encoded and possibly empty), as exported by '-e' and '-p'.
+TRACK_URI_PATTERN = re.compile(
+    r'spotify:(?:(?:track|episode):[0-9A-Za-z]{22}'
+    r'|local:[^:\s]*:[^:\s]*:[^:\s]*:[0-9]*)\Z')
+# Prefix of local file URIs. They can be read, converted and compared, but
+# the Web API cannot add them to (or remove them from) playlists.
+LOCAL_URI_PREFIX = 'spotify:local:'
+# Max number of invalid rows listed when importing a .csv file.
+MAX_REPORTED_ROWS = 20
+
+
+class TrackList(list):
+    """
+    List of tracks that counts its in-place edits in 'version', so indexes
+    built over it (see TrackListing.uri_index) can tell when they are stale.
+    """
+
+    __slots__ = ('version',)
+
+    def __init__(self, tracks: typing.Iterable[Track] = ()) -> None:
+        super().__init__(tracks)
+        self.version = 0
+
+
+def _counted_edit(name: str):
+    edit = getattr(list, name)
+
+    def counted_edit(self, *args, **kwargs):
+        self.version += 1
+        return edit(self, *args, **kwargs)
+    counted_edit.__name__ = name
+    return counted_edit
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append',
+              'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse'):
+    setattr(TrackList, _name, _counted_edit(_name))
+del _name
+
 
 class TrackListing():
-    def __init__(self, tracks: typing.List[Track] = []) -> None:
-        self.tracks = tracks
+    def __init__(self, tracks: typing.List[Track] = None) -> None:
+        # Each listing gets its own list; a shared mutable default would
+        # leak tracks between listings.
+        self.tracks = tracks if tracks is not None else []
+
+    @property
+    def tracks(self) -> typing.Sequence[Track]:
+        return self._tracks
+
+    @tracks.setter
+    def tracks(self, tracks: typing.Sequence[Track]) -> None:
+        # Plain lists are wrapped so that in-place edits are counted. Other
+        # sequences are either read-only (e.g. LazyTracks) or count their
+        # edits themselves (TrackColumns).
+        if type(tracks) is list:
+            tracks = TrackList(tracks)
+        self._tracks = tracks
+        self._uri_index = None
+        self._uri_index_version = None
+
+    def uri_index(self) -> typing.Dict[str, int]:
+        """
+        Returns a mapping of each track URI in the listing to the position of
+        its first occurrence. The index is kept until 'tracks' is replaced
+        or edited in place (as counted by its 'version'), so repeated
+        lookups share one index. It must not be modified.
+
+        Returns:
+            typing.Dict[str, int]: Track URI to first position mapping.
+        """
+        version = getattr(self._tracks, 'version', None)
+        if self._uri_index is None or self._uri_index_version != version:
+            if isinstance(self._tracks, SnapshotTracks):
+                # Only the URI column is needed; skip building the tracks.
+                uris = self._tracks.column('uri')
+            else:
+                uris = (track.uri for track in self._tracks)
+            uri_index = {}
+            for position, uri in enumerate(uris):
+                uri_index.setdefault(uri, position)
+            self._uri_index = uri_index
+            self._uri_index_version = version
+        return self._uri_index
+
+    def __contains__(self, track: typing.Union[Track, str]) -> bool:
+        uri = track.uri if isinstance(track, Track) else track
+        return uri in self.uri_index()
+
+    def difference(self, other: 'TrackListing') -> 'TrackListing':
+        """
+        Returns the tracks of this listing whose URI is not in 'other',
+        keeping this listing's order.
+        """
+        other_index = other.uri_index()
+        return TrackListing([track for track in self.tracks
+                             if track.uri not in other_index])
 
-    def export_tracks(self, file_path) -> None:
+    def intersection(self, other: 'TrackListing') -> 'TrackListing':
+        """
+        Returns the tracks of this listing whose URI is also in 'other',
+        keeping this listing's order.
+        """
+        other_index = other.uri_index()
+        return TrackListing([track for track in self.tracks
+                             if track.uri in other_index])
+
+    def union(self, other: 'TrackListing') -> 'TrackListing':
+        """
+        Returns the tracks of this listing followed by the tracks of 'other'
+        whose URI is not already included, keeping the order of both.
+        """
+        seen = set(self.uri_index())
+        tracks = list(self.tracks)
+        for track in other.tracks:
+            if track.uri not in seen:
+                seen.add(track.uri)
+                tracks.append(track)
+        return TrackListing(tracks)
+
+    def export_tracks(self, file_path, file_format: str = None) -> None:
+        TrackListing.export_track_pages(
+            [self.tracks], file_path, file_format=file_format)
+
+    @staticmethod
+    def export_track_pages(track_pages: typing.Iterable[typing.Iterable[Track]], file_path, announce: bool = True, file_format: str = None) -> None:
+        """
+        Writes tracks to a .csv file as they arrive, one page at a time. Each
+        page is flushed to disk before the next one is consumed, so memory
+        use does not grow with the number of tracks and a failure part way
+        through still leaves the tracks written so far.
+
+        Snapshot files (see the Snapshot module) are columnar, so their
+        tracks are collected and written once the last page has arrived.
+
+        Args:
+            track_pages (typing.Iterable[typing.Iterable[Track]]): Pages of
+            tracks, e.g. as yielded by a SpotifyManager paginator.
+            file_path: Path of the file ('const' for data.csv, or
+            data.spsnap, in the working directory).
+            announce (bool): Print the path of the saved file.
+            file_format (str): 'csv' or 'snapshot' (default: per the file
+            extension, see 'resolve_file_format').
+        """
+        with TrackListing.track_page_writer(file_path, announce, file_format) as write_page:
+            for track_page in track_pages:
+                write_page(track_page)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def track_page_writer(file_path, announce: bool = True, file_format: str = None) -> typing.Iterator[typing.Callable[[typing.Iterable[Track]], None]]:
+        """
+        Opens a track file for writing pages of tracks, for pages that do
+        not arrive as an iterable (e.g. from an async paginator). Yields a
+        function writing one page; see 'export_track_pages', which it backs,
+        for the arguments.
+        """
+        file_format = resolve_file_format(file_path, file_format)
         if file_path == 'const':
-            file_path = os.path.join(os.getcwd(), "data.csv")
+            file_path = os.path.join(os.getcwd(), "data" + FILE_EXTENSIONS[file_format])
         try:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = Track.csv_export_header()
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-                writer.writeheader()
-                for track in self.tracks:
-                    writer.writerow(track.csv_export_row())
-            print(
-                "Tracks Export File saved to the following path: {0}".format(file_path))
+            if file_format == 'snapshot':
+                track_pages = []
+                yield track_pages.append
+                write_snapshot(itertools.chain.from_iterable(track_pages),
+                               file_path)
+            else:
+                with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+                    fieldnames = Track.csv_export_header()
+                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+                    writer.writeheader()
+
+                    def write_page(track_page: typing.Iterable[Track]) -> None:
+                        for track in track_page:
+                            writer.writerow(track.csv_export_row())
+                        csvfile.flush()
+
+                    yield write_page
+            if announce:
+                print(
+                    "Tracks Export File saved to the following path: {0}".format(file_path))
         except OSError:
             print("Operation Failed: Error writing to file.")
             sys.exit(1)
 
-    def import_tracks(self, file_path) -> None:
+    def import_tracks(self, file_path, dedup: str = None, file_format: str = None) -> typing.List[typing.Tuple[int, str]]:
+        """
+        Appends the tracks of a .csv file (format must match that of exported
+        .csv files), or of a snapshot file, to the listing.
+
+        .csv rows are validated as they are read: rows with missing columns
+        or a malformed URI (see TRACK_URI_PATTERN) are skipped and reported
+        with their line number.
+
+        Args:
+            file_path: Path of the file.
+            dedup (str): Drop repeated URIs, keeping the 'first' or 'last'
+            occurrence (None keeps every row).
+            file_format (str): 'csv' or 'snapshot' (default: per the file
+            extension, see 'resolve_file_format').
+
+        Returns:
+            typing.List[typing.Tuple[int, str]]: Line number and reason of
+            each skipped row.
+        """
+        if dedup not in (None, 'first', 'last'):
+            raise ValueError("Unknown dedup mode: {0}".format(dedup))
+        invalid_rows = []
         try:
-            with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    track = Track(row['uri'], row['name'],
-                                  row['artist'], row['album'])
-                    self.tracks.append(track)
+            if resolve_file_format(file_path, file_format) == 'snapshot':
+                snapshot_tracks = SnapshotTracks(file_path)
+                try:
+                    self.tracks.extend(dedup_tracks(snapshot_tracks, dedup))
+                finally:
+                    snapshot_tracks.close()
+            else:
+                with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
+                    self.tracks.extend(dedup_tracks(
+                        read_csv_tracks(csvfile, invalid_rows), dedup))
         except OSError:
             print("Operation Failed: Error reading from file.")
             sys.exit(1)
 
+        if invalid_rows:
+            print("Skipped {0} invalid row(s) of {1}:".format(
+                len(invalid_rows), file_path))
+            for line_number, reason in invalid_rows[:MAX_REPORTED_ROWS]:
+                print("  line {0}: {1}".format(line_number, reason))
+            if len(invalid_rows) > MAX_REPORTED_ROWS:
+                print("  ...")
+        return invalid_rows
+
+    @classmethod
+    def load_snapshot(cls, file_path) -> 'TrackListing':
+        """
+        Returns a TrackListing backed directly by a memory-mapped snapshot
+        file. Nothing is decoded up front; the listing's tracks are
+        read-only and decoded on access.
+        """
+        return cls(SnapshotTracks(file_path))
+
+
+def resolve_file_format(file_path, file_format: str = None) -> str:
+    """
+    Returns 'file_format' if given, otherwise the format matching the file's
+    extension: 'snapshot' for '.spsnap' files, 'csv' for anything else.
+    """
+    if file_format is not None:
+        if file_format not in FILE_EXTENSIONS:
+            raise ValueError("Unknown file format: {0}".format(file_format))
+        return file_format
+    if str(file_path).lower().endswith(FILE_EXTENSIONS['snapshot']):
+        return 'snapshot'
+    return 'csv'
+
+
+def read_csv_tracks(csvfile: typing.IO, invalid_rows: list) -> typing.Iterator[Track]:
+    """
+    Yields a Track per valid row of an exported .csv file, appending the line
+    number and reason of each invalid row to 'invalid_rows'.
+    """
+    reader = csv.reader(csvfile)
+    header = next(reader, [])
+    try:
+        columns = [header.index(column)
+                   for column in Track.csv_export_header()]
+    except ValueError:
+        print("Operation Failed: File must have the columns: {0}".format(
+            ", ".join(Track.csv_export_header())))
+        sys.exit(1)
+    uri_column, name_column, artist_column, album_column = columns
+    min_length = max(columns) + 1
+    is_valid_uri = TRACK_URI_PATTERN.match
+
+    for row in reader:
+        if len(row) < min_length:
+            if row:
+                invalid_rows.append((reader.line_num, "missing columns"))
+            continue
+        uri = row[uri_column]
+        if not is_valid_uri(uri):
+            invalid_rows.append(
+                (reader.line_num, "invalid track URI: {0!r}".format(uri)))
+            continue
+        yield Track(uri, row[name_column], row[artist_column], row[album_column])
+
+
+def is_local_uri(uri: str) -> bool:
+    return uri.startswith(LOCAL_URI_PREFIX)
+
+
+def drop_local_tracks(tracks: typing.Iterable[Track]) -> typing.List[Track]:
+    """
+    Returns 'tracks' without local files, which the Web API cannot add to
+    playlists, listing the dropped ones as invalid rows are listed.
+    """
+    kept_tracks = []
+    local_tracks = []
+    for track in tracks:
+        (local_tracks if is_local_uri(track.uri) else kept_tracks).append(track)
+    if local_tracks:
+        print("Skipped {0} local file(s), which cannot be added to "
+              "playlists:".format(len(local_tracks)))
+        for track in local_tracks[:MAX_REPORTED_ROWS]:
+            print("  {0}".format(track))
+        if len(local_tracks) > MAX_REPORTED_ROWS:
+            print("  ...")
+    return kept_tracks
+
+
+def dedup_tracks(tracks: typing.Iterable[Track], keep: str = None) -> typing.Iterator[Track]:
+    """
+    Yields 'tracks' without repeated URIs, keeping the 'first' or 'last'
+    occurrence of each (None yields every track).
+    """
+    if keep is None:
+        yield from tracks
+    elif keep == 'first':
+        seen_uris = set()
+        for track in tracks:
+            if track.uri not in seen_uris:
+                seen_uris.add(track.uri)
+                yield track
+    else:
+        last_tracks = {}
+        for track in tracks:
+            # Re-inserting moves the URI to its latest position.
+            last_tracks.pop(track.uri, None)
+            last_tracks[track.uri] = track
+        yield from last_tracks.values()
+
+
+class TrackColumns(collections.abc.MutableSequence):
+    """
+    Compact, columnar storage for the tracks of a TrackListing. URIs and
+    names are kept in parallel lists, while artist and album names are
+    dictionary-encoded: each is stored once and referenced by an integer
+    code held in an array.
+
+    Usable wherever a list of Track objects is expected (e.g.
+    TrackListing(TrackColumns())). Reading an item returns a new Track view;
+    changes to that view are not written back.
+    """
+
+    def __init__(self, tracks: typing.Iterable[Track] = ()) -> None:
+        self.uris = []
+        self.names = []
+        # 'I' rather than 'L': 4-byte codes, where a C long takes 8 on
+        # most 64-bit platforms.
+        self.artist_codes = array.array('I')
+        self.album_codes = array.array('I')
+        self.values = []
+        self.value_codes = {}
+        self.version = 0  # in-place edits, as counted by TrackList
+        self.extend(tracks)
+
+    def _encode(self, value) -> int:
+        code = self.value_codes.get(value)
+        if code is None:
+            code = self.value_codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def _track(self, index: int) -> Track:
+        return Track(self.uris[index], self.names[index],
+                     self.values[self.artist_codes[index]],
+                     self.values[self.album_codes[index]])
+
+    def __len__(self) -> int:
+        return len(self.uris)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TrackColumns(self._track(i)
+                                for i in range(*index.indices(len(self))))
+        return self._track(range(len(self))[index])
+
+    def __iter__(self) -> typing.Iterator[Track]:
+        values = self.values
+        for uri, name, artist_code, album_code in zip(
+                self.uris, self.names, self.artist_codes, self.album_codes):
+            yield Track(uri, name, values[artist_code], values[album_code])
+
+    def __setitem__(self, index, track: Track) -> None:
+        self.version += 1
+        if isinstance(index, slice):
+            tracks = list(self)
+            tracks[index] = track
+            version = self.version
+            self.__init__(tracks)
+            self.version = version
+            return
+        self.uris[index] = track.uri
+        self.names[index] = track.name
+        self.artist_codes[index] = self._encode(track.artist)
+        self.album_codes[index] = self._encode(track.album)
+
+    def __delitem__(self, index) -> None:
+        self.version += 1
+        for column in (self.uris, self.names, self.artist_codes,
+                       self.album_codes):
+            del column[index]
+
+    def insert(self, index: int, track: Track) -> None:
+        self.version += 1
+        self.uris.insert(index, track.uri)
+        self.names.insert(index, track.name)
+        self.artist_codes.insert(index, self._encode(track.artist))
+        self.album_codes.insert(index, self._encode(track.album))
+
+    def append(self, track: Track) -> None:
+        self.version += 1
+        self.uris.append(track.uri)
+        self.names.append(track.name)
+        self.artist_codes.append(self._encode(track.artist))
+        self.album_codes.append(self._encode(track.album))
+
+
+class LazyTracks(collections.abc.Sequence):
+    """
+    Read-only sequence of a playlist's tracks that fetches pages only as
+    they are accessed. 'len()' is answered from the known track count
+    without fetching anything, indexing and slicing fetch only the pages
+    covering the requested positions, and iteration streams, fetching up to
+    'concurrency' pages at a time. Fetched pages are kept, so each page is
+    requested at most once.
+    """
+
+    def __init__(self, fetch_page: typing.Callable[[int], typing.List[Track]],
+                 length: int, page_size: int, concurrency: int = 1,
+                 on_loaded: typing.Callable[[typing.List[Track]], None] = None) -> None:
+        """
+        Args:
+            fetch_page (typing.Callable[[int], typing.List[Track]]): Callable
+            returning the tracks of the page starting at the given offset.
+            length (int): Number of tracks (e.g. Playlist.track_count).
+            page_size (int): Number of tracks per page.
+            concurrency (int): Max number of pages requested at the same time.
+            on_loaded (typing.Callable[[typing.List[Track]], None]): Called
+            with every track once all pages have been fetched (e.g. to cache
+            them).
+        """
+        self.fetch_page = fetch_page
+        self.length = length
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        self.on_loaded = on_loaded
+        self.pages = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def _load_pages(self, page_indices: typing.Iterable[int]) -> None:
+        missing = [page_index for page_index in page_indices
+                   if page_index not in self.pages]
+        if not missing:
+            return
+
+        def fetch(page_index: int) -> typing.List[Track]:
+            offset = page_index * self.page_size
+            # Clipped to the known length, so that len() and iteration agree.
+            return self.fetch_page(offset)[:self.length - offset]
+
+        if len(missing) == 1 or self.concurrency == 1:
+            fetched_pages = list(map(fetch, missing))
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=min(self.concurrency, len(missing))) as executor:
+                fetched_pages = list(executor.map(fetch, missing))
+        with self.lock:
+            for page_index, page in zip(missing, fetched_pages):
+                self.pages[page_index] = page
+            loaded = (self.on_loaded is not None
+                      and len(self.pages) == self._page_count())
+            if loaded:
+                on_loaded, self.on_loaded = self.on_loaded, None
+        if loaded:
+            on_loaded([track for page_index in range(self._page_count())
+                       for track in self.pages[page_index]])
+
+    def _page_count(self) -> int:
+        return -(-self.length // self.page_size)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = range(*index.indices(self.length))
+            self._load_pages(sorted({position // self.page_size
+                                     for position in positions}))
+            return [self._track(position) for position in positions]
+        position = range(self.length)[index]
+        self._load_pages([position // self.page_size])
+        return self._track(position)
+
+    def _track(self, position: int) -> Track:
+        page = self.pages[position // self.page_size]
+        try:
+            return page[position % self.page_size]
+        except IndexError:
+            # The playlist shrank since its track count was read.
+            raise IndexError('playlist track index out of range') from None
+
+    def __iter__(self) -> typing.Iterator[Track]:
+        page_count = self._page_count()
+        for first_page_index in range(0, page_count, self.concurrency):
+            page_indices = range(first_page_index, min(
+                first_page_index + self.concurrency, page_count))
+            self._load_pages(page_indices)
+            for page_index in page_indices:
+                yield from self.pages[page_index]
+
 
 class Playlist(TrackListing):
-    def __init__(self, uri: str = None, name: str = None, description: str = None, tracks: typing.List[Track] = [], track_count=None):
+    def __init__(self, uri: str = None, name: str = None, description: str = None, tracks: typing.List[Track] = None, track_count=None, snapshot_id: str = None):
         super().__init__(tracks)
         self.uri = uri
         self.name = name
         self.description = description
         self.track_count = track_count
+        self.snapshot_id = snapshot_id
         self.id = uri.split(":")[-1]
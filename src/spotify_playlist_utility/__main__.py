@@ -1,8 +1,31 @@
 import argparse
 import configparser
 import sys
+import typing
 
-from spotify_playlist_utility.Spotify import SpotifyManager
+# Modules of this package (and spotipy, requests, aiohttp, sqlite3 behind
+# them) are imported only once a command needs them, keeping startup fast
+# for '-h' and local-only commands such as '--convert'.
+
+# Defaults of SpotifyManager.DEFAULT_CONCURRENCY and
+# AsyncSpotifyManager.DEFAULT_CONCURRENCY, for the help message.
+DEFAULT_CONCURRENCY = 8
+DEFAULT_ASYNC_CONCURRENCY = 64
+
+# SpotifyManager.SCOPES key of each command, so that every scope the run
+# needs is authorized up front.
+COMMAND_SCOPE_SETS = {
+    'export_saved_tracks': 'ExportSavedTracks',
+    'export_playlist_tracks': 'ExportPlaylistTracks',
+    'export_all_playlists': 'ExportPlaylistTracks',
+    'import_tracks_to_playlist': 'ImportTracksToPlaylist',
+    'list_playlists': 'ListPlaylists',
+    'shuffle_playlist_tracks': 'ShufflePlaylistTracks',
+    'export_saved_tracks_to_liked_memory_playlist':
+        'ExportSavedTracksToLikedMemoryPlaylist',
+    'sync_playlist_tracks': 'SyncPlaylistTracks',
+    'analyze_playlists': 'AnalyzePlaylists',
+}
 
 # TODO: Add tests (tox or other) to project
 
@@ -25,23 +48,94 @@ def load_config_parser(config_file_path) -> configparser.ConfigParser:
     return config_parser
 
 
-def main():
+async def run_async_command(SpotifyMgr: 'AsyncSpotifyManager', args: argparse.Namespace) -> None:
+    # Non-interactive commands, run on the async backend ('--async').
+    async with SpotifyMgr:
+        if args.export_saved_tracks:
+            await SpotifyMgr.export_saved_tracks(
+                args.export_saved_tracks, file_format=args.format)
+        elif args.export_all_playlists:
+            await SpotifyMgr.export_all_playlists(
+                args.export_all_playlists, file_format=args.format)
+        elif args.import_tracks_to_playlist:
+            await SpotifyMgr.import_tracks_to_playlist(
+                args.import_tracks_to_playlist, dedup=args.dedup,
+                file_format=args.format)
+        elif args.export_saved_tracks_to_liked_memory_playlist:
+            await SpotifyMgr.export_saved_tracks_to_liked_memory_playlist(
+                full_resync=args.full_resync)
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
     argument_parser = argparse.ArgumentParser()
     # TODO: Revisit argument structure and add exclusivity to switches incompatible when executed simultaneously
     argument_parser.add_argument(
         "config",
-        help="Specify file path to the script's config file (see README.md)."
+        nargs="?",
+        help=("Specify file path to the script's config file (see README.md). "
+              "Not needed with '--batch' or '-c'.")
     )
     argument_parser.add_argument(
         "-l", "--list-playlists",
         action='store_true',
         help="List playlists of the spotify account."
     )
+    argument_parser.add_argument(
+        "--output-format",
+        choices=['table', 'json', 'jsonl', 'tsv'], default='table',
+        help=("Output format of '-l': an aligned 'table' (default, printed "
+              "once the whole listing has arrived), a 'json' array, 'jsonl' "
+              "(one object per line) or 'tsv'. Unsorted 'json', 'jsonl' and "
+              "'tsv' rows are printed as each listing page arrives.")
+    )
+    argument_parser.add_argument(
+        "--sort",
+        choices=['name', '-name', 'tracks', '-tracks'], default=None,
+        help=("With '-l', sort playlists by name or track count ('-' "
+              "prefixed for descending) instead of listing order.")
+    )
+    argument_parser.add_argument(
+        "--filter-name",
+        default=None,
+        help="With '-l', only list playlists whose name matches a glob.",
+        metavar="<glob>"
+    )
+    argument_parser.add_argument(
+        "--min-tracks",
+        type=int, default=None,
+        help="With '-l', only list playlists with at least this many tracks.",
+        metavar="<track count>"
+    )
+    argument_parser.add_argument(
+        "--max-tracks",
+        type=int, default=None,
+        help="With '-l', only list playlists with at most this many tracks.",
+        metavar="<track count>"
+    )
     argument_parser.add_argument(
         "-z", "--shuffle-playlist-tracks",
         action='store_true',
         help="Shuffles the track order of a selected spotify playlist."
     )
+    argument_parser.add_argument(
+        "--playlist",
+        dest='playlists', action='append', default=None,
+        help=("With '-p', '-z' or '--sync', use the playlist given by URI, "
+              "ID, name or glob (e.g. 'Mix *') instead of picking one "
+              "interactively. Repeat, or use a glob, to select several "
+              "playlists."),
+        metavar="<name|uri|id|glob>"
+    )
+    argument_parser.add_argument(
+        "--shuffle-mode",
+        choices=['replace', 'moves'], default='replace',
+        help=("How '-z' writes the shuffled order: 'replace' rewrites the "
+              "playlist in bulk (one API call per 100 tracks), saving the "
+              "shuffled tracks to a recovery file in the working directory "
+              "until it completes; 'moves' reorders tracks in place, keeping "
+              "their 'added at' dates, at about one API call per track "
+              "(default: replace).")
+    )
     argument_parser.add_argument(
         "-s", "--export-saved-tracks",
         nargs="?", default=None, const='const',
@@ -66,6 +160,67 @@ def main():
               ".csv files)."),
         metavar="<input file path>"
     )
+    argument_parser.add_argument(
+        "--sync",
+        dest='sync_playlist_tracks', action='store',
+        help=("Bring a playlist in line with a .csv (or snapshot) file, "
+              "removing, adding and reordering only the tracks that differ. "
+              "Given a directory, syncs every file named as by '-e' to the "
+              "playlist whose ID it contains."),
+        metavar="<input file or directory path>"
+    )
+    argument_parser.add_argument(
+        "--dry-run",
+        action='store_true',
+        help="With '--sync', only print the edits each playlist needs."
+    )
+    argument_parser.add_argument(
+        "--analyze",
+        dest='analyze_playlists', action='store',
+        help=("Report on the user's playlists (or those given by "
+              "'--playlist'): overlap (shared tracks, Jaccard index) of "
+              "each pair, tracks in several playlists, and artist and album "
+              "histograms. Saved as JSON to a .json path, else as .csv "
+              "files in the specified directory."),
+        metavar="<report path>"
+    )
+    argument_parser.add_argument(
+        "--analyze-input",
+        action='store',
+        help=("With '--analyze', report on the track listing files in a "
+              "directory (e.g. exported by '-e') instead of fetching "
+              "playlists. Works locally, without contacting Spotify."),
+        metavar="<input file or directory path>"
+    )
+    argument_parser.add_argument(
+        "--min-shared",
+        type=int, default=1,
+        help=("With '--analyze', only report the overlap of playlists "
+              "sharing at least this many tracks (default: 1)."),
+        metavar="<track count>"
+    )
+    argument_parser.add_argument(
+        "-c", "--convert",
+        nargs=2,
+        help=("Convert a track listing file to another format (.csv or "
+              ".spsnap snapshot, per file extension or '--format'). "
+              "Works locally, without contacting Spotify."),
+        metavar=("<input file path>", "<output file path>")
+    )
+    argument_parser.add_argument(
+        "--format",
+        choices=['csv', 'snapshot'], default=None,
+        help=("File format of exported (or converted) track listings: "
+              "'csv' or 'snapshot', a compact columnar binary format "
+              "(default: per file extension, .spsnap for snapshots, else "
+              "csv). Also selects the format read by '-i'.")
+    )
+    argument_parser.add_argument(
+        "--dedup",
+        choices=['first', 'last'], default=None,
+        help=("With '-i', drop repeated tracks of the .csv file, keeping "
+              "their first or last occurrence.")
+    )
     argument_parser.add_argument(
         "-a", "--export-saved-tracks-to-liked-memory-playlist",
         action='store_true',
@@ -73,43 +228,231 @@ def main():
               "memory playlist first, if not detected.")
     )
 
-    # argument_parser.add_argument(
-    #     "-a", "--export-all-playlists",
-    #     nargs="?", default=None, const='const',
-    #     help=("Generate .csv listings of tracks for each of the user's "
-    #           "playlist's tracks and save to the specified directory (if not specified, "
-    #           "default: .\all_playlists\).")
-    # TODO: Add export-all-playlists functionality
-    # add ending '\' logic (for if there OR not)
-    # build out the directory creation logic
-    # copy and repurpose the export_playlist_tracks function to do as is, just iterate through all playlists
-    # )
-    args = argument_parser.parse_args()
+    argument_parser.add_argument(
+        "--full-resync",
+        action='store_true',
+        help=("With '-a', walk every saved track instead of only those "
+              "saved since the previous run.")
+    )
+    argument_parser.add_argument(
+        "--concurrency",
+        type=int, default=None,
+        help=("Max number of Spotify API requests issued in parallel when "
+              "fetching listings (default: {0}, or {1} with '--async').".format(
+                  DEFAULT_CONCURRENCY, DEFAULT_ASYNC_CONCURRENCY)),
+        metavar="<request count>"
+    )
+    argument_parser.add_argument(
+        "--async",
+        dest='use_async', action='store_true',
+        help=("Run '-s', '-e', '-i' or '-a' on the asyncio backend, keeping "
+              "many more requests in flight (requires the 'async' extra: "
+              "pip install spotify-playlist-utility[async]).")
+    )
+    argument_parser.add_argument(
+        "--batch",
+        action='store',
+        help=("Run the commands listed in a JSON manifest for many accounts "
+              "(config files) in one process, several accounts at a time "
+              "under one global request rate budget (see README.md)."),
+        metavar="<manifest file path>"
+    )
+    argument_parser.add_argument(
+        "--no-cache",
+        action='store_true',
+        help="Neither read nor write the local playlist metadata cache."
+    )
+    argument_parser.add_argument(
+        "--refresh",
+        action='store_true',
+        help=("Ignore entries in the local playlist metadata cache and "
+              "refetch everything (the cache is still updated).")
+    )
+    argument_parser.add_argument(
+        "-v", "--verbose",
+        action='store_true',
+        help=("Print additional diagnostics, such as request/throttle and "
+              "cache hit/miss counts.")
+    )
+    argument_parser.add_argument(
+        "--profile",
+        nargs="?", default=None, const='-',
+        help=("Print per-endpoint request stats (calls, latency percentiles, "
+              "bytes, retries, 429s) and local phase timings at the end of "
+              "the run, and save them as JSON to the specified path, if "
+              "any."),
+        metavar="<report path>"
+    )
+    argument_parser.add_argument(
+        "--profile-python",
+        choices=['cprofile', 'pyinstrument'], default=None,
+        help=("Also profile the run's Python code with cProfile or "
+              "pyinstrument (requires the 'pyinstrument' package). With a "
+              "'--profile' path, the full profile is saved next to the "
+              "report (.prof or .html).")
+    )
+
+    argument_parser.add_argument(
+        "-e", "--export-all-playlists",
+        nargs="?", default=None, const='const',
+        help=("Generate .csv listings of tracks for each of the user's "
+              "playlists and save them to the specified directory (if not "
+              "specified, default: .\\all_playlists). Playlists unchanged "
+              "since their last export to the directory are skipped."),
+        metavar="<export directory path>"
+    )
+    return argument_parser
 
-    # Load config parser at specified file path
-    config_parser = load_config_parser(args.config)
 
-    # Build SpotifyManager object with config_parser's help
-    SpotifyMgr = SpotifyManager(config_parser)
+def scope_sets_of(args: argparse.Namespace) -> typing.List[str]:
+    # SpotifyManager.SCOPES keys of the commands in 'args'.
+    return [scope_set for command, scope_set in COMMAND_SCOPE_SETS.items()
+            if getattr(args, command)]
 
+
+def run_command(SpotifyMgr: 'SpotifyManager', args: argparse.Namespace) -> None:
     # Execute appropriate logic per specified optional argument
     if args.export_saved_tracks:
-        SpotifyMgr.export_saved_tracks(args.export_saved_tracks)
+        SpotifyMgr.export_saved_tracks(
+            args.export_saved_tracks, file_format=args.format)
     elif args.export_playlist_tracks:
-        SpotifyMgr.export_playlist_tracks(args.export_playlist_tracks)
+        SpotifyMgr.export_playlist_tracks(
+            args.export_playlist_tracks, file_format=args.format,
+            playlist_selectors=args.playlists)
+    elif args.export_all_playlists:
+        SpotifyMgr.export_all_playlists(
+            args.export_all_playlists, file_format=args.format)
     elif args.import_tracks_to_playlist:
-        SpotifyMgr.import_tracks_to_playlist(args.import_tracks_to_playlist)
+        SpotifyMgr.import_tracks_to_playlist(
+            args.import_tracks_to_playlist, dedup=args.dedup,
+            file_format=args.format)
     elif args.list_playlists:
-        SpotifyMgr.list_playlists()
+        SpotifyMgr.list_playlists(
+            output_format=args.output_format, sort=args.sort,
+            name_glob=args.filter_name, min_tracks=args.min_tracks,
+            max_tracks=args.max_tracks)
     elif args.shuffle_playlist_tracks:
-        SpotifyMgr.shuffle_playlist_tracks()
+        SpotifyMgr.shuffle_playlist_tracks(
+            args.shuffle_mode, playlist_selectors=args.playlists)
+    elif args.sync_playlist_tracks:
+        SpotifyMgr.sync_playlist_tracks(
+            args.sync_playlist_tracks, file_format=args.format,
+            dry_run=args.dry_run, playlist_selectors=args.playlists)
     elif args.export_saved_tracks_to_liked_memory_playlist:
-        SpotifyMgr.export_saved_tracks_to_liked_memory_playlist()
+        SpotifyMgr.export_saved_tracks_to_liked_memory_playlist(
+            full_resync=args.full_resync)
+    elif args.analyze_playlists:
+        SpotifyMgr.analyze_playlists(
+            args.analyze_playlists, playlist_selectors=args.playlists,
+            min_shared=args.min_shared)
     else:
         print("\n*No optional args passed to the 'spotify-playlist-utility' "
               "console command, therefore no script actions performed. "
               "See help message ('spotify-playlist-utility -h') for help.*\n")
 
 
+def main():
+    argument_parser = build_argument_parser()
+    args = argument_parser.parse_args()
+
+    if args.convert:
+        # Works on local files only: no config file, cache or Spotify
+        # session is needed.
+        from spotify_playlist_utility.TrackLists import TrackListing
+        tracks = TrackListing()
+        tracks.import_tracks(args.convert[0])
+        tracks.export_tracks(args.convert[1], file_format=args.format)
+        return
+
+    if args.analyze_playlists and args.analyze_input:
+        # Works on local files only, like '--convert'.
+        from spotify_playlist_utility.Analytics import TrackIndex, write_report
+        track_index = TrackIndex.from_files(
+            args.analyze_input, file_format=args.format)
+        write_report(track_index, args.analyze_playlists, args.min_shared)
+        print("Analyzed {0} playlists ({1} distinct tracks). Report saved to "
+              "the following path: {2}".format(
+                  track_index.playlist_count, track_index.track_count,
+                  args.analyze_playlists))
+        return
+
+    if args.batch:
+        from spotify_playlist_utility.Batch import BatchRunner
+        batch_runner = BatchRunner.from_file(
+            args.batch, argument_parser, run_command, scope_sets_of)
+        return 0 if batch_runner.run() else 1
+
+    if args.config is None:
+        argument_parser.error("the following arguments are required: config")
+
+    # Load config parser at specified file path
+    config_parser = load_config_parser(args.config)
+
+    # Open the playlist metadata cache, unless disabled
+    cache = None
+    if not args.no_cache:
+        from spotify_playlist_utility.Cache import MetadataCache
+        cache = MetadataCache.from_config(config_parser, refresh=args.refresh)
+
+    scope_sets = scope_sets_of(args)
+
+    profiler = None
+    if args.profile:
+        from spotify_playlist_utility.Instrumentation import Profiler
+        profiler = Profiler()
+
+    if args.use_async:
+        if not (args.export_saved_tracks or args.export_all_playlists
+                or args.import_tracks_to_playlist
+                or args.export_saved_tracks_to_liked_memory_playlist):
+            argument_parser.error(
+                "'--async' applies to '-s', '-e', '-i' and '-a' only.")
+        import asyncio
+        from spotify_playlist_utility.AsyncSpotify import AsyncSpotifyManager
+        SpotifyMgr = AsyncSpotifyManager(
+            config_parser,
+            concurrency=args.concurrency or DEFAULT_ASYNC_CONCURRENCY,
+            cache=cache, scope_sets=scope_sets, profiler=profiler)
+    else:
+        from spotify_playlist_utility.Spotify import SpotifyManager
+        # Build SpotifyManager object with config_parser's help
+        SpotifyMgr = SpotifyManager(
+            config_parser,
+            concurrency=args.concurrency or DEFAULT_CONCURRENCY,
+            cache=cache, scope_sets=scope_sets, profiler=profiler)
+
+    python_profiler = None
+    if args.profile_python:
+        from spotify_playlist_utility.Instrumentation import PythonProfiler
+        python_profiler = PythonProfiler(args.profile_python)
+        python_profiler.start()
+
+    # Execute appropriate logic per specified optional argument
+    if args.use_async:
+        asyncio.run(run_async_command(SpotifyMgr, args))
+    else:
+        run_command(SpotifyMgr, args)
+
+    if python_profiler is not None:
+        python_profile_path = None
+        if args.profile and args.profile != '-':
+            python_profile_path = args.profile + (
+                '.prof' if args.profile_python == 'cprofile' else '.html')
+        print(python_profiler.stop(python_profile_path))
+    if profiler is not None:
+        print(profiler.summary())
+        if args.profile != '-':
+            profiler.write_json(args.profile)
+            print("Profile report saved to the following path: {0}".format(
+                args.profile))
+    if args.verbose and SpotifyMgr.authorized:
+        print(SpotifyMgr.sp.stats_summary())
+        print(SpotifyMgr.transfer_counter.stats_summary())
+    if cache is not None:
+        if args.verbose:
+            print(cache.stats_summary())
+        cache.close()
+
+
 if __name__ == "__main__":
     sys.exit(main())
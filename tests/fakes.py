@@ -0,0 +1,341 @@
+"""
+In-memory stand-in for the subset of spotipy.Spotify used by SpotifyManager,
+with generated libraries, injected latency and rate limits, plus clients that
+record a session (against any client, including the live API) and replay it.
+"""
+import collections
+import json
+import random
+import threading
+import time
+
+import spotipy
+
+from spotify_playlist_utility.Shuffle import apply_block_move
+
+
+def track_uri(number: int) -> str:
+    return 'spotify:track:{0:022d}'.format(number)
+
+
+def generate_library(playlist_count: int, tracks_per_playlist: int,
+                     saved_track_count: int = 0, seed: int = 0) -> dict:
+    """
+    Returns FakeSpotify keyword arguments for a generated library. Tracks are
+    drawn from a shared pool, so playlists overlap each other and the saved
+    tracks, as real libraries do.
+
+    Args:
+        playlist_count (int): Number of playlists.
+        tracks_per_playlist (int): Number of tracks of each playlist.
+        saved_track_count (int): Number of saved tracks.
+        seed (int): Seed of the random generator.
+    """
+    rng = random.Random(seed)
+    pool_size = max(1, saved_track_count, (playlist_count * tracks_per_playlist
+                                           + saved_track_count) // 2)
+    return {
+        'playlists': {
+            'p{0:05d}'.format(i): {
+                'name': 'Playlist {0}'.format(i),
+                'uris': [track_uri(rng.randrange(pool_size))
+                         for _ in range(tracks_per_playlist)]}
+            for i in range(playlist_count)},
+        'saved_tracks': [track_uri(number) for number
+                         in rng.sample(range(pool_size), saved_track_count)],
+    }
+
+
+def track_data(uri: str) -> dict:
+    track_id = uri.split(':')[-1]
+    return {'uri': uri, 'name': 'Name {0}'.format(track_id),
+            'artists': [{'name': 'Artist {0}'.format(track_id[:1])}],
+            'album': {'name': 'Album {0}'.format(track_id[:2])}}
+
+
+class FakeSpotify():
+    """
+    Pages like the Web API: limits above an endpoint's maximum are rejected,
+    and 'next'/'previous' are page URLs (or None).
+    """
+
+    API_PREFIX = 'https://api.spotify.com/v1/'
+
+    def __init__(self, playlists: dict = None, saved_tracks: list = None,
+                 user_id: str = 'user', latency: float = 0.0,
+                 rate_limit: float = None, retry_after: float = 1.0) -> None:
+        """
+        Args:
+            playlists (dict): Playlist ID to {'name': str, 'uris': list}.
+            saved_tracks (list): Saved track URIs, newest first.
+            latency (float): Seconds each call sleeps, emulating a round trip.
+            rate_limit (float): Calls allowed per rolling second; further
+            calls fail with HTTP 429 and a 'Retry-After' header. None for
+            no limit.
+            retry_after (float): 'Retry-After' of throttled calls, in seconds.
+        """
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.playlists = {}
+        self.saved_tracks = []
+        self.user_id = user_id
+        self.calls = collections.Counter()
+        self.throttled = collections.Counter()
+        self.call_times = collections.deque()
+        self.lock = threading.Lock()
+        self.clock = 0
+        for playlist_id, playlist in (playlists or {}).items():
+            self._add_playlist(playlist_id, playlist['name'], playlist['uris'])
+        self.save_tracks(list(reversed(saved_tracks or [])))
+
+    def save_tracks(self, uris):
+        """Saves tracks in the given order, so the last one is newest."""
+        for uri in uris:
+            self.clock += 1
+            added_at = '2021-01-01T00:00:00Z'.replace(
+                '00:00:00', '{0:02d}:{1:02d}:{2:02d}'.format(
+                    self.clock // 3600, self.clock // 60 % 60, self.clock % 60))
+            self.saved_tracks.insert(0, (uri, added_at))
+
+    def _add_playlist(self, playlist_id, name, uris):
+        self.playlists[playlist_id] = {
+            'id': playlist_id, 'name': name, 'description': '',
+            'uri': 'spotify:playlist:{0}'.format(playlist_id),
+            'uris': list(uris), 'version': 0}
+
+    def _record(self, method):
+        with self.lock:
+            if self.rate_limit is not None:
+                now = time.monotonic()
+                while self.call_times and self.call_times[0] <= now - 1:
+                    self.call_times.popleft()
+                if len(self.call_times) >= self.rate_limit:
+                    self.throttled[method] += 1
+                    raise spotipy.SpotifyException(
+                        429, -1, 'API rate limit exceeded',
+                        headers={'Retry-After': str(self.retry_after)})
+                self.call_times.append(now)
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _bump(self, playlist):
+        playlist['version'] += 1
+        return {'snapshot_id': self._snapshot_id(playlist)}
+
+    def _snapshot_id(self, playlist):
+        return '{0}-{1}'.format(playlist['id'], playlist['version'])
+
+    def _check_snapshot(self, playlist, snapshot_id):
+        if snapshot_id is not None and snapshot_id != self._snapshot_id(playlist):
+            raise spotipy.SpotifyException(
+                400, -1, 'snapshot_id does not match')
+
+    def _page(self, path, items, limit, offset, max_limit,
+              build_item=lambda item: item):
+        if not 1 <= limit <= max_limit:
+            raise spotipy.SpotifyException(400, -1, 'Invalid limit')
+        if offset < 0:
+            raise spotipy.SpotifyException(400, -1, 'Invalid offset')
+
+        def page_url(page_offset):
+            return '{0}{1}?offset={2}&limit={3}'.format(
+                FakeSpotify.API_PREFIX, path, page_offset, limit)
+        return {'href': page_url(offset),
+                'items': [build_item(item)
+                          for item in items[offset:offset + limit]],
+                'limit': limit, 'offset': offset, 'total': len(items),
+                'next': (page_url(offset + limit)
+                         if offset + limit < len(items) else None),
+                'previous': page_url(max(offset - limit, 0)) if offset else None}
+
+    def me(self):
+        self._record('me')
+        return {'id': self.user_id}
+
+    def current_user_playlists(self, limit=50, offset=0):
+        self._record('current_user_playlists')
+        items = [{'id': p['id'], 'uri': p['uri'], 'name': p['name'],
+                  'description': p['description'],
+                  'snapshot_id': self._snapshot_id(p),
+                  'tracks': {'total': len(p['uris'])}}
+                 for p in self.playlists.values()]
+        return self._page('me/playlists', items, limit, offset, 50)
+
+    def current_user_saved_tracks(self, limit=20, offset=0, market=None):
+        self._record('current_user_saved_tracks')
+        return self._page(
+            'me/tracks', self.saved_tracks, limit, offset, 50,
+            lambda item: {'added_at': item[1], 'track': track_data(item[0])})
+
+    def playlist(self, playlist_id, fields=None, market=None,
+                 additional_types=None):
+        self._record('playlist')
+        if playlist_id not in self.playlists:
+            raise spotipy.SpotifyException(
+                404, -1, 'Not found.', headers={})
+        playlist = self.playlists[playlist_id]
+        return {'id': playlist_id, 'uri': playlist['uri'],
+                'name': playlist['name'],
+                'description': playlist['description'],
+                'snapshot_id': self._snapshot_id(playlist),
+                'tracks': {'total': len(playlist['uris'])}}
+
+    def playlist_items(self, playlist_id, fields=None, limit=100, offset=0,
+                       market=None, additional_types=None):
+        self._record('playlist_items')
+        return self._page('playlists/{0}/tracks'.format(playlist_id),
+                          self.playlists[playlist_id]['uris'], limit, offset,
+                          100, lambda uri: {'track': track_data(uri)})
+
+    def user_playlist_create(self, user, name, public=True,
+                             collaborative=False, description=''):
+        self._record('user_playlist_create')
+        with self.lock:
+            playlist_id = 'new{0}'.format(len(self.playlists))
+            self._add_playlist(playlist_id, name, [])
+            # The Web API lists new playlists first.
+            self.playlists = dict(
+                [(playlist_id, self.playlists.pop(playlist_id))]
+                + list(self.playlists.items()))
+        return {'id': playlist_id}
+
+    @staticmethod
+    def _check_uris(uris):
+        # spotipy rejects local file URIs before sending the request.
+        for uri in uris:
+            if uri.startswith('spotify:local:'):
+                raise spotipy.SpotifyException(
+                    400, -1, 'Unsupported URL / URI.')
+
+    def playlist_add_items(self, playlist_id, items, position=None):
+        self._check_uris(items)
+        self._record('playlist_add_items')
+        assert len(items) <= 100
+        with self.lock:
+            playlist = self.playlists[playlist_id]
+            if position is None:
+                position = len(playlist['uris'])
+            playlist['uris'][position:position] = list(items)
+            return self._bump(playlist)
+
+    def playlist_replace_items(self, playlist_id, items):
+        self._check_uris(items)
+        self._record('playlist_replace_items')
+        assert len(items) <= 100
+        with self.lock:
+            playlist = self.playlists[playlist_id]
+            playlist['uris'] = list(items)
+            return self._bump(playlist)
+
+    def playlist_remove_specific_occurrences_of_items(self, playlist_id, items,
+                                                      snapshot_id=None):
+        self._check_uris(item['uri'] for item in items)
+        self._record('playlist_remove_specific_occurrences_of_items')
+        assert len(items) <= 100
+        with self.lock:
+            playlist = self.playlists[playlist_id]
+            self._check_snapshot(playlist, snapshot_id)
+            positions = set()
+            for item in items:
+                for position in item['positions']:
+                    if playlist['uris'][position] != item['uri']:
+                        raise spotipy.SpotifyException(
+                            400, -1, 'Could not remove tracks')
+                    positions.add(position)
+            playlist['uris'] = [uri for position, uri
+                                in enumerate(playlist['uris'])
+                                if position not in positions]
+            return self._bump(playlist)
+
+    def playlist_reorder_items(self, playlist_id, range_start, insert_before,
+                               range_length=1, snapshot_id=None):
+        self._record('playlist_reorder_items')
+        with self.lock:
+            playlist = self.playlists[playlist_id]
+            self._check_snapshot(playlist, snapshot_id)
+            playlist['uris'] = apply_block_move(
+                playlist['uris'], range_start, insert_before, range_length)
+            return self._bump(playlist)
+
+
+class RecordingClient():
+    """
+    Passes calls through to 'client' (e.g. a live spotipy.Spotify or a
+    FakeSpotify) and records each call with its result or error, for
+    ReplayClient.
+    """
+
+    def __init__(self, client) -> None:
+        self.client = client
+        self.records = []
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def recorded_call(*args, **kwargs):
+            record = {'method': name, 'args': list(args), 'kwargs': kwargs}
+            try:
+                record['result'] = method(*args, **kwargs)
+                return record['result']
+            except spotipy.SpotifyException as error:
+                record['error'] = {'http_status': error.http_status,
+                                   'code': error.code, 'msg': error.msg,
+                                   'headers': dict(error.headers or {})}
+                raise
+            finally:
+                with self.lock:
+                    self.records.append(json.loads(json.dumps(record)))
+        return recorded_call
+
+    def save(self, file_path: str) -> None:
+        with open(file_path, 'w', encoding='utf-8') as recording_file:
+            json.dump(self.records, recording_file)
+
+
+class ReplayClient():
+    """
+    Answers calls from a RecordingClient recording, without a network. Calls
+    are matched by method and arguments, so concurrent calls may be replayed
+    in any order; a call that was not recorded fails the test.
+    """
+
+    def __init__(self, records, latency: float = 0.0) -> None:
+        """
+        Args:
+            records: Recorded calls, or the path of a saved recording.
+            latency (float): Seconds each call sleeps, emulating a round trip.
+        """
+        if isinstance(records, str):
+            with open(records, encoding='utf-8') as recording_file:
+                records = json.load(recording_file)
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+        self.pending = collections.defaultdict(collections.deque)
+        for record in records:
+            self.pending[self._key(record['method'], record['args'],
+                                   record['kwargs'])].append(record)
+
+    @staticmethod
+    def _key(method, args, kwargs) -> str:
+        return json.dumps([method, list(args), kwargs], sort_keys=True)
+
+    def __getattr__(self, name):
+        def replayed_call(*args, **kwargs):
+            key = self._key(name, args, kwargs)
+            with self.lock:
+                assert self.pending[key], 'Call not recorded: {0}'.format(key)
+                record = self.pending[key].popleft()
+                self.calls[name] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if 'error' in record:
+                error = record['error']
+                raise spotipy.SpotifyException(
+                    error['http_status'], error['code'], error['msg'],
+                    headers=error['headers'])
+            return record['result']
+        return replayed_call
@@ -0,0 +1,137 @@
+import configparser
+import csv
+import itertools
+import json
+import random
+
+import pytest
+
+from fakes import FakeSpotify, generate_library, track_uri
+from spotify_playlist_utility import Analytics
+from spotify_playlist_utility.Analytics import TrackIndex, write_report
+from spotify_playlist_utility.Spotify import SpotifyManager
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import TrackListing
+
+
+def build_track(number: int) -> Track:
+    return Track(track_uri(number), 'Song {0}'.format(number),
+                 'Artist {0}'.format(number % 2), 'Album {0}'.format(number % 3))
+
+
+def build_index() -> TrackIndex:
+    track_index = TrackIndex()
+    track_index.add_playlist('a', 'A', [build_track(n) for n in (0, 1, 2, 2)])
+    track_index.add_playlist('b', 'B', [build_track(n) for n in (2, 3)])
+    track_index.add_playlist('c', 'C', [build_track(n) for n in (1, 2, 4)])
+    track_index.add_playlist('d', 'D', [build_track(5)])
+    return track_index
+
+
+def test_index_interns_tracks_and_reports_overlap():
+    track_index = build_index()
+
+    assert (track_index.playlist_count, track_index.track_count) == (4, 6)
+    assert track_index.overlaps() == [(0, 1, 1, 0.25), (0, 2, 2, 0.5),
+                                      (1, 2, 1, 0.25)]
+    assert [(track.uri, list(playlists)) for track, playlists
+            in track_index.duplicates()] == [
+        (track_uri(2), [0, 1, 2]), (track_uri(1), [0, 2])]
+    assert track_index.artist_histogram() == [
+        ('Artist 0', 3, 5), ('Artist 1', 3, 4)]
+    assert track_index.album_histogram()[0] == (('Album 2', 'Artist 0'), 1, 3)
+
+
+def test_posting_and_brute_force_overlaps_agree(monkeypatch):
+    monkeypatch.setattr(Analytics, 'sparse', None)
+    rng = random.Random(1)
+    track_index = TrackIndex()
+    playlists = [set(rng.sample(range(200), rng.randrange(1, 60)))
+                 for _ in range(30)]
+    for number, track_numbers in enumerate(playlists):
+        track_index.add_playlist(str(number), str(number),
+                                 [build_track(n) for n in track_numbers])
+
+    expected = []
+    for a, b in itertools.combinations(range(len(playlists)), 2):
+        shared = len(playlists[a] & playlists[b])
+        if shared:
+            expected.append((a, b, shared,
+                             shared / len(playlists[a] | playlists[b])))
+    assert track_index.overlaps() == expected
+    assert track_index.overlaps(min_shared=3) == [
+        overlap for overlap in expected if overlap[2] >= 3]
+
+
+def test_overlaps_without_scipy_match_expected_overlaps(monkeypatch):
+    monkeypatch.setattr(Analytics, 'sparse', None)
+    track_index = build_index()
+
+    assert track_index.overlaps() == [(0, 1, 1, 0.25), (0, 2, 2, 0.5),
+                                      (1, 2, 1, 0.25)]
+    assert track_index.overlaps(min_shared=2) == [(0, 2, 2, 0.5)]
+
+
+def test_sparse_overlaps_match_posting_overlaps():
+    pytest.importorskip('scipy')
+    track_index = build_index()
+    for min_shared in (1, 2):
+        assert track_index._sparse_overlaps(min_shared) == pytest.approx(
+            track_index._posting_overlaps(min_shared))
+
+
+def test_write_report_as_json_or_csv_directory(tmp_path):
+    track_index = build_index()
+
+    write_report(track_index, str(tmp_path / 'report.json'))
+    report = json.loads((tmp_path / 'report.json').read_text())
+    assert report['overlap'][0] == {
+        'playlist_a_id': 'a', 'playlist_a_name': 'A', 'playlist_b_id': 'c',
+        'playlist_b_name': 'C', 'shared_tracks': 2, 'jaccard': 0.5}
+    assert report['duplicates'][0]['playlists'] == ['A', 'B', 'C']
+    assert report['playlists'][0] == {'id': 'a', 'name': 'A', 'track_count': 3}
+
+    write_report(TrackIndex(), str(tmp_path / 'empty'))
+    with open(tmp_path / 'empty' / 'overlap.csv', newline='') as report_file:
+        assert list(csv.reader(report_file)) == [Analytics.REPORT_FIELDS['overlap']]
+
+    write_report(track_index, str(tmp_path / 'csv'))
+    with open(tmp_path / 'csv' / 'duplicates.csv', newline='') as report_file:
+        rows = list(csv.DictReader(report_file))
+    assert (rows[0]['uri'], rows[0]['playlists']) == (track_uri(2), 'A; B; C')
+
+
+def test_from_files_names_playlists_by_export_file(tmp_path):
+    playlist_id = '6' * 22
+    TrackListing([build_track(n) for n in (0, 1)]).export_tracks(
+        str(tmp_path / 'Mix ({0}).csv'.format(playlist_id)))
+    TrackListing([build_track(1)]).export_tracks(str(tmp_path / 'Other.csv'))
+
+    track_index = TrackIndex.from_files(str(tmp_path))
+
+    assert track_index.playlist_names == ['Mix', 'Other']
+    assert track_index.playlist_ids == [
+        playlist_id, str(tmp_path / 'Other.csv')]
+    assert track_index.overlaps() == [(0, 1, 1, 0.5)]
+
+
+def test_analyze_playlists_fetches_each_playlist_once(tmp_path):
+    sp = FakeSpotify(**generate_library(12, 40))
+    manager = SpotifyManager(configparser.ConfigParser())
+    manager.sp = sp
+    manager.authorized = True
+    manager.user_id = 'user'
+
+    track_index = manager.analyze_playlists(str(tmp_path / 'report.json'))
+
+    assert track_index.playlist_count == 12
+    assert sp.calls == {'current_user_playlists': 1, 'playlist': 12,
+                        'playlist_items': 12}
+    uris = {uri for playlist in sp.playlists.values()
+            for uri in playlist['uris']}
+    assert track_index.track_count == len(uris)
+
+    track_index = manager.analyze_playlists(
+        str(tmp_path / 'csv'), playlist_selectors=['Playlist 1*'])
+    assert track_index.playlist_names == ['Playlist 1', 'Playlist 10',
+                                          'Playlist 11']
@@ -0,0 +1,297 @@
+import asyncio
+import configparser
+import json
+import os
+import random
+import time
+
+import pytest
+import spotipy
+
+from fakes import FakeSpotify
+from spotify_playlist_utility.Cache import MetadataCache
+from spotify_playlist_utility.Scheduler import TokenBucket
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import TrackListing
+
+aiohttp = pytest.importorskip('aiohttp')
+web = pytest.importorskip('aiohttp.web')
+
+from spotify_playlist_utility.AsyncSpotify import (  # noqa: E402
+    AccessToken, AsyncRequestScheduler, AsyncSpotifyClient,
+    AsyncSpotifyManager)
+
+
+class FakeApiServer():
+    """
+    Local aiohttp stand-in for the Web API endpoints used by
+    AsyncSpotifyClient, backed by a FakeSpotify.
+    """
+
+    def __init__(self, fake: FakeSpotify, latency: float = 0.0) -> None:
+        self.fake = fake
+        self.latency = latency
+        self.responses = []  # queued (status, headers) answered first
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        app = web.Application()
+        app.router.add_route('*', '/v1/{path:.*}', self.handle)
+        self.runner = web.AppRunner(app)
+
+    def dispatch(self, method, path, query, body):
+        fake = self.fake
+        paging = {name: int(query[name]) for name in ('limit', 'offset')
+                  if name in query}
+        parts = path.split('/')
+        if (method, path) == ('GET', 'me'):
+            return fake.me()
+        if (method, path) == ('GET', 'me/playlists'):
+            return fake.current_user_playlists(**paging)
+        if (method, path) == ('GET', 'me/tracks'):
+            return fake.current_user_saved_tracks(**paging)
+        if method == 'POST' and parts[0] == 'users':
+            return fake.user_playlist_create(
+                parts[1], body['name'], body['public'])
+        if (method, len(parts)) == ('GET', 2):
+            return fake.playlist(parts[1])
+        if method == 'GET':
+            return fake.playlist_items(parts[1], **paging)
+        if method == 'POST':
+            return fake.playlist_add_items(
+                parts[1], body['uris'], body.get('position'))
+        if 'range_start' in body:
+            return fake.playlist_reorder_items(
+                parts[1], body['range_start'], body['insert_before'],
+                body['range_length'], body.get('snapshot_id'))
+        return fake.playlist_replace_items(parts[1], body['uris'])
+
+    async def handle(self, request):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.responses:
+                status, headers = self.responses.pop(0)
+                return web.json_response(
+                    {'error': {'status': status, 'message': 'x'}},
+                    status=status, headers=headers)
+            body = await request.json() if request.can_read_body else None
+            return web.json_response(self.dispatch(
+                request.method, request.match_info['path'], request.query,
+                body))
+        except spotipy.SpotifyException as error:
+            return web.json_response(
+                {'error': {'status': error.http_status, 'message': error.msg}},
+                status=error.http_status)
+        finally:
+            self.in_flight -= 1
+
+    async def start(self) -> str:
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        return 'http://127.0.0.1:{0}/v1/'.format(
+            site._server.sockets[0].getsockname()[1])
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+def run_against(fake: FakeSpotify, test, latency: float = 0.0, concurrency: int = 64):
+    """Runs 'test(manager, server)' against a FakeApiServer backed by 'fake'."""
+    async def static_token():
+        return 'token'
+
+    async def run():
+        server = FakeApiServer(fake, latency)
+        prefix = await server.start()
+        manager = AsyncSpotifyManager(configparser.ConfigParser(),
+                                      concurrency=concurrency)
+        manager.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency))
+        manager.sp = AsyncRequestScheduler(
+            AsyncSpotifyClient(manager.session, static_token, prefix,
+                               manager.transfer_counter),
+            TokenBucket(10000, 10000), base_delay=0.01)
+        manager.authorized = True
+        manager.user_id = 'user'
+        try:
+            async with manager:
+                return await test(manager, server)
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+
+def uris(count, prefix=''):
+    return ['spotify:track:{0}{1:0{2}d}'.format(prefix, i, 22 - len(prefix))
+            for i in range(count)]
+
+
+def test_get_playlists_keeps_many_lookups_in_flight():
+    fake = FakeSpotify({'p{0:03d}'.format(i): {'name': 'P{0}'.format(i),
+                                               'uris': uris(i % 7)}
+                        for i in range(200)})
+
+    async def test(manager, server):
+        return await manager.get_playlists(), server.peak_in_flight
+
+    playlists, peak_in_flight = run_against(fake, test, latency=0.05)
+
+    assert [playlist.id for playlist in playlists] == sorted(fake.playlists)
+    assert [playlist.track_count for playlist in playlists] == [
+        i % 7 for i in range(200)]
+    assert fake.calls['playlist'] == 200
+    assert peak_in_flight > 32
+
+
+def test_get_playlist_pages_in_order():
+    fake = FakeSpotify({'p': {'name': 'P', 'uris': uris(450)}})
+
+    async def test(manager, server):
+        return await manager.get_playlist('p')
+
+    playlist = run_against(fake, test)
+
+    assert [track.uri for track in playlist.tracks] == uris(450)
+    assert playlist.tracks[0].artist == 'Artist 0'
+    assert fake.calls['playlist_items'] == 5
+
+
+def test_export_all_playlists_then_skips_unchanged(tmp_path):
+    fake = FakeSpotify({'a': {'name': 'A', 'uris': uris(150)},
+                        'b': {'name': 'B', 'uris': uris(3, 'b')}})
+
+    async def test(manager, server):
+        await manager.export_all_playlists(str(tmp_path))
+        await manager.export_all_playlists(str(tmp_path))
+
+    run_against(fake, test)
+
+    listing = TrackListing()
+    listing.import_tracks(str(tmp_path / 'A (a).csv'))
+    assert [track.uri for track in listing.tracks] == uris(150)
+    with open(tmp_path / '.playlist_snapshots.json') as manifest_file:
+        assert set(json.load(manifest_file)) == {'a', 'b'}
+    assert fake.calls['playlist'] == 2
+
+
+def test_export_saved_tracks_writes_each_page_as_it_arrives(tmp_path):
+    export_path = tmp_path / 'saved.csv'
+    pages = [[Track(uri, 'n', 'a', 'b') for uri in uris(50, str(page))]
+             for page in range(3)]
+
+    async def test(manager, server):
+        async def iter_saved_track_pages():
+            for page_number, page in enumerate(pages):
+                if page_number:
+                    with open(export_path, encoding='utf-8') as export_file:
+                        assert len(export_file.readlines()) == 1 + 50 * page_number
+                yield page
+
+        manager.iter_saved_track_pages = iter_saved_track_pages
+        await manager.export_saved_tracks(str(export_path))
+
+    run_against(FakeSpotify(), test)
+
+    listing = TrackListing()
+    listing.import_tracks(str(export_path))
+    assert [track.uri for track in listing.tracks] == [
+        track.uri for page in pages for track in page]
+
+
+def test_liked_memory_export_caches_appended_tracks(tmp_path):
+    fake = FakeSpotify(saved_tracks=uris(30))
+
+    async def test(manager, server):
+        manager.cache = MetadataCache(tmp_path)
+        playlist_id = await manager.export_saved_tracks_to_liked_memory_playlist()
+        fake.save_tracks(uris(2, 'n'))
+        await manager.export_saved_tracks_to_liked_memory_playlist()
+        return manager.cache, playlist_id
+
+    cache, playlist_id = run_against(fake, test)
+
+    playlist_uris = fake.playlists[playlist_id]['uris']
+    assert playlist_uris[:2] == uris(2, 'n')[::-1]
+    assert sorted(playlist_uris) == sorted(uris(30) + uris(2, 'n'))
+    assert [track.uri for track in cache.get_tracks(
+        playlist_id, fake.playlist(playlist_id)['snapshot_id'])] == playlist_uris
+    assert cache.get_watermark('saved_tracks_added_at:user') == \
+        fake.saved_tracks[0][1]
+    cache.close()
+
+
+def test_import_restores_order_of_concurrent_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(random, 'randrange', lambda stop: 7)
+    import_path = str(tmp_path / 'Imported.csv')
+    TrackListing([Track(uri, 'n', 'a', 'b') for uri in uris(730)]
+                 ).export_tracks(import_path)
+    fake = FakeSpotify()
+
+    async def test(manager, server):
+        return await manager.import_tracks_to_playlist(import_path)
+
+    playlist_id = run_against(fake, test, latency=0.01)
+
+    expected_uris = uris(730)
+    random.Random(7).shuffle(expected_uris)
+    assert fake.playlists[playlist_id]['uris'] == expected_uris
+    assert fake.calls['playlist_add_items'] == 8
+    assert not os.path.exists(import_path + '.checkpoint.json')
+
+
+def test_throttled_request_honors_retry_after():
+    fake = FakeSpotify({'p': {'name': 'P', 'uris': []}})
+
+    async def test(manager, server):
+        server.responses = [(429, {'Retry-After': '1'})]
+        started_at = time.monotonic()
+        playlist = await manager.get_playlist('p')
+        return playlist, time.monotonic() - started_at, manager.sp.stats()
+
+    playlist, elapsed, stats = run_against(fake, test)
+
+    assert playlist.name == 'P'
+    assert elapsed >= 1
+    assert (stats['retries'], stats['throttled']) == (1, 1)
+
+
+def test_client_errors_raise_spotify_exception():
+    fake = FakeSpotify({'p': {'name': 'P', 'uris': uris(2)}})
+
+    async def test(manager, server):
+        with pytest.raises(spotipy.SpotifyException) as error:
+            await manager.sp.playlist_reorder_items(
+                'p', 0, 2, snapshot_id='stale')
+        return error.value
+
+    error = run_against(fake, test)
+
+    assert error.http_status == 400
+    assert 'snapshot_id does not match' in error.msg
+
+
+def test_access_token_is_reused_until_it_nears_expiry():
+    class FakeTokenManager():
+        def __init__(self):
+            self.fetch_count = 0
+            self.token_info = None
+
+        def get_access_token(self):
+            self.fetch_count += 1
+            self.token_info = {'access_token': 't{0}'.format(self.fetch_count),
+                               'expires_at': int(time.time()) + 3600}
+            return self.token_info['access_token']
+
+    token_manager = FakeTokenManager()
+    access_token = AccessToken(token_manager)
+
+    async def run():
+        tokens = [await access_token()]
+        tokens += await asyncio.gather(*[access_token() for _ in range(10)])
+        token_manager.token_info['expires_at'] = int(time.time())
+        return tokens + [await access_token()]
+
+    assert asyncio.run(run()) == ['t1'] * 11 + ['t2']
+    assert token_manager.fetch_count == 2
@@ -0,0 +1,134 @@
+import configparser
+import threading
+import time
+from unittest.mock import MagicMock
+
+import spotipy
+from spotipy.cache_handler import MemoryCacheHandler
+
+from spotify_playlist_utility.Auth import TokenManager
+from spotify_playlist_utility.Spotify import SpotifyManager
+
+
+class FakeAuthManager():
+    """Stands in for SpotifyOAuth, issuing numbered tokens."""
+
+    def __init__(self, lifetime: float = 3600, refresh_delay: float = 0.0,
+                 failing_refreshes: int = 0) -> None:
+        self.lifetime = lifetime
+        self.refresh_delay = refresh_delay
+        self.failing_refreshes = failing_refreshes
+        self.scope = 'user-library-read'
+        self.cache_handler = MemoryCacheHandler()
+        self.issued = 0
+        self.refresh_attempts = 0
+
+    def _issue(self) -> dict:
+        self.issued += 1
+        token_info = {'access_token': 't{0}'.format(self.issued),
+                      'refresh_token': 'r',
+                      'expires_at': int(time.time() + self.lifetime),
+                      'scope': self.scope}
+        self.cache_handler.save_token_to_cache(token_info)
+        return token_info
+
+    def get_access_token(self, as_dict=True):
+        token_info = self.cache_handler.get_cached_token() or self._issue()
+        return token_info['access_token']
+
+    def refresh_access_token(self, refresh_token):
+        self.refresh_attempts += 1
+        time.sleep(self.refresh_delay)
+        if self.failing_refreshes:
+            self.failing_refreshes -= 1
+            raise spotipy.SpotifyOauthError('temporarily unavailable')
+        return self._issue()
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_refreshes_in_background_without_blocking_requests():
+    auth_manager = FakeAuthManager(refresh_delay=0.5)
+    # Refresh one second after the token is first obtained.
+    token_manager = TokenManager(auth_manager, refresh_margin=3599)
+
+    assert token_manager.get_access_token() == 't1'
+    auth_manager.cache_handler.save_token_to_cache(
+        dict(auth_manager.cache_handler.get_cached_token(), user_id='user'))
+    wait_for(lambda: auth_manager.refresh_attempts == 1)
+
+    # A refresh is in flight; requests keep using the current token.
+    started_at = time.monotonic()
+    assert token_manager.get_access_token() == 't1'
+    assert time.monotonic() - started_at < 0.1
+
+    wait_for(lambda: token_manager.refresh_count == 1)
+    assert token_manager.get_access_token() == 't2'
+    assert auth_manager.cache_handler.get_cached_token()['user_id'] == 'user'
+    token_manager.stop()
+
+
+def test_failed_background_refresh_is_retried():
+    auth_manager = FakeAuthManager(failing_refreshes=1)
+    token_manager = TokenManager(auth_manager, refresh_margin=3599,
+                                 retry_delay=0.1)
+
+    assert token_manager.get_access_token() == 't1'
+    wait_for(lambda: token_manager.refresh_count == 1)
+    assert auth_manager.refresh_attempts == 2
+    assert token_manager.get_access_token() == 't2'
+    token_manager.stop()
+
+
+def test_authorize_requests_union_of_planned_scopes_once(monkeypatch):
+    requested_scopes = []
+
+    def build_auth_manager(config_parser, scope, requests_session=True):
+        requested_scopes.append(scope)
+        auth_manager = FakeAuthManager()
+        auth_manager.scope = ' '.join(scope)
+        return auth_manager
+
+    client = MagicMock()
+    client.me.return_value = {'id': 'user'}
+    monkeypatch.setattr(SpotifyManager, 'build_auth_manager',
+                        staticmethod(build_auth_manager))
+    monkeypatch.setattr(spotipy, 'Spotify', lambda **kwargs: client)
+
+    manager = SpotifyManager(configparser.ConfigParser(), scope_sets=[
+        'ExportSavedTracks', 'CreateEditPlaylist'])
+    manager.authorize('ExportSavedTracks')
+    manager.authorize('CreateEditPlaylist')
+    assert requested_scopes == [
+        ['playlist-modify-private', 'user-library-read']]
+
+    # Scopes outside the plan are authorized again, together with the
+    # granted ones, on the same client.
+    manager.authorize('ListPlaylists')
+    assert requested_scopes[1] == [
+        'playlist-modify-private', 'playlist-read-collaborative',
+        'playlist-read-private', 'user-library-read']
+    assert client.auth_manager is manager.token_manager
+    assert manager.token_manager.scope.split() == requested_scopes[1]
+
+
+def test_concurrent_first_requests_obtain_one_token():
+    auth_manager = FakeAuthManager()
+    token_manager = TokenManager(auth_manager)
+    tokens = []
+    threads = [threading.Thread(
+        target=lambda: tokens.append(token_manager.get_access_token()))
+        for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tokens == ['t1'] * 8
+    assert auth_manager.issued == 1
+    token_manager.stop()
@@ -0,0 +1,110 @@
+import json
+import sys
+import time
+
+import pytest
+import spotipy
+from spotipy.cache_handler import MemoryCacheHandler
+
+from fakes import FakeSpotify, generate_library
+from spotify_playlist_utility import __main__
+from spotify_playlist_utility.Batch import BatchRunner
+from spotify_playlist_utility.Scheduler import RequestScheduler
+from spotify_playlist_utility.Spotify import SpotifyManager
+
+
+class FakeAuthManager():
+    """Holds a cached token granting every scope, for one account."""
+
+    def __init__(self, client_id: str, cache_path: str) -> None:
+        self.client_id = client_id
+        self.cache_path = cache_path
+        self.scope = ' '.join(SpotifyManager.scopes_of(SpotifyManager.SCOPES))
+        self.cache_handler = MemoryCacheHandler({
+            'access_token': 't', 'refresh_token': 'r',
+            'expires_at': int(time.time()) + 3600, 'scope': self.scope,
+            'user_id': client_id})
+
+
+def test_batch_runs_accounts_with_own_clients_and_shared_budget(
+        tmp_path, monkeypatch, capsys):
+    fakes = {'alice': FakeSpotify(**generate_library(3, 120)),
+             'bob': FakeSpotify(**generate_library(2, 10, seed=1))}
+    auth_managers = []
+    clients = []
+
+    def build_auth_manager(config_parser, scope, requests_session=True):
+        config = config_parser["DEFAULT"]
+        auth_managers.append(FakeAuthManager(
+            config["ClientID"], config["TokenCachePath"]))
+        return auth_managers[-1]
+
+    def build_client(auth_manager, requests_session):
+        clients.append(requests_session)
+        return fakes[auth_manager.auth_manager.client_id]
+
+    monkeypatch.setattr(SpotifyManager, 'build_auth_manager',
+                        staticmethod(build_auth_manager))
+    monkeypatch.setattr(spotipy, 'Spotify', build_client)
+    buckets = []
+    from_config = RequestScheduler.from_config
+    monkeypatch.setattr(RequestScheduler, 'from_config', classmethod(
+        lambda cls, config_parser, client, bucket=None:
+            buckets.append(bucket) or from_config(config_parser, client, bucket)))
+
+    accounts = []
+    for name in ('alice', 'bob', 'carol'):
+        config_path = tmp_path / '{0}.ini'.format(name)
+        if name != 'carol':
+            config_path.write_text(
+                "[DEFAULT]\nClientID = {0}\nClientSecret = s\n"
+                "RedirectURI = http://localhost\nCacheDir = {1}\n".format(
+                    name, tmp_path / 'cache' / name))
+        accounts.append({'config': str(config_path), 'commands': [
+            ['-e', str(tmp_path / 'exports' / name)], ['-a']]})
+    # Cached tracks are reused by the next export, unless it opts out.
+    accounts[1]['commands'].extend([
+        ['-e', str(tmp_path / 'exports' / 'bob-cached')],
+        ['--refresh', '-e', str(tmp_path / 'exports' / 'bob-refreshed')],
+        ['--no-cache', '--concurrency', '1',
+         '-e', str(tmp_path / 'exports' / 'bob-uncached')]])
+    manifest_path = tmp_path / 'manifest.json'
+    summary_path = tmp_path / 'summary.json'
+    manifest_path.write_text(json.dumps({
+        'concurrency': 3, 'requests_per_second': 1000,
+        'request_burst': 1000, 'summary': str(summary_path),
+        'accounts': accounts}))
+    monkeypatch.setattr(sys, 'argv', ['spotify-playlist-utility',
+                                      '--batch', str(manifest_path)])
+
+    assert __main__.main() == 1
+
+    summary = json.loads(summary_path.read_text())
+    results = {result['config']: result for result in summary['accounts']}
+    alice = results[str(tmp_path / 'alice.ini')]
+    assert alice['succeeded'] and alice['user_id'] == 'alice'
+    assert [command['args'][0] for command in alice['commands']] == ['-e', '-a']
+    assert len(list((tmp_path / 'exports' / 'alice').glob('*.csv'))) == 3
+    assert fakes['alice'].calls['user_playlist_create'] == 1
+    assert fakes['bob'].calls['playlist_items'] == 6
+    assert len(list((tmp_path / 'exports' / 'bob-uncached').glob('*.csv'))) == 3
+    assert 'error' in results[str(tmp_path / 'carol.ini')]
+    assert summary['failed_account_count'] == 1
+
+    # One authorization per account, each with its own token cache; one
+    # shared connection pool and rate budget.
+    assert sorted(auth_manager.cache_path for auth_manager in auth_managers) == [
+        str(tmp_path / '.cache-alice'), str(tmp_path / '.cache-bob')]
+    assert clients[0] is clients[1]
+    assert buckets[0] is buckets[1] and buckets[0].rate == 1000
+
+
+def test_batch_rejects_run_wide_options():
+    argument_parser = __main__.build_argument_parser()
+    for command in (['-v', '-e', 'exports'], ['--async', '-e', 'exports'],
+                    ['-z']):
+        with pytest.raises(SystemExit):
+            BatchRunner({'accounts': [{'config': 'a.ini',
+                                       'commands': [command]}]},
+                        argument_parser, __main__.run_command,
+                        __main__.scope_sets_of)
@@ -0,0 +1,93 @@
+import configparser
+
+from fakes import FakeSpotify
+from spotify_playlist_utility.Cache import MetadataCache
+from spotify_playlist_utility.Spotify import SpotifyManager
+from spotify_playlist_utility.Track import Track
+
+
+def build_manager(sp: FakeSpotify, cache: MetadataCache) -> SpotifyManager:
+    manager = SpotifyManager(configparser.ConfigParser(), cache=cache)
+    manager.sp = sp
+    manager.authorized = True
+    return manager
+
+
+def build_fake() -> FakeSpotify:
+    return FakeSpotify(playlists={
+        'p{0}'.format(i): {'name': 'Playlist {0}'.format(i),
+                           'uris': ['spotify:track:{0}x{1}'.format(i, j)
+                                    for j in range(150)]}
+        for i in range(3)})
+
+
+def test_get_playlist_skips_item_fetch_for_unchanged_snapshot(tmp_path):
+    sp = build_fake()
+    manager = build_manager(sp, MetadataCache(tmp_path))
+
+    first = list(manager.get_playlist('p0').tracks)
+    second = manager.get_playlist('p0')
+
+    assert sp.calls['playlist_items'] == 2
+    assert [repr(t) for t in second.tracks] == [repr(t) for t in first]
+    assert (manager.cache.hits, manager.cache.misses) == (1, 1)
+
+    sp.playlist_add_items('p0', ['spotify:track:new'])
+    assert len(list(manager.get_playlist('p0').tracks)) == 151
+    assert sp.calls['playlist_items'] == 4
+
+
+def test_get_playlists_reuses_cached_track_counts(tmp_path):
+    sp = build_fake()
+    build_manager(sp, MetadataCache(tmp_path)).get_playlists()
+    assert sp.calls['playlist'] == 3
+
+    playlists = build_manager(sp, MetadataCache(tmp_path)).get_playlists()
+    assert sp.calls['playlist'] == 3
+    assert [playlist.track_count for playlist in playlists] == [150] * 3
+
+
+def test_get_playlists_stores_track_counts_in_one_transaction(tmp_path, monkeypatch):
+    cache = MetadataCache(tmp_path)
+    evictions = []
+    monkeypatch.setattr(cache, '_evict', evictions.append)
+
+    build_manager(build_fake(), cache).get_playlists()
+
+    assert len(evictions) == 1
+    assert [cache.get_track_count('p{0}'.format(i), 'p{0}-0'.format(i))
+            for i in range(3)] == [150] * 3
+
+
+def test_refresh_ttl_and_size_eviction(tmp_path):
+    track = Track('spotify:track:a', 'a', 'artist', 'album')
+    cache = MetadataCache(tmp_path, max_entries=2)
+    for playlist_id in ('p0', 'p1', 'p2'):
+        cache.put(playlist_id, 's', 1, [track])
+
+    assert cache.get_tracks('p0', 's') is None
+    assert cache.get_tracks('p2', 's')[0].uri == 'spotify:track:a'
+    assert MetadataCache(tmp_path, refresh=True).get_tracks('p2', 's') is None
+    assert MetadataCache(tmp_path, ttl=-1).get_tracks('p2', 's') is None
+
+
+def test_from_config_reads_optional_keys(tmp_path):
+    config_parser = configparser.ConfigParser()
+    config_parser.read_dict({'DEFAULT': {
+        'CacheDir': str(tmp_path), 'CacheTTL': '60', 'CacheMaxEntries': '5'}})
+
+    cache = MetadataCache.from_config(config_parser)
+
+    assert (cache.cache_dir, cache.ttl, cache.max_entries) == (tmp_path, 60, 5)
+
+
+def test_playlist_names_round_trip_per_user(tmp_path):
+    cache = MetadataCache(tmp_path)
+    cache.put_playlist_names('alice', [('p1', 'Mix'), ('p0', 'Road Trip')])
+    cache.put_playlist_names('bob', [('p2', 'Mix')])
+    cache.put_playlist_names('alice', [('p3', 'New'), ('p1', 'Mix')])
+
+    assert cache.get_playlist_names('alice') == [('p3', 'New'), ('p1', 'Mix')]
+    assert cache.get_playlist_names('bob') == [('p2', 'Mix')]
+    assert cache.get_playlist_names('carol') is None
+    assert MetadataCache(tmp_path, refresh=True).get_playlist_names('bob') is None
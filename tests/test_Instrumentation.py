@@ -0,0 +1,54 @@
+import time
+
+import pytest
+import requests
+import spotipy
+
+from spotify_playlist_utility.Instrumentation import Profiler, TransferCounter
+
+
+def build_response(body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    return response
+
+
+def test_transfer_counter_counts_session_responses():
+    session = requests.Session()
+    counter = TransferCounter()
+    counter.attach(session)
+
+    for hook in session.hooks['response']:
+        hook(build_response(b'{"items": []}'))
+        hook(build_response(b''))
+
+    assert (counter.response_count, counter.bytes_received) == (2, 13)
+
+
+def test_profiler_reports_latency_percentiles_and_phases(monkeypatch):
+    profiler = Profiler()
+    clock = iter([0.0, 0.004, 1.0, 1.03, 2.0, 2.25, 3.0, 3.5])
+    monkeypatch.setattr(time, 'perf_counter', lambda: next(clock))
+
+    for _ in range(2):
+        with profiler.request('playlist_items'):
+            profiler.record_bytes(10)
+    with pytest.raises(spotipy.SpotifyException):
+        with profiler.request('playlist_items'):
+            raise spotipy.SpotifyException(429, -1, 'throttled')
+    profiler.record_retry('playlist_items')
+    profiler.record_bytes(99)  # outside any request: not attributed
+    with profiler.phase('build_tracks'):
+        pass
+    monkeypatch.setattr(time, 'perf_counter', lambda: 10.0)
+
+    report = profiler.report()
+    stats = report['endpoints']['playlist_items']
+    assert (stats['calls'], stats['retries'], stats['throttled'],
+            stats['bytes']) == (3, 1, 1, 20)
+    assert stats['latency_ms']['p50'] == 30.0
+    assert stats['latency_ms']['max'] == 250.0
+    assert stats['histogram_ms'] == {'<=5': 1, '<=50': 1, '<=500': 1}
+    assert report['phases'] == {'build_tracks': {'calls': 1, 'seconds': 0.5}}
+    assert 'playlist_items' in profiler.summary()
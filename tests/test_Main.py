@@ -1,4 +1,6 @@
 import configparser
+import subprocess
+import sys
 from unittest.mock import MagicMock
 from unittest import mock
 
@@ -10,3 +12,77 @@ def test_load_config_parser(self, mockFileOpen: mock.MagicMock):
     # TODO: Learn about unit tests and build out test logic here
     # TODO: Once tests written, implement tox testing within project
     pass
+
+
+# Modules only needed by commands that talk to Spotify (or the cache).
+DEFERRED_MODULES = ('spotipy', 'requests', 'aiohttp', 'sqlite3',
+                    'spotify_playlist_utility.Spotify')
+# Cumulative import time allowed for the CLI module, in microseconds.
+IMPORT_TIME_BUDGET = 100000
+
+
+def import_times(*args) -> dict:
+    """Runs python -X importtime with 'args'; returns module: cumulative us."""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + list(args),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, module = line.split('|')
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_stays_within_budget():
+    times = import_times('-c', 'import spotify_playlist_utility.__main__')
+
+    assert not [module for module in DEFERRED_MODULES if module in times]
+    assert times['spotify_playlist_utility.__main__'] < IMPORT_TIME_BUDGET
+
+
+def test_spotify_manager_import_defers_analytics():
+    times = import_times('-c', 'import spotify_playlist_utility.Spotify')
+
+    assert 'spotify_playlist_utility.Spotify' in times
+    assert 'spotify_playlist_utility.Analytics' not in times
+
+
+def test_convert_never_loads_the_network_stack(tmp_path):
+    csv_path = str(tmp_path / 'tracks.csv')
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('uri,name,artist,album\n'
+                       'spotify:track:0000000000000000000000,a,b,c\n')
+
+    times = import_times('-m', 'spotify_playlist_utility', 'missing.ini',
+                         '-c', csv_path, str(tmp_path / 'tracks.spsnap'))
+
+    assert (tmp_path / 'tracks.spsnap').exists()
+    assert 'spotify_playlist_utility.TrackLists' in times
+    assert not [module for module in DEFERRED_MODULES if module in times]
+
+
+def test_convert_round_trips_local_tracks(tmp_path):
+    csv_text = ('uri,name,artist,album\n'
+                'spotify:track:0000000000000000000000,a,b,c\n'
+                'spotify:local:The+Band:Demo:Song+%231:187,Song #1,The Band,Demo\n')
+    (tmp_path / 'tracks.csv').write_text(csv_text, encoding='utf-8')
+
+    for source, target in (('tracks.csv', 'tracks.spsnap'),
+                           ('tracks.spsnap', 'restored.csv')):
+        subprocess.run([sys.executable, '-m', 'spotify_playlist_utility',
+                        'missing.ini', '-c', str(tmp_path / source),
+                        str(tmp_path / target)], check=True)
+
+    assert (tmp_path / 'restored.csv').read_text(encoding='utf-8') == csv_text
+
+
+def test_help_defaults_match_managers():
+    from spotify_playlist_utility import __main__
+    from spotify_playlist_utility.AsyncSpotify import AsyncSpotifyManager
+    from spotify_playlist_utility.Spotify import SpotifyManager
+
+    assert __main__.DEFAULT_CONCURRENCY == SpotifyManager.DEFAULT_CONCURRENCY
+    assert (__main__.DEFAULT_ASYNC_CONCURRENCY
+            == AsyncSpotifyManager.DEFAULT_CONCURRENCY)
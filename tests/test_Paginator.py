@@ -0,0 +1,43 @@
+import threading
+import time
+
+from spotify_playlist_utility.Paginator import OffsetPaginator
+
+
+def build_fetch_page(total: int, limit: int, calls: list):
+    lock = threading.Lock()
+
+    def fetch_page(offset):
+        with lock:
+            calls.append(offset)
+        # Later pages come back first.
+        time.sleep(0.001 * ((total - offset) // limit))
+        return {'items': list(range(offset, min(offset + limit, total))),
+                'offset': offset, 'limit': limit, 'total': total}
+    return fetch_page
+
+
+def test_items_keep_order_when_pages_return_out_of_order():
+    calls = []
+    paginator = OffsetPaginator(build_fetch_page(
+        total=1003, limit=20, calls=calls), concurrency=8)
+
+    assert list(paginator.items()) == list(range(1003))
+    assert sorted(calls) == list(range(0, 1003, 20))
+
+
+def test_single_page_listing_makes_one_request():
+    calls = []
+    paginator = OffsetPaginator(build_fetch_page(
+        total=5, limit=20, calls=calls), concurrency=8)
+
+    assert list(paginator.items()) == [0, 1, 2, 3, 4]
+    assert calls == [0]
+
+
+def test_empty_listing():
+    calls = []
+    paginator = OffsetPaginator(build_fetch_page(
+        total=0, limit=20, calls=calls), concurrency=8)
+
+    assert list(paginator.items()) == []
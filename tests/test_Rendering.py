@@ -0,0 +1,83 @@
+import io
+import json
+
+import pytest
+
+from spotify_playlist_utility.Rendering import PlaylistRenderer
+from spotify_playlist_utility.TrackLists import Playlist
+
+
+def build_playlist(number: int, name: str, track_count: int) -> Playlist:
+    return Playlist(uri='spotify:playlist:p{0}'.format(number), name=name,
+                    track_count=track_count)
+
+
+PAGES = [[build_playlist(0, 'Road Trip', 12), build_playlist(1, 'mix', 250)],
+         [build_playlist(2, 'Mix 2', 7)]]
+
+
+def render(pages, **kwargs) -> str:
+    stream = io.StringIO()
+    PlaylistRenderer(stream=stream, **kwargs).render(pages)
+    return stream.getvalue()
+
+
+def test_table_aligns_columns_and_handles_empty_listing():
+    assert render(PAGES).splitlines() == [
+        '',
+        'Index |Name      |Track Count ',
+        '-' * 30,
+        '0     |Road Trip |12          ',
+        '1     |mix       |250         ',
+        '2     |Mix 2     |7           ',
+        '']
+    assert render([[]]).splitlines() == [
+        '', 'Index |Name |Track Count ', '-------------------------', '']
+
+
+def test_machine_readable_formats_keep_listing_index():
+    rows = json.loads(render(PAGES, output_format='json', min_tracks=10))
+    assert rows == [
+        {'index': 0, 'id': 'p0', 'name': 'Road Trip', 'track_count': 12},
+        {'index': 1, 'id': 'p1', 'name': 'mix', 'track_count': 250}]
+
+    lines = render(PAGES, output_format='jsonl', sort='name').splitlines()
+    assert [json.loads(line)['index'] for line in lines] == [1, 2, 0]
+
+    assert render(PAGES, output_format='tsv', sort='-tracks',
+                  name_glob='[Mm]ix*', max_tracks=100).splitlines() == [
+        'index\tid\tname\ttrack_count', '2\tp2\tMix 2\t7']
+    assert json.loads(render([], output_format='json')) == []
+
+
+def test_streamed_formats_write_each_page_before_the_next_arrives():
+    stream = io.StringIO()
+
+    def pages():
+        yield PAGES[0]
+        assert stream.getvalue().splitlines() == [
+            'index\tid\tname\ttrack_count',
+            '0\tp0\tRoad Trip\t12', '1\tp1\tmix\t250']
+        yield PAGES[1]
+
+    playlists = PlaylistRenderer('tsv', stream=stream).render(pages())
+    assert [playlist.id for playlist in playlists] == ['p0', 'p1', 'p2']
+
+
+def test_table_is_written_once_every_page_has_arrived():
+    stream = io.StringIO()
+
+    def pages():
+        yield PAGES[0]
+        assert stream.getvalue() == ''
+        yield PAGES[1]
+
+    PlaylistRenderer(stream=stream).render(pages())
+    assert stream.getvalue() == render(PAGES)
+
+
+def test_rejects_unknown_format_and_sort_key():
+    with pytest.raises(ValueError):
+        PlaylistRenderer('xml')
+    with pytest.raises(ValueError):
+        PlaylistRenderer(sort='size')
@@ -0,0 +1,135 @@
+import http.server
+import json
+import threading
+import time
+
+import pytest
+import spotipy
+
+from spotify_playlist_utility.Instrumentation import Profiler, TransferCounter
+from spotify_playlist_utility.Scheduler import (RequestScheduler, TokenBucket,
+                                                build_session)
+
+
+class FakeApiHandler(http.server.BaseHTTPRequestHandler):
+    """Answers with the next queued (status, headers) entry, then 200s."""
+
+    def _respond(self):
+        self.server.requests.append((self.command, self.path))
+        status, headers = (self.server.responses.pop(0)
+                           if self.server.responses else (200, {}))
+        body = json.dumps({'error': {'status': status, 'message': 'x'}}
+                          if status >= 400 else {'id': 'p', 'snapshot_id': 's'})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FakeApiHandler)
+    server.requests = []
+    server.responses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = spotipy.Spotify(auth='token', requests_session=build_session(4))
+    client.prefix = 'http://127.0.0.1:{0}/v1/'.format(server.server_port)
+    yield server, client
+    server.shutdown()
+    server.server_close()
+
+
+def test_throttled_request_honors_retry_after(fake_api):
+    server, client = fake_api
+    server.responses = [(429, {'Retry-After': '1'})]
+    scheduler = RequestScheduler(client, TokenBucket(100, 10))
+
+    started_at = time.monotonic()
+    assert scheduler.playlist('p')['id'] == 'p'
+
+    assert time.monotonic() - started_at >= 1
+    assert len(server.requests) == 2
+    stats = scheduler.stats()
+    assert (stats['requests'], stats['retries'], stats['throttled']) == (2, 1, 1)
+
+
+def test_profiler_records_each_attempt_per_endpoint(fake_api):
+    server, client = fake_api
+    server.responses = [(429, {'Retry-After': '0'})]
+    profiler = Profiler()
+    transfer_counter = TransferCounter()
+    transfer_counter.profiler = profiler
+    transfer_counter.attach(client._session)
+    scheduler = RequestScheduler(client, TokenBucket(100, 10))
+    scheduler.profiler = profiler
+
+    scheduler.playlist('p')
+    scheduler.playlist_add_items('p', ['spotify:track:' + 'a' * 22])
+
+    endpoints = profiler.report()['endpoints']
+    assert (endpoints['playlist']['calls'], endpoints['playlist']['retries'],
+            endpoints['playlist']['errors']) == (2, 1, {'429': 1})
+    assert endpoints['playlist_add_items']['calls'] == 1
+    assert (endpoints['playlist']['bytes']
+            + endpoints['playlist_add_items']['bytes']
+            == transfer_counter.bytes_received)
+
+
+def test_server_errors_retry_reads_but_not_writes(fake_api):
+    server, client = fake_api
+    scheduler = RequestScheduler(client, TokenBucket(100, 10),
+                                 base_delay=0.01)
+
+    server.responses = [(503, {}), (502, {})]
+    assert scheduler.playlist('p')['id'] == 'p'
+    assert len(server.requests) == 3
+
+    server.responses = [(503, {})]
+    with pytest.raises(spotipy.SpotifyException):
+        scheduler.playlist_add_items('p', ['spotify:track:a'])
+    assert len(server.requests) == 4
+
+
+def test_gives_up_after_max_retries(fake_api):
+    server, client = fake_api
+    server.responses = [(429, {'Retry-After': '0'})] * 3
+    scheduler = RequestScheduler(client, TokenBucket(100, 10), max_retries=2)
+
+    with pytest.raises(spotipy.SpotifyException) as error:
+        scheduler.playlist('p')
+    assert error.value.http_status == 429
+    assert len(server.requests) == 3
+
+
+def test_token_bucket_paces_and_prefers_reads():
+    bucket = TokenBucket(rate=20, capacity=1)
+    bucket.acquire()
+    order = []
+
+    def take(write):
+        bucket.acquire(write)
+        order.append('write' if write else 'read')
+
+    writer = threading.Thread(target=take, args=(True,))
+    writer.start()
+    time.sleep(0.01)
+    reader = threading.Thread(target=take, args=(False,))
+    reader.start()
+    writer.join()
+    reader.join()
+
+    assert order == ['read', 'write']
+
+    started_at = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - started_at >= 0.2
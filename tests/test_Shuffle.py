@@ -0,0 +1,86 @@
+import random
+
+from spotify_playlist_utility.Shuffle import (apply_block_move,
+                                              longest_increasing_subsequence,
+                                              plan_block_moves)
+
+
+def replay(current_order, moves):
+    order = list(current_order)
+    for range_start, insert_before, range_length in moves:
+        order = apply_block_move(order, range_start, insert_before,
+                                 range_length)
+    return order
+
+
+def test_apply_block_move_uses_positions_before_the_move():
+    assert apply_block_move(list('abcde'), 0, 3, 2) == list('cabde')
+    assert apply_block_move(list('abcde'), 3, 1, 2) == list('adebc')
+    assert apply_block_move(list('abcde'), 4, 0) == list('eabcd')
+
+
+def test_longest_increasing_subsequence():
+    assert longest_increasing_subsequence([3, 0, 1, 4, 2]) in (
+        {0, 1, 2}, {0, 1, 4})
+    assert longest_increasing_subsequence([]) == set()
+
+
+def test_plan_block_moves_sorts_random_permutations():
+    rng = random.Random(3)
+    for size in (0, 1, 2, 5, 40, 500):
+        current_order = list(range(size))
+        rng.shuffle(current_order)
+        moves = plan_block_moves(current_order)
+        assert replay(current_order, moves) == list(range(size))
+        assert len(moves) <= size - len(
+            longest_increasing_subsequence(current_order))
+
+
+def test_plan_block_moves_moves_contiguous_runs_once():
+    # A block of 100 tracks sitting at the end belongs at the front.
+    current_order = list(range(100, 300)) + list(range(100))
+    assert plan_block_moves(current_order) == [(200, 0, 100)]
+    assert plan_block_moves(list(range(10))) == []
+
+
+def plan_block_moves_by_replay(current_order):
+    """Reference planner: rescans and rebuilds the list on every move."""
+    order = list(current_order)
+    keep = longest_increasing_subsequence(order)
+    moves = []
+    target = 0
+    while target < len(order):
+        if target in keep:
+            target += 1
+            continue
+        range_start = order.index(target)
+        range_length = 1
+        while (range_start + range_length < len(order)
+               and target + range_length not in keep
+               and order[range_start + range_length] == target + range_length):
+            range_length += 1
+        insert_before = order.index(target - 1) + 1 if target else 0
+        if not range_start <= insert_before <= range_start + range_length:
+            moves.append((range_start, insert_before, range_length))
+            order = apply_block_move(
+                order, range_start, insert_before, range_length)
+        target += range_length
+    return moves
+
+
+def test_plan_block_moves_matches_replayed_plan():
+    rng = random.Random(11)
+    for size in [0, 1, 2, 3, 4, 6, 9] * 20 + [100, 1000] * 5:
+        current_order = list(range(size))
+        if rng.random() < 0.5:
+            rng.shuffle(current_order)
+        elif size:
+            # Nearly sorted orders make the longest runs and no-op moves.
+            for _ in range(rng.randrange(4)):
+                i, j = rng.randrange(size), rng.randrange(size)
+                current_order[i], current_order[j] = (
+                    current_order[j], current_order[i])
+            cut = rng.randrange(size)
+            current_order = current_order[cut:] + current_order[:cut]
+        assert plan_block_moves(current_order) == plan_block_moves_by_replay(
+            current_order)
@@ -0,0 +1,94 @@
+import pytest
+
+from spotify_playlist_utility import Snapshot
+from spotify_playlist_utility.Snapshot import SnapshotTracks, write_snapshot
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import TrackListing
+
+
+def build_tracks(count: int) -> list:
+    return [Track('spotify:track:{0:022d}'.format(i),
+                  'Náme, "{0}"\n'.format(i) if i % 3 else '',
+                  'Artist {0} ✓'.format(i % 4), 'Album {0}'.format(i % 7))
+            for i in range(count)]
+
+
+def test_snapshot_round_trips_csv_losslessly(tmp_path):
+    csv_path = str(tmp_path / 'tracks.csv')
+    local_track = Track('spotify:local:Artist:Album:T%C3%ADtle:200', 'Títle',
+                        'Artist', 'Album')
+    TrackListing(build_tracks(50) + [local_track]).export_tracks(csv_path)
+
+    converted = TrackListing()
+    assert converted.import_tracks(csv_path) == []
+    converted.export_tracks(str(tmp_path / 'tracks.spsnap'))
+    restored = TrackListing()
+    restored.import_tracks(str(tmp_path / 'tracks.spsnap'))
+    restored.export_tracks(str(tmp_path / 'restored.csv'))
+
+    assert (tmp_path / 'restored.csv').read_bytes() == (
+        tmp_path / 'tracks.csv').read_bytes()
+
+
+def test_snapshot_tracks_decode_on_access(tmp_path):
+    tracks = build_tracks(10)
+    write_snapshot(tracks, str(tmp_path / 'tracks.spsnap'))
+
+    listing = TrackListing.load_snapshot(str(tmp_path / 'tracks.spsnap'))
+    snapshot_tracks = listing.tracks
+
+    assert len(snapshot_tracks) == 10
+    assert repr(snapshot_tracks[-1]) == repr(tracks[-1])
+    assert [repr(t) for t in snapshot_tracks[2:4]] == [
+        repr(t) for t in tracks[2:4]]
+    assert tracks[5] in listing
+    # Artists and albums are stored once each.
+    assert len(snapshot_tracks.dictionary) == 4 + 7
+    snapshot_tracks.close()
+
+
+def test_snapshot_column_reads_match_tracks(tmp_path):
+    tracks = build_tracks(20) + [
+        Track('spotify:local:Artist:Album:T%C3%ADtle:200', 'Títle', 'A', 'B'),
+        Track('spotify:episode:512ojhOuo1ktJprKbVcKyQ', 'Episode', 'A', 'B'),
+        Track('https://example.com/not-a-uri', 'Other', 'A', 'B')]
+    write_snapshot(tracks, str(tmp_path / 'tracks.spsnap'))
+    snapshot_tracks = SnapshotTracks(str(tmp_path / 'tracks.spsnap'))
+
+    assert snapshot_tracks.column('uri') == [t.uri for t in tracks]
+    assert snapshot_tracks.column('name') == [t.name for t in tracks]
+    assert snapshot_tracks.column('artist') == [t.artist for t in tracks]
+    assert snapshot_tracks.column('album') == [t.album for t in tracks]
+    assert [repr(t) for t in snapshot_tracks] == [repr(t) for t in tracks]
+    # Known prefixes are stored as a kind, leaving only the ID.
+    assert bytes(snapshot_tracks.uri_kinds[-3:]) == bytes([3, 2, 0])
+    assert snapshot_tracks._string(snapshot_tracks.uri_data,
+                                   snapshot_tracks.uri_offsets, 0) == '0' * 22
+    with pytest.raises(ValueError):
+        snapshot_tracks.column('duration')
+    snapshot_tracks.close()
+
+
+def test_snapshot_rejects_columns_beyond_uint32_offsets(tmp_path, monkeypatch):
+    monkeypatch.setattr(Snapshot, 'MAX_OFFSET', 100)
+
+    with pytest.raises(ValueError):
+        write_snapshot(build_tracks(10), str(tmp_path / 'tracks.spsnap'))
+
+
+def test_empty_snapshot_and_format_selection(tmp_path):
+    TrackListing().export_tracks(str(tmp_path / 'empty.bin'),
+                                 file_format='snapshot')
+    listing = TrackListing()
+    listing.import_tracks(str(tmp_path / 'empty.bin'), file_format='snapshot')
+    assert listing.tracks == []
+
+    with pytest.raises(ValueError):
+        TrackListing().export_tracks(str(tmp_path / 'x'), file_format='parquet')
+
+
+def test_rejects_non_snapshot_files(tmp_path):
+    (tmp_path / 'tracks.spsnap').write_bytes(b'uri,name,artist,album\n')
+
+    with pytest.raises(ValueError):
+        SnapshotTracks(str(tmp_path / 'tracks.spsnap'))
@@ -0,0 +1,591 @@
+import configparser
+import json
+import os
+import random
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import spotipy
+
+from fakes import (FakeSpotify, RecordingClient, ReplayClient,
+                   generate_library)
+from spotify_playlist_utility.Cache import MetadataCache
+from spotify_playlist_utility.Scheduler import RequestScheduler, TokenBucket
+from spotify_playlist_utility.Spotify import SpotifyManager
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import TrackListing
+
+
+def build_manager(sp: MagicMock, concurrency: int = 4) -> SpotifyManager:
+    manager = SpotifyManager(configparser.ConfigParser(),
+                             concurrency=concurrency)
+    manager.sp = sp
+    manager.authorized = True
+    manager.user_id = 'user'
+    return manager
+
+
+def test_get_playlists_resolves_track_counts_in_order():
+    playlist_ids = ['p{0}'.format(i) for i in range(20)]
+    in_flight = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def playlist(playlist_id, fields=None):
+        assert fields == 'tracks.total'
+        with lock:
+            in_flight.append(playlist_id)
+            peak[0] = max(peak[0], len(in_flight))
+        # Later playlists answer first to shake out ordering bugs.
+        time.sleep(0.001 * (20 - int(playlist_id[1:])))
+        with lock:
+            in_flight.remove(playlist_id)
+        return {'tracks': {'total': int(playlist_id[1:]) * 10}}
+
+    sp = MagicMock()
+    sp.current_user_playlists.return_value = {
+        'items': [{'id': playlist_id,
+                   'uri': 'spotify:playlist:{0}'.format(playlist_id),
+                   'name': playlist_id, 'description': '',
+                   'snapshot_id': 's'}
+                  for playlist_id in playlist_ids],
+        'offset': 0, 'limit': 50, 'total': len(playlist_ids), 'next': None
+    }
+    sp.playlist.side_effect = playlist
+
+    playlists = build_manager(sp, concurrency=4).get_playlists()
+
+    assert [playlist.id for playlist in playlists] == playlist_ids
+    assert [playlist.track_count for playlist in playlists] == [
+        i * 10 for i in range(20)]
+    assert 1 < peak[0] <= 4
+
+
+def build_shuffle_fixture(track_count: int):
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(track_count)]
+    sp = FakeSpotify(playlists={'p': {'name': 'Mix', 'uris': uris}})
+    return build_manager(sp), sp, uris
+
+
+def test_shuffle_replace_matches_planned_permutation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager, sp, uris = build_shuffle_fixture(250)
+    playlist = manager.get_playlist('p')
+    random.seed(7)
+    target_order = list(range(250))
+    random.shuffle(target_order)
+    random.seed(7)
+
+    api_call_count = manager.shuffle_playlist(playlist, 'replace')
+
+    assert sp.playlists['p']['uris'] == [uris[i] for i in target_order]
+    assert api_call_count == 3
+    assert sp.calls['playlist_replace_items'] == 1
+    assert sp.calls['playlist_add_items'] == 2
+
+
+def test_shuffle_moves_matches_planned_permutation():
+    manager, sp, uris = build_shuffle_fixture(300)
+    playlist = manager.get_playlist('p')
+    random.seed(11)
+    target_order = list(range(300))
+    random.shuffle(target_order)
+    random.seed(11)
+
+    api_call_count = manager.shuffle_playlist(playlist, 'moves')
+
+    assert sp.playlists['p']['uris'] == [uris[i] for i in target_order]
+    assert api_call_count == sp.calls['playlist_reorder_items'] < 300
+
+
+class FailingAddFakeSpotify(FakeSpotify):
+    """Fails adds with 502 from the given add call on, 'failures' times."""
+
+    def __init__(self, fail_from_call: int, failures: int,
+                 apply_before_failing: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_from_call = fail_from_call
+        self.failures = failures
+        self.apply_before_failing = apply_before_failing
+        self.add_count = 0
+
+    def playlist_add_items(self, playlist_id, items, position=None):
+        self.add_count += 1
+        if self.add_count >= self.fail_from_call and self.failures:
+            self.failures -= 1
+            if self.apply_before_failing:
+                super().playlist_add_items(playlist_id, items, position)
+            raise spotipy.SpotifyException(502, -1, 'Bad gateway')
+        return super().playlist_add_items(playlist_id, items, position)
+
+
+@pytest.mark.parametrize('failures, apply_before_failing', [
+    (1, False), (1, True), (3, False)])
+def test_shuffle_replace_recovers_from_failed_adds(
+        tmp_path, monkeypatch, failures, apply_before_failing):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(SpotifyManager, 'SHUFFLE_RETRY_DELAY', 0)
+    playlist_id = '7' * 22
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(350)]
+    sp = FailingAddFakeSpotify(
+        2, failures, apply_before_failing,
+        playlists={playlist_id: {'name': 'Mix', 'uris': uris}})
+    manager = build_manager(sp)
+
+    manager.shuffle_playlist(manager.get_playlist(playlist_id), 'replace')
+
+    # Retried, or (after three failures) restored by syncing.
+    assert sorted(sp.playlists[playlist_id]['uris']) == uris
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_shuffle_replace_keeps_recovery_file_when_restore_fails(
+        tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(SpotifyManager, 'SHUFFLE_RETRY_DELAY', 0)
+    playlist_id = '7' * 22
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(350)]
+    sp = FailingAddFakeSpotify(
+        2, 10, playlists={playlist_id: {'name': 'Mix', 'uris': uris}})
+    manager = build_manager(sp)
+
+    with pytest.raises(SystemExit):
+        manager.shuffle_playlist(manager.get_playlist(playlist_id), 'replace')
+    assert len(sp.playlists[playlist_id]['uris']) == 200
+    recovery_path, = tmp_path.iterdir()
+    assert recovery_path.name == 'shuffle-recovery Mix ({0}).csv'.format(
+        playlist_id)
+
+    sp.failures = 0
+    manager.sync_playlist_tracks(str(recovery_path))
+    recovered_tracks = TrackListing()
+    recovered_tracks.import_tracks(str(recovery_path))
+    assert sp.playlists[playlist_id]['uris'] == [
+        track.uri for track in recovered_tracks.tracks]
+    assert sorted(sp.playlists[playlist_id]['uris']) == uris
+
+
+def test_shuffle_replace_aborts_on_concurrent_edit():
+    manager, sp, uris = build_shuffle_fixture(10)
+    playlist = manager.get_playlist('p')
+    sp.playlist_add_items('p', ['spotify:track:other'])
+
+    with pytest.raises(SystemExit):
+        manager.shuffle_playlist(playlist, 'replace')
+    assert sp.calls['playlist_replace_items'] == 0
+
+
+def test_liked_memory_sync_only_pages_new_saved_tracks(tmp_path):
+    saved = ['spotify:track:s{0}'.format(i) for i in range(95)]
+    sp = FakeSpotify(saved_tracks=saved)
+    manager = build_manager(sp)
+    manager.cache = MetadataCache(tmp_path)
+
+    playlist_id = manager.export_saved_tracks_to_liked_memory_playlist()
+    assert sorted(sp.playlists[playlist_id]['uris']) == sorted(saved)
+    assert sp.calls['current_user_saved_tracks'] == 2
+
+    sp.save_tracks(['spotify:track:new1', 'spotify:track:new2'])
+    manager.export_saved_tracks_to_liked_memory_playlist()
+    assert sp.calls['current_user_saved_tracks'] == 3
+    assert sp.playlists[playlist_id]['uris'][:2] == [
+        'spotify:track:new2', 'spotify:track:new1']
+    assert len(sp.playlists[playlist_id]['uris']) == 97
+
+    # Nothing new: only the first page of saved tracks is fetched.
+    calls = dict(sp.calls)
+    assert manager.export_saved_tracks_to_liked_memory_playlist() is None
+    assert sp.calls == dict(calls, current_user_saved_tracks=4)
+
+    # The appended playlist was cached under its new snapshot_id.
+    snapshot_id = sp.playlist(playlist_id)['snapshot_id']
+    assert [track.uri for track in manager.cache.get_tracks(
+        playlist_id, snapshot_id)] == sp.playlists[playlist_id]['uris']
+
+    sp.save_tracks(['spotify:track:new3'])
+    manager.export_saved_tracks_to_liked_memory_playlist()
+    assert sp.playlists[playlist_id]['uris'][:3] == [
+        'spotify:track:new3', 'spotify:track:new2', 'spotify:track:new1']
+
+    manager.export_saved_tracks_to_liked_memory_playlist(full_resync=True)
+    assert sp.calls['current_user_saved_tracks'] == 7
+    assert len(sp.playlists[playlist_id]['uris']) == 98
+
+
+def test_export_all_playlists_skips_unchanged_snapshots(tmp_path):
+    sp = FakeSpotify(playlists={
+        'p{0}'.format(i): {'name': 'Mix/{0}'.format(i),
+                           'uris': ['spotify:track:{0}x{1}'.format(i, j)
+                                    for j in range(120)]}
+        for i in range(5)})
+    manager = build_manager(sp)
+
+    manager.export_all_playlists(str(tmp_path))
+    exported = sorted(path.name for path in tmp_path.glob('*.csv'))
+    assert exported == ['Mix_{0} (p{0}).csv'.format(i) for i in range(5)]
+    with open(str(tmp_path / 'Mix_3 (p3).csv'), encoding='utf-8') as csvfile:
+        assert len(csvfile.readlines()) == 121
+    assert sp.calls['current_user_playlists'] == 1
+    assert sp.calls['playlist_items'] == 10
+
+    sp.playlist_add_items('p1', ['spotify:track:new'])
+    manager.export_all_playlists(str(tmp_path))
+    assert sp.calls['playlist_items'] == 12
+
+
+def test_fetches_request_projected_fields_and_max_page_sizes():
+    sp = MagicMock(wraps=FakeSpotify(
+        playlists={'p': {'name': 'Mix', 'uris': ['spotify:track:a']}},
+        saved_tracks=['spotify:track:b']))
+    manager = build_manager(sp)
+
+    list(manager.get_playlist('p').tracks)
+    manager.get_playlists()
+    manager.get_saved_tracks()
+
+    sp.playlist.assert_any_call('p', fields=SpotifyManager.PLAYLIST_FIELDS)
+    sp.playlist.assert_any_call('p', fields='tracks.total')
+    sp.playlist_items.assert_called_once_with(
+        'p', fields=SpotifyManager.PLAYLIST_ITEMS_FIELDS, limit=100, offset=0)
+    sp.current_user_playlists.assert_called_once_with(limit=50, offset=0)
+    sp.current_user_saved_tracks.assert_called_once_with(limit=50, offset=0)
+
+
+def test_replayed_session_reproduces_recorded_export(tmp_path):
+    recording = RecordingClient(FakeSpotify(**generate_library(4, 230)))
+    build_manager(recording).export_all_playlists(str(tmp_path / 'recorded'))
+    recording_path = str(tmp_path / 'session.json')
+    recording.save(recording_path)
+
+    replay = ReplayClient(recording_path)
+    build_manager(replay).export_all_playlists(str(tmp_path / 'replayed'))
+
+    for exported in (tmp_path / 'recorded').glob('*.csv'):
+        assert (tmp_path / 'replayed' / exported.name).read_text() == \
+            exported.read_text()
+    assert replay.calls == recording.client.calls
+
+
+def test_rate_limited_fake_is_paced_by_scheduler_retries():
+    sp = FakeSpotify(**generate_library(0, 0, saved_track_count=400),
+                     rate_limit=4, retry_after=0.3)
+    manager = build_manager(RequestScheduler(sp, TokenBucket(1000, 1000)))
+
+    saved_tracks = manager.get_saved_tracks()
+
+    assert len(saved_tracks.tracks) == 400
+    assert sp.calls['current_user_saved_tracks'] == 8
+    assert sp.throttled['current_user_saved_tracks'] > 0
+    assert manager.sp.stats()['throttled'] > 0
+
+
+class FlakyFakeSpotify(FakeSpotify):
+    """Delays alternate chunk writes and drops one of them."""
+
+    def __init__(self, fail_on_call: int = None, apply_before_failing=False,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.fail_on_call = fail_on_call
+        self.apply_before_failing = apply_before_failing
+        self.add_count = 0
+
+    def playlist_add_items(self, playlist_id, items, position=None):
+        with self.lock:
+            self.add_count += 1
+            call = self.add_count
+        if int(items[0].split(':')[-1]) % 2:
+            time.sleep(0.02)
+        if call == self.fail_on_call:
+            if self.apply_before_failing:
+                super().playlist_add_items(playlist_id, items, position)
+            raise spotipy.SpotifyException(502, -1, 'Bad gateway')
+        return super().playlist_add_items(playlist_id, items, position)
+
+
+def write_import_csv(tmp_path, track_count: int):
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(track_count)]
+    listing = TrackListing([Track(uri, 'name', 'artist', 'album')
+                            for uri in uris])
+    csv_path = str(tmp_path / 'Imported.csv')
+    listing.export_tracks(csv_path)
+    return csv_path, uris
+
+
+@pytest.mark.parametrize('apply_before_failing', [False, True])
+def test_import_resumes_from_checkpoint_after_dropped_write(
+        tmp_path, apply_before_failing):
+    csv_path, uris = write_import_csv(tmp_path, 1050)
+    sp = FlakyFakeSpotify(fail_on_call=4,
+                          apply_before_failing=apply_before_failing)
+    manager = build_manager(sp, concurrency=4)
+
+    with pytest.raises(SystemExit):
+        manager.import_tracks_to_playlist(csv_path)
+    with open(csv_path + '.checkpoint.json', encoding='utf-8') as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+
+    playlist_id = manager.import_tracks_to_playlist(csv_path)
+
+    expected = list(uris)
+    random.Random(checkpoint['seed']).shuffle(expected)
+    assert playlist_id == checkpoint['playlist_id']
+    assert sp.calls['user_playlist_create'] == 1
+    assert sp.playlists[playlist_id]['uris'] == expected
+    assert not os.path.exists(csv_path + '.checkpoint.json')
+
+
+def test_concurrent_import_keeps_planned_order(tmp_path):
+    csv_path, uris = write_import_csv(tmp_path, 1234)
+    sp = FlakyFakeSpotify()
+    manager = build_manager(sp, concurrency=6)
+    random.seed(5)
+    seed = random.randrange(2 ** 32)
+    random.seed(5)
+
+    playlist_id = manager.import_tracks_to_playlist(csv_path)
+
+    expected = list(uris)
+    random.Random(seed).shuffle(expected)
+    assert sp.playlists[playlist_id]['uris'] == expected
+    assert sp.calls['playlist_add_items'] == 13
+    assert 0 < sp.calls['playlist_reorder_items'] <= 12
+
+
+LOCAL_URI = 'spotify:local:The+Band:Demo:Song:187'
+
+
+def test_import_skips_local_files(tmp_path, capsys):
+    csv_path, uris = write_import_csv(tmp_path, 3)
+    with open(csv_path, 'a', encoding='utf-8') as csv_file:
+        csv_file.write('{0},Song,The Band,Demo\n'.format(LOCAL_URI))
+    sp = FakeSpotify()
+    manager = build_manager(sp)
+
+    playlist_id = manager.import_tracks_to_playlist(csv_path)
+
+    assert "Skipped 1 local file(s)" in capsys.readouterr().out
+    assert sorted(sp.playlists[playlist_id]['uris']) == uris
+
+
+def test_sync_only_reorders_local_files(capsys):
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(3)]
+    other_local_uri = LOCAL_URI.replace('Song', 'Other')
+    sp = FakeSpotify(playlists={'p': {'name': 'Mix',
+                                      'uris': [LOCAL_URI] + uris}})
+    manager = build_manager(sp)
+
+    plan = manager.sync_playlist(manager.get_playlist('p'),
+                                 [uris[2], other_local_uri, uris[0]])
+
+    out = capsys.readouterr().out
+    assert "Skipped 1 local file(s)" in out and "Kept 1 local file(s)" in out
+    assert sp.playlists['p']['uris'] == [uris[2], uris[0], LOCAL_URI]
+    assert plan.removed_count == 1 and plan.added_count == 0
+
+
+def test_shuffle_replace_falls_back_to_moves_for_local_files():
+    manager, sp, uris = build_shuffle_fixture(20)
+    sp.playlists['p']['uris'].append(LOCAL_URI)
+
+    manager.shuffle_playlist(manager.get_playlist('p'), 'replace')
+
+    assert sorted(sp.playlists['p']['uris']) == sorted(uris + [LOCAL_URI])
+    assert sp.calls['playlist_replace_items'] == 0
+
+
+def test_authorize_reuses_user_id_cached_with_token(monkeypatch):
+    from spotipy.cache_handler import MemoryCacheHandler
+    from spotipy.oauth2 import SpotifyOAuth
+
+    scope = SpotifyManager.SCOPES['ListPlaylists']
+    cache_handler = MemoryCacheHandler({
+        'access_token': 't', 'refresh_token': 'r', 'token_type': 'Bearer',
+        'expires_at': int(time.time()) + 3600,
+        'scope': 'playlist-read-collaborative playlist-read-private'})
+    auth_manager = SpotifyOAuth(client_id='id', client_secret='secret',
+                                redirect_uri='http://localhost:8888/callback',
+                                scope=scope, cache_handler=cache_handler)
+    monkeypatch.setattr(SpotifyManager, 'build_auth_manager',
+                        staticmethod(lambda config_parser, scope, **kwargs: auth_manager))
+    client = MagicMock()
+    client.me.return_value = {'id': 'user'}
+    monkeypatch.setattr(spotipy, 'Spotify', lambda **kwargs: client)
+
+    manager = SpotifyManager(configparser.ConfigParser())
+    manager.authorize('ListPlaylists')
+    assert manager.user_id == 'user'
+    assert cache_handler.get_cached_token()['user_id'] == 'user'
+
+    manager = SpotifyManager(configparser.ConfigParser())
+    manager.authorize('ListPlaylists')
+    assert manager.user_id == 'user'
+    assert client.me.call_count == 1
+
+    # A token lacking the requested scopes is not trusted.
+    auth_manager.scope = 'playlist-modify-private'
+    manager = SpotifyManager(configparser.ConfigParser())
+    manager.authorize('CreateEditPlaylist')
+    assert client.me.call_count == 2
+
+
+def test_sync_edits_only_differing_tracks(tmp_path, capsys):
+    playlist_id = '3' * 22
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(250)]
+    sp = FakeSpotify(playlists={playlist_id: {'name': 'Mix', 'uris': uris}})
+    manager = build_manager(sp)
+    target_uris = [uris[1], uris[0]] + uris[2:200] + [
+        'spotify:track:{0:022d}'.format(i) for i in range(1000, 1003)]
+    TrackListing([Track(uri, 'n', 'a', 'b') for uri in target_uris]
+                 ).export_tracks(str(tmp_path / 'Mix ({0}).csv'.format(playlist_id)))
+    (tmp_path / 'notes.csv').write_text('not a playlist export')
+
+    manager.sync_playlist_tracks(str(tmp_path), dry_run=True)
+    assert "Would sync playlist: Mix: 54 edits" in capsys.readouterr().out
+    assert sp.playlists[playlist_id]['uris'] == uris
+
+    manager.sync_playlist_tracks(str(tmp_path))
+    assert sp.playlists[playlist_id]['uris'] == target_uris
+    assert (sp.calls['playlist_remove_specific_occurrences_of_items'],
+            sp.calls['playlist_reorder_items'],
+            sp.calls['playlist_add_items']) == (1, 1, 1)
+
+    manager.sync_playlist_tracks(str(tmp_path))
+    assert "0 edits" in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_sync_of_unchanged_export_with_local_track_is_a_no_op(tmp_path, capsys):
+    playlist_id = '5' * 22
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(3)] + [
+        'spotify:local:The+Band:Demo:Song:187']
+    sp = FakeSpotify(playlists={playlist_id: {'name': 'Mix', 'uris': uris}})
+    manager = build_manager(sp)
+
+    manager.export_all_playlists(str(tmp_path))
+    manager.sync_playlist_tracks(str(tmp_path))
+
+    assert "Synced playlist: Mix: 0 edits" in capsys.readouterr().out
+    assert sp.playlists[playlist_id]['uris'] == uris
+
+
+def test_sync_refuses_files_with_invalid_rows(tmp_path, capsys):
+    playlist_id = '5' * 22
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(3)]
+    sp = FakeSpotify(playlists={playlist_id: {'name': 'Mix', 'uris': uris}})
+    manager = build_manager(sp)
+    csv_path = tmp_path / 'Mix ({0}).csv'.format(playlist_id)
+    csv_path.write_text('uri,name,artist,album\n{0},n,a,b\nbad,n,a,b\n'.format(
+        uris[0]), encoding='utf-8')
+
+    with pytest.raises(SystemExit):
+        manager.sync_playlist_tracks(str(tmp_path))
+
+    assert "Not syncing" in capsys.readouterr().out
+    assert sp.playlists[playlist_id]['uris'] == uris
+    assert sp.calls.get('playlist', 0) == 0
+
+
+def test_sync_aborts_on_concurrent_edit():
+    uris = ['spotify:track:{0:022d}'.format(i) for i in range(5)]
+    sp = FakeSpotify(playlists={'p': {'name': 'Mix', 'uris': uris}})
+    manager = build_manager(sp)
+
+    playlist = manager.get_playlist('p')
+    list(playlist.tracks)
+    sp.playlist_add_items('p', [uris[0]])
+    with pytest.raises(SystemExit):
+        manager.sync_playlist(playlist, uris + ['spotify:track:' + 'n' * 22])
+    with pytest.raises(spotipy.SpotifyException):
+        manager.sync_playlist(playlist, uris[1:])
+    assert sp.playlists['p']['uris'] == uris + [uris[0]]
+
+
+def test_select_playlists_by_id_or_uri_skips_listing():
+    playlist_id = '4' * 22
+    sp = FakeSpotify(playlists={playlist_id: {'name': 'Mix', 'uris': []}})
+    manager = build_manager(sp)
+
+    playlists = manager.select_playlists([
+        playlist_id, 'spotify:playlist:' + playlist_id,
+        'https://open.spotify.com/playlist/{0}?si=x'.format(playlist_id)])
+
+    assert [playlist.name for playlist in playlists] == ['Mix']
+    assert sp.calls == {'playlist': 1}
+    with pytest.raises(SystemExit):
+        manager.select_playlists(['5' * 22])
+
+
+def test_select_playlists_refreshes_name_index_incrementally(tmp_path):
+    sp = FakeSpotify(**generate_library(120, 1))
+    manager = build_manager(sp)
+    manager.cache = MetadataCache(tmp_path)
+
+    playlists = manager.select_playlists(['Playlist 7', 'Playlist 11?'])
+    assert [playlist.id for playlist in playlists] == [
+        'p00007', 'p00110', 'p00111', 'p00112', 'p00113', 'p00114',
+        'p00115', 'p00116', 'p00117', 'p00118', 'p00119']
+    assert sp.calls['current_user_playlists'] == 3
+
+    # New playlists are listed first, so one page picks them up.
+    new_id = sp.user_playlist_create('user', 'Playlist 7')['id']
+    playlists = manager.select_playlists(['Playlist 7'])
+    assert [playlist.id for playlist in playlists] == [new_id, 'p00007']
+    assert sp.calls['current_user_playlists'] == 4
+
+    # A rename past the first page is found by re-listing in full.
+    sp.playlists['p00100']['name'] = 'Renamed'
+    playlists = manager.select_playlists(['Renamed'])
+    assert [playlist.id for playlist in playlists] == ['p00100']
+    assert sp.calls['current_user_playlists'] == 8
+
+    # So is a removal, which the first page's total gives away.
+    del sp.playlists['p00119']
+    manager.select_playlists(['Playlist 0'])
+    assert sp.calls['current_user_playlists'] == 12
+    assert ('p00119', 'Playlist 119') not in manager.cache.get_playlist_names('user')
+    with pytest.raises(SystemExit):
+        manager.select_playlists(['Playlist 119'])
+
+
+def test_shuffle_each_selected_playlist_without_prompt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sp = FakeSpotify(**generate_library(3, 20))
+    manager = build_manager(sp)
+    monkeypatch.setattr('builtins.input', MagicMock(side_effect=AssertionError))
+
+    manager.shuffle_playlist_tracks(playlist_selectors=['Playlist [01]'])
+
+    # Replaced in bulk by default, with no recovery file left behind.
+    assert sp.calls['playlist_replace_items'] == 2
+    assert sp.calls.get('playlist_reorder_items', 0) == 0
+    assert list(tmp_path.iterdir()) == []
+    assert sp.playlists['p00000']['version'] > 0
+    assert sp.playlists['p00001']['version'] > 0
+    assert sp.playlists['p00002']['version'] == 0
+
+
+def test_list_playlists_prints_empty_listing_and_json(capsys):
+    manager = build_manager(FakeSpotify())
+    assert manager.list_playlists() == []
+    assert 'Index |Name |Track Count' in capsys.readouterr().out
+
+    manager = build_manager(FakeSpotify(**generate_library(60, 3)))
+    playlists = manager.list_playlists(output_format='jsonl', min_tracks=3)
+    assert len(playlists) == 60
+    assert manager.sp.calls == {'current_user_playlists': 2, 'playlist': 60}
+    assert json.loads(capsys.readouterr().out.splitlines()[-1]) == {
+        'index': 59, 'id': 'p00059', 'name': 'Playlist 59', 'track_count': 3}
+
+
+def test_list_playlists_resolves_counts_of_name_matches_only(capsys):
+    manager = build_manager(FakeSpotify(**generate_library(60, 3)))
+
+    playlists = manager.list_playlists(output_format='jsonl',
+                                       name_glob='Playlist 5*')
+
+    assert [playlist.id for playlist in playlists] == [
+        'p00005'] + ['p000{0}'.format(i) for i in range(50, 60)]
+    assert manager.sp.calls == {'current_user_playlists': 2, 'playlist': 11}
+    # Listing positions are kept.
+    assert json.loads(capsys.readouterr().out.splitlines()[0])['index'] == 5
@@ -0,0 +1,75 @@
+import random
+
+from spotify_playlist_utility.Shuffle import (apply_block_move,
+                                              longest_increasing_subsequence)
+from spotify_playlist_utility.Sync import plan_sync
+
+
+def replay(current_uris, plan):
+    uris = list(current_uris)
+    for removal_chunk in plan.removal_chunks:
+        positions = set()
+        for item in removal_chunk:
+            for position in item['positions']:
+                assert uris[position] == item['uri']
+                positions.add(position)
+        uris = [uri for position, uri in enumerate(uris)
+                if position not in positions]
+    for range_start, insert_before, range_length in plan.moves:
+        uris = apply_block_move(uris, range_start, insert_before, range_length)
+    for position, added_uris in plan.addition_chunks:
+        assert len(added_uris) <= 100
+        uris[position:position] = added_uris
+    return uris
+
+
+def test_plan_sync_reaches_random_targets():
+    rng = random.Random(5)
+    for size in (0, 1, 10, 150, 600):
+        current_uris = [rng.choice('abcdefghij') + str(rng.randrange(size + 1))
+                        for _ in range(size)]
+        target_uris = [uri for uri in current_uris if rng.random() < 0.8]
+        rng.shuffle(target_uris[:size // 10])
+        for _ in range(size // 5):
+            target_uris.insert(rng.randrange(len(target_uris) + 1),
+                               'new' + str(rng.randrange(size + 1)))
+        plan = plan_sync(current_uris, target_uris)
+        assert replay(current_uris, plan) == target_uris
+
+
+def test_plan_sync_only_edits_differences():
+    current_uris = ['u{0}'.format(i) for i in range(300)]
+    target_uris = current_uris[:100] + current_uris[150:] + ['x', 'y']
+    target_uris[0], target_uris[1] = target_uris[1], target_uris[0]
+
+    plan = plan_sync(current_uris, target_uris)
+
+    assert (plan.removed_count, len(plan.moves), plan.added_count) == (50, 1, 2)
+    assert plan.addition_chunks == [(250, ['x', 'y'])]
+    # 50 removals fit one call, highest positions first.
+    assert len(plan.removal_chunks) == 1
+    assert plan.removal_chunks[0][0] == {'uri': 'u149', 'positions': [149]}
+    assert plan.call_count == 3
+    assert plan_sync(current_uris, current_uris).call_count == 0
+
+
+def test_plan_sync_matches_repeated_tracks_in_order():
+    plan = plan_sync(['a', 'b', 'a', 'a'], ['a', 'a', 'b'])
+
+    assert plan.removal_chunks == [[{'uri': 'a', 'positions': [3]}]]
+    assert replay(['a', 'b', 'a', 'a'], plan) == ['a', 'a', 'b']
+
+
+def test_plan_sync_plans_large_reorders():
+    # Planning is O(n log n); replaying the moves here would not be.
+    rng = random.Random(2)
+    current_uris = ['u{0}'.format(i) for i in range(20000)]
+    target_uris = list(current_uris)
+    rng.shuffle(target_uris)
+    ranks = {uri: rank for rank, uri in enumerate(target_uris)}
+
+    plan = plan_sync(current_uris, target_uris)
+
+    assert plan.removed_count == plan.added_count == 0
+    assert len(plan.moves) <= len(current_uris) - len(
+        longest_increasing_subsequence([ranks[uri] for uri in current_uris]))
@@ -0,0 +1,233 @@
+import configparser
+import random
+import tracemalloc
+
+import pytest
+
+from fakes import FakeSpotify
+from spotify_playlist_utility.Spotify import SpotifyManager
+from spotify_playlist_utility.Track import Track
+from spotify_playlist_utility.TrackLists import (LazyTracks, Playlist,
+                                                 TrackColumns, TrackListing)
+
+
+def build_listing(*ids) -> TrackListing:
+    return TrackListing([Track('spotify:track:{0}'.format(track_id),
+                               track_id, 'artist', 'album')
+                         for track_id in ids])
+
+
+def uris(listing: TrackListing) -> list:
+    return [track.uri.split(':')[-1] for track in listing.tracks]
+
+
+def test_listings_do_not_share_tracks():
+    first, second = TrackListing(), Playlist(uri='spotify:playlist:p')
+    first.tracks.append(Track('spotify:track:a', 'a', 'artist', 'album'))
+
+    assert second.tracks == []
+    assert TrackListing().tracks == []
+
+
+def test_set_operations_keep_order():
+    left = build_listing('d', 'a', 'c', 'b', 'a')
+    right = build_listing('b', 'e', 'a')
+
+    assert uris(left.difference(right)) == ['d', 'c']
+    assert uris(left.intersection(right)) == ['a', 'b', 'a']
+    assert uris(left.union(right)) == ['d', 'a', 'c', 'b', 'a', 'e']
+
+
+def test_membership_tracks_appended_tracks():
+    listing = build_listing('a')
+    assert 'spotify:track:a' in listing
+    assert 'spotify:track:b' not in listing
+
+    listing.tracks.append(Track('spotify:track:b', 'b', 'artist', 'album'))
+    assert listing.tracks[-1] in listing
+    assert listing.uri_index() == {'spotify:track:a': 0, 'spotify:track:b': 1}
+
+
+def test_uri_index_follows_in_place_edits():
+    listing = build_listing('a', 'b')
+    assert listing.uri_index() == {'spotify:track:a': 0, 'spotify:track:b': 1}
+
+    listing.tracks.reverse()
+    listing.tracks[0] = Track('spotify:track:c', 'c', 'artist', 'album')
+    assert listing.uri_index() == {'spotify:track:c': 0, 'spotify:track:a': 1}
+    assert 'spotify:track:b' not in listing
+
+
+@pytest.mark.parametrize('tracks', [list, TrackColumns])
+def test_uri_index_is_reused_until_tracks_change(tracks):
+    listing = TrackListing(tracks(build_listing('a', 'b').tracks))
+    uri_index = listing.uri_index()
+    assert 'spotify:track:a' in listing and listing.uri_index() is uri_index
+
+    random.Random(1).shuffle(listing.tracks)
+    listing.tracks[0:1] = [Track('spotify:track:c', 'c', 'artist', 'album')]
+    assert listing.uri_index() is not uri_index
+    assert sorted(listing.uri_index()) == sorted(
+        track.uri for track in listing.tracks)
+
+    listing.tracks = [listing.tracks[-1]]
+    assert listing.uri_index() == {listing.tracks[0].uri: 0}
+
+
+def export_peak_memory(export, tmp_path) -> int:
+    tracemalloc.start()
+    try:
+        export(str(tmp_path / 'export.csv'))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_export_peak_memory_is_bounded(tmp_path):
+    saved = ['spotify:track:{0:022d}'.format(i) for i in range(20000)]
+    manager = SpotifyManager(configparser.ConfigParser(), concurrency=4)
+    manager.sp = FakeSpotify(saved_tracks=saved)
+
+    materialized_peak = export_peak_memory(
+        lambda path: manager.get_saved_tracks().export_tracks(path), tmp_path)
+    streaming_peak = export_peak_memory(
+        lambda path: TrackListing.export_track_pages(
+            manager.iter_saved_track_pages(), path), tmp_path)
+
+    with open(str(tmp_path / 'export.csv'), encoding='utf-8') as csvfile:
+        assert len(csvfile.readlines()) == 20001
+    assert streaming_peak * 5 < materialized_peak
+
+
+def test_export_keeps_pages_written_before_a_failure(tmp_path):
+    def track_pages():
+        yield list(build_listing('a', 'b').tracks)
+        raise RuntimeError('connection lost')
+
+    with pytest.raises(RuntimeError):
+        TrackListing.export_track_pages(track_pages(), str(tmp_path / 'x.csv'))
+
+    with open(str(tmp_path / 'x.csv'), encoding='utf-8') as csvfile:
+        assert len(csvfile.readlines()) == 3
+
+
+def test_track_columns_behave_like_a_track_list():
+    tracks = [Track('spotify:track:{0}'.format(i), 'name {0}'.format(i),
+                    'artist {0}'.format(i % 2), 'album') for i in range(5)]
+    columns = TrackColumns(tracks[:3])
+    columns.append(tracks[3])
+    columns.insert(0, tracks[4])
+    del columns[1]
+
+    expected = [tracks[4], tracks[1], tracks[2], tracks[3]]
+    assert [repr(t) for t in columns] == [repr(t) for t in expected]
+    assert repr(columns[-1]) == repr(tracks[3])
+    assert [repr(t) for t in columns[1:3]] == [repr(t) for t in expected[1:3]]
+    assert columns.values == ['artist 0', 'album', 'artist 1']
+    assert columns.artist_codes.itemsize == columns.album_codes.itemsize == 4
+
+    listing = TrackListing(columns)
+    assert tracks[2] in listing
+    assert uris(listing.difference(build_listing('3'))) == ['4', '1', '2']
+
+
+def test_track_interns_artist_and_album():
+    first = Track('spotify:track:a', 'a', ''.join(['Art', 'ist']), 'Album')
+    second = Track('spotify:track:b', 'b', ''.join(['Arti', 'st']), None)
+    assert first.artist is second.artist
+    assert second.album is None
+
+
+IMPORT_CSV = '''uri,name,artist,album
+spotify:track:000000000000000000000a,A,Artist,Album
+spotify:track:000000000000000000000b,"B, with comma",Artist,Album
+spotify:track:bad,Bad,Artist,Album
+spotify:local:Artist:Album:Local+Song:215,Local Song,Artist,Album
+spotify:local:Artist:Album,Truncated,Artist,Album
+spotify:track:000000000000000000000a,A again,Artist,Album
+spotify:track:000000000000000000000c
+spotify:track:000000000000000000000c,C,Artist,Album
+'''
+
+
+@pytest.mark.parametrize('dedup, expected', [
+    (None, ['A', 'B, with comma', 'Local Song', 'A again', 'C']),
+    ('first', ['A', 'B, with comma', 'Local Song', 'C']),
+    ('last', ['B, with comma', 'Local Song', 'A again', 'C']),
+])
+def test_import_tracks_validates_and_dedups(tmp_path, dedup, expected):
+    csv_path = tmp_path / 'import.csv'
+    csv_path.write_text(IMPORT_CSV, encoding='utf-8')
+    listing = TrackListing()
+
+    invalid_rows = listing.import_tracks(str(csv_path), dedup=dedup)
+
+    assert [track.name for track in listing.tracks] == expected
+    assert [line for line, _ in invalid_rows] == [4, 6, 8]
+
+
+def test_import_tracks_round_trips_export(tmp_path):
+    listing = TrackListing([Track('spotify:track:{0:022d}'.format(i),
+                                  'Name "{0}"\n'.format(i), 'Artist', 'Album')
+                            for i in range(3)])
+    listing.tracks.append(Track(
+        'spotify:local:The+Band:Demo+Tape:Song+%231:187', 'Song #1',
+        'The Band', 'Demo Tape'))
+    listing.tracks.append(Track(
+        'spotify:episode:{0:022d}'.format(0), 'Episode', 'Show', 'Show'))
+    listing.export_tracks(str(tmp_path / 'export.csv'))
+
+    imported = TrackListing()
+    assert imported.import_tracks(str(tmp_path / 'export.csv')) == []
+    assert [repr(t) for t in imported.tracks] == [repr(t) for t in listing.tracks]
+
+
+def test_import_tracks_requires_columns(tmp_path):
+    csv_path = tmp_path / 'import.csv'
+    csv_path.write_text('uri,name\n', encoding='utf-8')
+
+    with pytest.raises(SystemExit):
+        TrackListing().import_tracks(str(csv_path))
+
+
+def test_lazy_tracks_fetch_only_accessed_pages():
+    fetched_offsets = []
+    loaded = []
+
+    def fetch_page(offset):
+        fetched_offsets.append(offset)
+        return [Track('spotify:track:{0}'.format(i), str(i), 'a', 'b')
+                for i in range(offset, min(offset + 10, 35))]
+
+    tracks = LazyTracks(fetch_page, 35, 10, concurrency=2,
+                        on_loaded=loaded.append)
+
+    assert len(tracks) == 35
+    assert fetched_offsets == []
+    assert [track.name for track in tracks[12:15]] == ['12', '13', '14']
+    assert tracks[-1].name == '34'
+    assert sorted(fetched_offsets) == [10, 30]
+
+    iterator = iter(tracks)
+    assert next(iterator).name == '0'
+    assert sorted(fetched_offsets) == [0, 10, 30]
+    assert [track.name for track in iterator] == [str(i) for i in range(1, 35)]
+    assert sorted(fetched_offsets) == [0, 10, 20, 30]
+    assert [track.name for track in loaded[0]] == [str(i) for i in range(35)]
+    assert list(tracks) and len(fetched_offsets) == 4
+
+
+def test_exporting_picked_playlist_does_not_refetch_it(tmp_path, monkeypatch):
+    sp = FakeSpotify(playlists={'p': {'name': 'Mix', 'uris': [
+        'spotify:track:{0:022d}'.format(i) for i in range(150)]}})
+    manager = SpotifyManager(configparser.ConfigParser())
+    manager.sp = sp
+    manager.authorized = True
+    monkeypatch.setattr('builtins.input', lambda prompt: '0')
+
+    manager.export_playlist_tracks(str(tmp_path / 'mix.csv'))
+
+    listing = TrackListing()
+    listing.import_tracks(str(tmp_path / 'mix.csv'))
+    assert len(listing.tracks) == 150
+    assert (sp.calls['playlist'], sp.calls['playlist_items']) == (1, 2)